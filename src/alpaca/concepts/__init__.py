@@ -3,6 +3,7 @@ from alpaca.concepts._module import Module
 from alpaca.concepts._context import Context
 from alpaca.concepts._initialization import Initialization
 from alpaca.concepts._instancestate import InstanceState
+from alpaca.concepts._sourcetext import SourceText
 from alpaca.concepts._abstractexception import AbstractException
 from alpaca.concepts._abstractparams import AbstractParams
 from alpaca.concepts._type2 import (Type, RealizedType, ConstructedType, StructType, TraitType,
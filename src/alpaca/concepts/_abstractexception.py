@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from alpaca.concepts._sourcetext import SourceText
+
 class AbstractException():
     size_bound = 56
     delineator = "="*74+"\n"
@@ -28,35 +30,37 @@ class AbstractException():
         return lines
 
 
+    def get_name(self) -> str:
+        return f"{self.type}Exception"
+
     def __str__(self):
         prefix = f"    Line {self.line_number}: "
         full_indent = " "*len(prefix)
 
         padding = " "*len(str(self.line_number))
         return (AbstractException.delineator
-            + f"{self.type}Exception\n"
+            + f"{self.get_name()}\n"
             + prefix + full_indent.join(self.cut_to_size(self.description))
             + f"{padding}     INFO: " + full_indent.join(self.cut_to_size(self.msg))
             + f"\n")
 
-    def to_str_with_context(self, txt : str):
-        str_rep = str(self)
+    def to_str_with_context(self, txt : str | SourceText):
+        source = SourceText.of(txt)
+        parts = [str(self)]
 
-        lines = txt.split('\n')
         index_of_line_number = self.line_number - 1
 
         start = index_of_line_number - 2
         start = 0 if start < 0 else start
 
         end = index_of_line_number + 3
-        end = len(lines) if end > len(lines) else end
+        end = len(source) if end > len(source) else end
 
         for i in range(start, end):
             c = ">>" if i == index_of_line_number else "  "
-            line = f"       {c} {i+1} \t| {lines[i]}\n"
-            str_rep += line
+            parts.append(f"       {c} {i+1} \t| {source.get_line(i)}\n")
 
-        return str_rep
+        return "".join(parts)
 
     def __hash__(self) -> int:
         return hash(self.msg + str(self.line_number) + str(type(self)))
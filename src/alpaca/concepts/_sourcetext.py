@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+class SourceText():
+    """
+    Index of the line offsets of some source text. This is built once per source so that
+    individual lines can be obtained without splitting the entire text each time.
+    """
+
+    _last_indexed: SourceText = None
+
+    def __init__(self, txt: str):
+        self.txt = txt
+        self.line_offsets = [0]
+        pos = txt.find("\n")
+        while pos != -1:
+            self.line_offsets.append(pos + 1)
+            pos = txt.find("\n", pos + 1)
+
+    @classmethod
+    def of(cls, txt: str | SourceText) -> SourceText:
+        """
+        Return the SourceText for [txt], reusing the most recently built index if it was built
+        for the same source.
+        """
+        if isinstance(txt, SourceText):
+            return txt
+        if cls._last_indexed is None or cls._last_indexed.txt is not txt:
+            cls._last_indexed = SourceText(txt)
+        return cls._last_indexed
+
+    def __len__(self) -> int:
+        return len(self.line_offsets)
+
+    def get_line(self, index: int) -> str:
+        """
+        Return the line at the 0-based [index], without the trailing newline.
+        """
+        start = self.line_offsets[index]
+        if index + 1 < len(self.line_offsets):
+            return self.txt[start: self.line_offsets[index + 1] - 1]
+        return self.txt[start: ]
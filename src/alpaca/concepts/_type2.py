@@ -50,7 +50,7 @@ class Namespaces:
         # parts
         parent_namespaces = [""] if not environmental_namespace else []
         for i in range(len(parts)):
-            parent_namespaces.append("::".join(parent_namespaces[0 : i+1]))
+            parent_namespaces.append("::".join(parts[0 : i+1]))
 
         # Reverse to return the correct order
         parent_namespaces.reverse()
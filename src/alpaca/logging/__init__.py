@@ -1 +1 @@
-from alpaca.logging._logger import Logger
+from alpaca.logging._logger import Logger, LogSink
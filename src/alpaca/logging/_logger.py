@@ -1,51 +1,174 @@
 from __future__ import annotations
 
+import os
+import time
+import atexit
+import multiprocessing
+import multiprocessing.util
+from collections import deque
 from datetime import datetime
+from typing import Any, Callable
+
+class LogSink():
+    """
+    A buffered writer for a single log file. Lines are accumulated in memory and written out with
+    a single held file handle once the buffer is large enough, once enough time has passed since
+    the last flush, or when the process exits.
+
+    Processes started by multiprocessing exit without running 'atexit' handlers, so in a child
+    process the flush at exit is registered as a multiprocessing finalizer instead. A child which
+    is terminated (as by 'Pool.terminate') loses any lines which have not yet been flushed.
+    """
+
+    # maximum number of buffered lines before a flush is forced
+    max_buffered_lines = 512
+
+    # maximum number of seconds a line may sit in the buffer before a flush is forced
+    flush_interval = 1.0
+
+    _sinks: dict[str, LogSink] = {}
+
+    # id of the process which has registered flush_all to run when it exits
+    _exit_flush_pid: int = None
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.handle = None
+        self.buffer: list[str] = []
+        self.last_flush = time.monotonic()
+        LogSink._register_exit_flush()
+
+    @classmethod
+    def _register_exit_flush(cls):
+        if cls._exit_flush_pid == os.getpid():
+            return
+        cls._exit_flush_pid = os.getpid()
+        if multiprocessing.parent_process() is not None:
+            multiprocessing.util.Finalize(None, cls.flush_all, exitpriority=0)
+
+    @classmethod
+    def get(cls, filename: str) -> LogSink:
+        sink = cls._sinks.get(filename)
+        if sink is None:
+            sink = LogSink(filename)
+            cls._sinks[filename] = sink
+        return sink
+
+    @classmethod
+    def flush_all(cls):
+        for sink in cls._sinks.values():
+            sink.flush()
+
+    def write(self, line: str):
+        # a forked child inherits the buffer and handle of its parent; drop both so that lines
+        # are not written twice.
+        if self.pid != os.getpid():
+            self._reset()
+
+        self.buffer.append(line)
+        if (len(self.buffer) >= LogSink.max_buffered_lines
+                or time.monotonic() - self.last_flush > LogSink.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if not self.buffer or self.pid != os.getpid():
+            return
+        if self.handle is None:
+            self.handle = open(self.filename, 'a')
+        self.handle.write("".join(self.buffer))
+        self.handle.flush()
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+atexit.register(LogSink.flush_all)
+
 
 class Logger():
+    """
+    Logs messages at a given level to './logs/<file>.log'. Messages may be passed either as
+    %-style format strings with [args], or as a callable returning the message; in both cases the
+    message is only formatted if it will actually be logged.
+
+    If [ring_buffer_size] is supplied, messages are instead kept in memory, and only the most
+    recent [ring_buffer_size] records are retained. These can be obtained with 'get_records'.
+    """
     log_dir = "./logs/"
 
-    def __init__(self, file: str, tag: str, log_level: str = "info") -> None:
+    _levels_mapping = {
+        "debug": 0,
+        "info": 1,
+        "error": 2
+    }
+
+    def __init__(self, file: str, tag: str, log_level: str = "info",
+                 ring_buffer_size: int = None) -> None:
         self.log_level = log_level
         self.file = file
         self.tag = tag
+        self._level = self._log_level_to_int(log_level)
+        self._ring: deque[tuple[float, str, str | Callable[[], str], tuple]] = None
+        if ring_buffer_size is not None:
+            self._ring = deque(maxlen=ring_buffer_size)
 
-    def _line_header(self, level: str) -> str:
-        date = datetime.now().strftime(f"[%d/%m %H:%M:%S]")
+    def _line_header(self, level: str, timestamp: float = None) -> str:
+        date = datetime.fromtimestamp(timestamp or time.time()).strftime(f"[%d/%m %H:%M:%S]")
         return f"{date}, {level}, {self.tag}: "
 
-    def _log(self, msg: str, level: str) -> None:
-        with open(self.log_dir + self.file + ".log", 'a') as f:
-            f.write(self._line_header(level) + msg + "\n")
+    @staticmethod
+    def _format(msg: str | Callable[[], str], args: tuple[Any, ...]) -> str:
+        if callable(msg):
+            msg = msg()
+        if args:
+            msg = msg % args
+        return msg
+
+    def _get_sink(self, suffix: str = "") -> LogSink:
+        return LogSink.get(self.log_dir + self.file + suffix + ".log")
 
+    def _log(self, msg: str | Callable[[], str], args: tuple[Any, ...], level: str) -> None:
+        if self._ring is not None:
+            # formatting is deferred until the records are read
+            self._ring.append((time.time(), level, msg, args))
+            return
+        self._get_sink().write(self._line_header(level) + Logger._format(msg, args) + "\n")
 
-    def log(self, msg: str):
-        if self.should_log_at_level("info"):
-            self._log(msg, "INF")
+    def log(self, msg: str | Callable[[], str], *args: Any):
+        if self._level <= 1:
+            self._log(msg, args, "INF")
 
-    def log_error(self, msg: str):
-        if self.should_log_at_level("error"):
-            self._log(msg, "ERR")
-            with open(self.log_dir + self.file + "_err.log", 'a') as f:
-                f.write(self._line_header("ERR") + msg + "\n")
+    def log_error(self, msg: str | Callable[[], str], *args: Any):
+        if self._level <= 2:
+            self._log(msg, args, "ERR")
+            if self._ring is None:
+                self._get_sink("_err").write(self._line_header("ERR") + Logger._format(msg, args) + "\n")
 
-    def log_debug(self, msg: str):
-        if self.should_log_at_level("debug"):
-            self._log(msg, "DEB")
+    def log_debug(self, msg: str | Callable[[], str], *args: Any):
+        if self._level <= 0:
+            self._log(msg, args, "DEB")
 
     def raise_exception(self, msg: str):
         self.log_error(msg)
         raise Exception(msg)
 
+    def get_records(self) -> list[str]:
+        """
+        Return the formatted records held in the ring buffer, oldest first.
+        """
+        if self._ring is None:
+            return []
+        return [self._line_header(level, timestamp) + Logger._format(msg, args)
+                for timestamp, level, msg, args in self._ring]
+
+    def flush(self):
+        LogSink.flush_all()
+
     @classmethod
     def _log_level_to_int(cls, level: str):
-        levels_mapping = {
-            "debug": 0,
-            "info": 1,
-            "error": 2
-        }
-
-        return levels_mapping.get(level)
+        return cls._levels_mapping.get(level)
 
     def should_log_at_level(self, level_of_message: str):
-        return self._log_level_to_int(level_of_message) >= self._log_level_to_int(self.log_level)
+        return self._log_level_to_int(level_of_message) >= self._level
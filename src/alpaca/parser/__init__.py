@@ -1,3 +1,5 @@
-from alpaca.parser._run import run
+from alpaca.parser._run import run, algos
 from alpaca.parser._commonbuilder import CommonBuilder, Builder, CommonBuilder
 import alpaca.parser.cyk as cyk
+import alpaca.parser.lr1 as lr1
+import alpaca.parser.earley as earley
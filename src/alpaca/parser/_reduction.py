@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from alpaca.config import Config
+from alpaca.grammar import CFG, CFGRule
+from alpaca.clr import AST, ASTToken, ASTElements
+from alpaca.parser._builder import Builder
+
+class Reduction():
+    """
+    How the components of a [rule] are assembled when it is reduced, for parsers which run on
+    the original grammar rather than its normalized (CNF) form. The CYK parser applies the
+    actions of a rule to components shaped by the CFGNormalizer; each reduction reproduces that
+    shape so that every parser builds the same AST:
+
+        token       X -> terminal           the components are [token]
+        unit        X -> Y                  the components are those which Y was reduced to
+        pair        X -> Y Z                the components are [Y, Z]
+        sequence    any other rule          each terminal is passed up through its literal rule,
+                                            and the components are pooled pairwise from the
+                                            right, as with the connectors of the normalized rule
+    """
+
+    def __init__(self, rule: CFGRule, cfg: CFG):
+        self.rule = rule
+        self.n_symbols = len(rule.pattern)
+        self.is_terminal = [not cfg.is_production_symbol(symbol) for symbol in rule.pattern]
+        match self.n_symbols, sum(self.is_terminal):
+            case 1, 1: self.shape = "token"
+            case 1, 0: self.shape = "unit"
+            case 2, 0: self.shape = "pair"
+            case _: self.shape = "sequence"
+
+    def get_components(self, config: Config, builder: Builder,
+                       values: list[ASTToken | ASTElements]) -> ASTElements:
+        match self.shape:
+            case "token": return values
+            case "unit": return values[0]
+            case "pair": return values
+
+        components = [builder.apply("pass", config, [value], "") if is_terminal else value
+            for value, is_terminal in zip(values, self.is_terminal)]
+        pooled = components[-1]
+        for component in reversed(components[:-1]):
+            pooled = builder.apply("pool", config, [component, pooled], "")
+        return pooled
+
+    # Marks a shift in a sequence of shifts and reductions; reductions are marked by the index
+    # of their rule.
+    shift = -1
+
+    @staticmethod
+    def build(config: Config, nodes: list[ASTToken], builder: Builder, reductions: list[Reduction],
+              steps: list[int]) -> AST:
+        """
+        Build the AST of the [nodes] by applying the actions of each rule as it is reduced in
+        the sequence of [steps], which lists the shifts and reductions of a parse in the order
+        of a bottom up (LR) parser: the post-order of the parse tree.
+        """
+        values: list[ASTToken | ASTElements] = []
+        pos = 0
+        for step in steps:
+            if step == Reduction.shift:
+                values.append(nodes[pos])
+                pos += 1
+                continue
+
+            reduction = reductions[step]
+            n = reduction.n_symbols
+            components = reduction.get_components(config, builder, values[-n:])
+            del values[-n:]
+            for reversal_step in reduction.rule.actions:
+                components = builder.apply(reversal_step.type, config, components, reversal_step.value)
+            values.append(components)
+
+        head = values[-1]
+        if len(values) != 1 or len(head) != 1:
+            raise Exception("ast heads not parsed to single state")
+        return head[0]
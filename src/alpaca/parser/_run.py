@@ -1,12 +1,25 @@
 from alpaca.parser.cyk import CYKParser
+from alpaca.parser.lr1 import LR1Parser
+from alpaca.parser.earley import EarleyParser
 from alpaca.config import Config
 from alpaca.parser._builder import Builder
 
+# The algorithms which can parse a grammar, where "lr1" uses LALR(1) tables and "lr1-canonical"
+# uses the canonical LR(1) tables, which are larger but have fewer conflicts. The "earley" parser
+# handles any grammar, like "cyk", but without normalizing it first. The "cyk-pratt" parser is the
+# "cyk" parser, but parses runs of binary operations by precedence climbing, and the "cyk-parallel"
+# parser fills the table of long inputs with a process per core.
+algos = ["cyk", "cyk-pratt", "cyk-parallel", "lr1", "lr1-canonical", "earley"]
+
 def run(config: Config, tokens: list, builder: Builder, algo: str="cyk"):
     if not tokens:
         raise Exception("No tokens passed into run.")
 
-    if algo == "cyk":
-        return CYKParser(config, tokens, builder)
-    else:
-        raise Exception("Error: unknown parser algo")
+    match algo:
+        case "cyk": return CYKParser(config, tokens, builder)
+        case "cyk-pratt": return CYKParser(config, tokens, builder, expressions=True)
+        case "cyk-parallel": return CYKParser(config, tokens, builder, parallel=True)
+        case "lr1": return LR1Parser(config, tokens, builder, method="lalr")
+        case "lr1-canonical": return LR1Parser(config, tokens, builder, method="lr1")
+        case "earley": return EarleyParser(config, tokens, builder)
+        case _: raise Exception("Error: unknown parser algo")
@@ -1,3 +1,5 @@
 from alpaca.parser.cyk._cykparser import CYKParser
 from alpaca.parser.cyk._astbuilder import AstBuilder
-from alpaca.parser.cyk._cykalgo import CYKAlgo
+from alpaca.parser.cyk._cykalgo import CYKAlgo, Ambiguity, DpTable
+from alpaca.parser.cyk._expressionparser import ExpressionParser, PrecedenceChain, PrecedenceLevel
+from alpaca.parser.cyk._parallelcykalgo import ParallelCYKAlgo, SharedChart, SharedDpTable
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from alpaca.clr import AST, ASTToken, ASTElements
-from alpaca.parser.cyk._cykalgo import DpTable, DpTableEntry
+from alpaca.parser.cyk._cykalgo import DpTable, CYKAlgo
 from alpaca.parser._builder import Builder
 from alpaca.config import Config
 
@@ -19,13 +19,13 @@ class AstBuilder:
         self.dp_table = dp_table
         self.builder = builder
 
-        if fail_if_bad_grammar and starting_rule not in map(lambda x: x.name, dp_table[-1][0]):
-            for x in dp_table[-1][0]:
-                print(x)
+        n = dp_table.n
+        if fail_if_bad_grammar and not dp_table.derives(starting_rule):
+            for symbol in dp_table.get_symbols(n - 1, 0):
+                print(f"({n - 1}, 0): {symbol}")
             raise Exception(f"'{starting_rule}' not found at top level: input is ungrammatical")
 
-        starting_entry = [x for x in dp_table[-1][0] if x.name == starting_rule][0]
-        clrList = self._recursive_descent(starting_entry)
+        clrList = self._recursive_descent(n - 1, 0, dp_table.query.symbol_ids[starting_rule])
         if len(clrList) != 1:
             raise Exception("ast heads not parsed to single state")
 
@@ -35,19 +35,21 @@ class AstBuilder:
 
         return head
 
-    def _recursive_descent(self, entry : DpTableEntry) -> ASTElements:
-        if entry.is_main_diagonal:
-            components = [self.nodes[entry.x]]
+    def _recursive_descent(self, x : int, y : int, symbol : int) -> ASTElements:
+        rule_index, delta = self.dp_table.get_alternative(x, y, symbol)
+        if x == y:
+            components = [self.nodes[x]]
         else:
+            left_symbol, right_symbol = self.dp_table.query.children[rule_index]
             left = self._recursive_descent(
-                entry.get_left_child(self.dp_table))
+                *CYKAlgo.get_left_child_point(x, y, delta), left_symbol)
 
             right = self._recursive_descent(
-                entry.get_right_child(self.dp_table))
+                *CYKAlgo.get_right_child_point(x, y, delta), right_symbol)
 
             components = [left, right]
 
-        for reversal_step in entry.rule.actions:
+        for reversal_step in self.dp_table.query.cfg.rules[rule_index].actions:
             components = self.builder.apply(reversal_step.type, self.config, components, reversal_step.value)
 
         return components
@@ -1,110 +1,120 @@
 from __future__ import annotations
-from typing import List
-import itertools
-import random
-from alpaca.grammar import CFGRule, CFG, CFGNormalizer
+from array import array
+from dataclasses import dataclass
+from alpaca.grammar import CFG, CFGNormalizer
 from alpaca.lexer import Token
 from alpaca.clr import ASTToken
 
-class DpTableEntry():
-    def __init__(self,
-            rule : CFGRule,
-            x : int,
-            y : int,
-            delta : int=None,
-            lname : str=None,
-            rname : str=None) -> None:
-
-        self.rule = rule
-        self.name = rule.production_symbol
-        self.x = x
-        self.y = y
-        self.diagonal = x - y
-
-        if self.diagonal == 0:
-            self.is_main_diagonal = True
-        else:
-            self.is_main_diagonal = False
-
-        self.delta = delta
-        self.lname = lname
-        self.rname = rname
+# The ids of the symbols which derive the tokens of a cell, and its packed alternatives.
+Cell = tuple[tuple[int, ...], array]
+
+class DpTable():
+    """
+    The packed parse forest of the CYK parser, for [n] tokens. Only the cells whose tokens are
+    derived by some symbol are stored: [rows][y] maps each x to the cell for the tokens y to x,
+    in increasing order of x.
+
+    A cell holds the ids of the symbols which derive its tokens, and each way they can derive
+    them packed into an array as (symbol id, rule index, delta) triples, where the left child
+    of the rule covers the tokens y to y + delta.
+    """
+
+    def __init__(self, n : int, query : RuleQuery):
+        self.n = n
+        self.query = query
+        self.rows: list[dict[int, Cell]] = [{} for _ in range(n)]
+
+    def get_cell(self, x : int, y : int) -> Cell | None:
+        return self.rows[y].get(x, None)
+
+    def get_symbols(self, x : int, y : int) -> list[str]:
+        cell = self.get_cell(x, y)
+        return [self.query.symbols[symbol] for symbol in cell[0]] if cell is not None else []
+
+    def derives(self, symbol : str) -> bool:
+        """
+        Return True if the [symbol] derives all of the tokens.
+        """
+        cell = self.get_cell(self.n - 1, 0)
+        return cell is not None and self.query.symbol_ids.get(symbol, None) in cell[0]
+
+    def get_alternatives(self, x : int, y : int, symbol : int) -> list[tuple[int, int]]:
+        """
+        Return the (rule index, delta) of each way the [symbol] derives the tokens y to x, in
+        order of priority: rules declared earlier in the grammar come first, and between splits
+        of the same rule, the one with the shortest left child.
+        """
+        alternatives = self.get_cell(x, y)[1]
+        return sorted((alternatives[i + 1], alternatives[i + 2])
+            for i in range(0, len(alternatives), 3) if alternatives[i] == symbol)
+
+    def get_alternative(self, x : int, y : int, symbol : int) -> tuple[int, int]:
+        """
+        Return the alternative to build the AST with (see get_alternatives).
+        """
+        return self.get_alternatives(x, y, symbol)[0]
+
+@dataclass
+class Ambiguity:
+    """
+    A production [symbol] which derives the tokens [start] to [end] in more than one way. The
+    [alternatives] describe each rule, as it was declared in the grammar, and the token its
+    right child begins at, in order of priority; the first is chosen.
+    """
+    symbol: str
+    start: int
+    end: int
+    alternatives: list[str]
 
     def __str__(self) -> str:
-        return f"({self.x}, {self.y}): {self.rule.original_entry}"
-
-    def _get_unique_rules(self, entries: list[DpTableEntry]):
-        unique_entries = []
-        for entry in entries:
-            if entry.rule not in [e.rule for e in unique_entries]:
-                unique_entries.append(entry)
-
-        return unique_entries
-
-    def get_left_child(self, dp_table : DpTable):
-        # left_child_x, left_child_y
-        lcx, lcy = CYKAlgo.get_left_child_point(self.x, self.y, self.delta)
-        entries = dp_table[lcx][lcy]
-        matching_entries = [e for e in entries if e.name == self.lname]
-        unique_entries = self._get_unique_rules(matching_entries)
-
-        if not unique_entries:
-            raise Exception("reached point in gramatical tree with no children??")
-        if len(unique_entries) > 1:
-            print("non-uniqueness, multiple production pathways (picked first)")
-            random.shuffle(unique_entries)
-            for entry in unique_entries:
-                print(entry)
-
-        return unique_entries[0]
-
-    def get_right_child(self, dp_table : DpTable):
-        # right_child_x, right_child_y
-        rcx, rcy = CYKAlgo.get_right_child_point(self.x, self.y, self.delta)
-        entries = dp_table[rcx][rcy]
-        matching_entries = [e for e in entries if e.name == self.rname]
-        unique_entries = self._get_unique_rules(matching_entries)
-
-        if not unique_entries:
-            raise Exception("reached point in gramatical tree with no children??")
-        if len(unique_entries) > 1:
-            print("non-uniqueness, multiple production pathways (picked first)")
-            random.shuffle(unique_entries)
-            for entry in unique_entries:
-                print(entry)
-
-        return unique_entries[0]
-
-DpTable = List[List[List[DpTableEntry]]]
+        alternatives = "\n".join(f"    {alternative}" for alternative in self.alternatives)
+        return f"'{self.symbol}' over tokens {self.start} to {self.end}:\n{alternatives}"
 
 class RuleQuery():
+    """
+    Looks up the rules of a normalized [cfg] which produce a token, or a pair of symbols. Each
+    production symbol is identified by its index in [symbols].
+    """
+
     def __init__(self, cfg: CFG):
         self.cfg = cfg
-        self._production_lookup_table = {}
-        self._token_lookup_table = {}
+        self.symbols: list[str] = []
+        self.symbol_ids: dict[str, int] = {}
+        # The ids of the two symbols of each rule which produces a pair of symbols.
+        self.children: list[tuple[int, int] | None] = []
+        self._production_lookup_table: dict[int, dict[int, list[tuple[int, int]]]] = {}
+        self._token_lookup_table: dict[str, list[tuple[int, int]]] = {}
         self._init_lookup_tables()
 
+    def get_symbol_id(self, symbol: str) -> int:
+        if symbol not in self.symbol_ids:
+            self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol_ids[symbol]
+
     def _init_lookup_tables(self):
-        for rule in self.cfg.rules:
+        for i, rule in enumerate(self.cfg.rules):
+            symbol = self.get_symbol_id(rule.production_symbol)
             if len(rule.pattern) == 1:
-                key = rule.pattern[0]
-                if key in self._token_lookup_table:
-                    self._token_lookup_table[key].append(rule)
-                else:
-                    self._token_lookup_table[key] = [rule]
+                self.children.append(None)
+                self._token_lookup_table.setdefault(rule.pattern[0], []).append((symbol, i))
             else:
-                key = (rule.pattern[0], rule.pattern[1])
-                if key in self._production_lookup_table:
-                    self._production_lookup_table[key].append(rule)
-                else:
-                    self._production_lookup_table[key] = [rule]
-        pass
-
-    def get_rules_for_token(self, tok: ASTToken) -> list[CFGRule]:
+                left, right = map(self.get_symbol_id, rule.pattern)
+                self.children.append((left, right))
+                self._production_lookup_table.setdefault(left, {}).setdefault(right, []).append((symbol, i))
+
+    def get_rules_for_token(self, tok: ASTToken) -> list[tuple[int, int]]:
+        """
+        Return the (symbol id, rule index) of each rule which produces the [tok].
+        """
         return self._token_lookup_table.get(tok.type, [])
 
-    def get_rules(self, lname: str, rname: str) -> list[CFGRule]:
-        return self._production_lookup_table.get((lname, rname), [])
+    def get_rules_for_left(self, left: int) -> dict[int, list[tuple[int, int]]]:
+        """
+        Return the (symbol id, rule index) of each rule which produces the [left] symbol
+        followed by another, by the id of the other.
+        """
+        return self._production_lookup_table.get(left, {})
 
 class CYKAlgo:
     def __init__(self, cfg : CFG):
@@ -114,6 +124,7 @@ class CYKAlgo:
 
         self.cfg = cfg
         self.query = RuleQuery(cfg)
+        self.dp_table: DpTable = None
 
     @classmethod
     def tokens_to_clrtoken(cls, tokens : list[Token]) -> list[ASTToken]:
@@ -121,17 +132,17 @@ class CYKAlgo:
 
     def _fill_first_diagonal_special(self):
         points = self._get_points_on_diagonal(0)
+        bootstrap_rule = next(i for i, rule in enumerate(self.cfg.rules)
+            if rule.production_symbol == "CONTEXT")
+        symbol = self.query.symbol_ids["CONTEXT"]
         for point in points:
             x, y = point
-            rules = [rule for rule in self.cfg.rules if rule.production_symbol == "CONTEXT"]
-            bootstrap_rule = rules[0]
-            self.dp_table[x][y] = [DpTableEntry(bootstrap_rule, x, y)]
-
+            self.dp_table.rows[y][x] = ((symbol, ), array("i", (symbol, bootstrap_rule, 0)))
 
     def parse_clrtokens(self, tokens: list[ASTToken]):
         self.n = len(tokens)
         self.tokens = tokens
-        self.dp_table = [[[] for y in range(self.n)] for x in range(self.n)]
+        self.dp_table = DpTable(self.n, self.query)
 
         self._fill_first_diagonal_special()
         for i in range (1, self.n):
@@ -140,11 +151,55 @@ class CYKAlgo:
         # self._do_parse()
 
     def parse(self, tokens : list[Token]):
-        self.n = len(tokens)
-        self.tokens = CYKAlgo.tokens_to_clrtoken(tokens)
-        self.dp_table = [[[] for y in range(self.n)] for x in range(self.n)]
+        self.parse_nodes(CYKAlgo.tokens_to_clrtoken(tokens))
+
+    def parse_nodes(self, nodes : list[ASTToken]):
+        self.n = len(nodes)
+        self.tokens = nodes
+        self.dp_table = DpTable(self.n, self.query)
         self._do_parse()
 
+    def clear(self):
+        """
+        Free the table of the last parse.
+        """
+        self.tokens = None
+        self.dp_table = None
+
+    def derives(self, symbol : str) -> bool:
+        return self.dp_table.derives(symbol)
+
+    def get_ambiguities(self, starting_rule : str="START") -> list[Ambiguity]:
+        """
+        Return each node of the parse forest of [starting_rule] over all the tokens which has
+        more than one alternative, ordered by position.
+        """
+        if not self.dp_table.derives(starting_rule):
+            return []
+
+        ambiguities = []
+        root = (self.n - 1, 0, self.query.symbol_ids[starting_rule])
+        visited = {root}
+        stack = [root]
+        while stack:
+            x, y, symbol = stack.pop()
+            alternatives = self.dp_table.get_alternatives(x, y, symbol)
+            if len(alternatives) > 1:
+                ambiguities.append(Ambiguity(self.query.symbols[symbol], y, x,
+                    [f"{self.cfg.rules[rule].original_entry or self.cfg.rules[rule]} "
+                        + f"(at token {y + delta + 1})" for rule, delta in alternatives]))
+            if x == y:
+                continue
+            for rule, delta in alternatives:
+                left, right = self.query.children[rule]
+                for child in ((*CYKAlgo.get_left_child_point(x, y, delta), left),
+                              (*CYKAlgo.get_right_child_point(x, y, delta), right)):
+                    if child not in visited:
+                        visited.add(child)
+                        stack.append(child)
+
+        return sorted(ambiguities, key=lambda a: (a.start, -a.end, a.symbol))
+
     def _do_parse(self):
         self._fill_first_diagonal()
         for i in range (1, self.n):
@@ -153,36 +208,49 @@ class CYKAlgo:
     def _get_points_on_diagonal(self, starting_x : int) -> list[tuple[int, int]]:
         return [(starting_x + delta, delta) for delta in range(self.n - starting_x)]
 
-    def _get_producing_rules_for_clrtoken(self, tok : ASTToken) -> list[CFGRule]:
-        return self.query.get_rules_for_token(tok)
-
-    def _get_producing_rules_for(self, lname : str, rname : str) -> list[CFGRule]:
-        return self.query.get_rules(lname, rname)
-
     def _fill_first_diagonal(self):
         points = self._get_points_on_diagonal(0)
         for point in points:
             x, y = point
-            clrtoken = self.tokens[x]
-            producing_rules = self._get_producing_rules_for_clrtoken(clrtoken)
-            self.dp_table[x][y] = [DpTableEntry(rule, x, y) for rule in producing_rules]
+            producing_rules = self.query.get_rules_for_token(self.tokens[x])
+            if producing_rules:
+                alternatives = array("i")
+                for symbol, rule_index in producing_rules:
+                    alternatives.extend((symbol, rule_index, 0))
+                self.dp_table.rows[y][x] = (tuple(dict.fromkeys(s for s, _ in producing_rules)),
+                    alternatives)
 
     def _fill_diagonal(self, diagonal_number : int):
-        points = self._get_points_on_diagonal(diagonal_number)
-        for point in points:
-            x, y = point
-            for delta in range(diagonal_number):
-                lchild_x, lchild_y = CYKAlgo.get_left_child_point(*point, delta)
-                lrule_names = list(map(lambda x: x.name, self.dp_table[lchild_x][lchild_y]))
-
-                rchild_x, rchild_y = CYKAlgo.get_right_child_point(*point, delta)
-                rrule_names = list(map(lambda x: x.name, self.dp_table[rchild_x][rchild_y]))
-
-                for l_and_r_names in itertools.product(lrule_names, rrule_names):
-                    producing_rules = self._get_producing_rules_for(*l_and_r_names)
-                    self.dp_table[x][y] += \
-                        [DpTableEntry(rule, *point, delta, *l_and_r_names)
-                            for rule in producing_rules]
+        for x, y in self._get_points_on_diagonal(diagonal_number):
+            cell = self._get_cell(x, y)
+            if cell is not None:
+                self.dp_table.rows[y][x] = cell
+
+    def _get_cell(self, x : int, y : int) -> Cell | None:
+        """
+        Return the cell for the tokens y to x, given the cells of all shorter spans.
+        """
+        rows = self.dp_table.rows
+        symbols: dict[int, None] = {}
+        alternatives = array("i")
+        # Only the cells of shorter spans have been filled, so each m < x here.
+        for m, (left_symbols, _) in rows[y].items():
+            right_cell = rows[m + 1].get(x, None)
+            if right_cell is None:
+                continue
+
+            right_symbols = right_cell[0]
+            delta = m - y
+            for left in left_symbols:
+                rules_for_left = self.query.get_rules_for_left(left)
+                if not rules_for_left:
+                    continue
+                for right in right_symbols:
+                    for symbol, rule_index in rules_for_left.get(right, ()):
+                        symbols[symbol] = None
+                        alternatives.extend((symbol, rule_index, delta))
+
+        return (tuple(symbols), alternatives) if alternatives else None
 
     @classmethod
     def get_left_child_point(cls, x : int, y : int, delta : int) -> tuple[int, int]:
@@ -5,14 +5,44 @@ from alpaca.parser._builder import Builder
 from alpaca.clr._clr import AST
 from alpaca.parser.cyk._cykalgo import CYKAlgo
 from alpaca.parser.cyk._astbuilder import AstBuilder
+from alpaca.parser.cyk._expressionparser import ExpressionParser
+from alpaca.parser.cyk._parallelcykalgo import ParallelCYKAlgo
 from alpaca.grammar import CFGNormalizer
 from alpaca.lexer import Token
 
 class CYKParser():
-    def __new__(cls, config : Config, tokens : list[Token], builder : Builder) -> AST:
+    def __new__(cls, config : Config, tokens : list[Token], builder : Builder,
+                expressions : bool=False, parallel : bool=False) -> AST:
+        cfg = config.cfg
+        expression_parser = None
+        if expressions:
+            expression_parser = ExpressionParser(cfg)
+            cfg = expression_parser.get_extended_cfg()
+
         normer = CFGNormalizer()
-        cfg = normer.run(config.cfg)
-        algo = CYKAlgo(cfg)
-        algo.parse(tokens)
-        astbuilder = AstBuilder()
-        return astbuilder.run(config, algo.tokens, algo.dp_table, builder)
+        cfg = normer.run(cfg)
+        algo = ParallelCYKAlgo(cfg) if parallel else CYKAlgo(cfg)
+        return CYKParser.run(config, algo, tokens, builder, expression_parser)
+
+    @staticmethod
+    def run(config : Config, algo : CYKAlgo, tokens : list[Token], builder : Builder,
+            expression_parser : ExpressionParser=None, starting_rule : str="START") -> AST:
+        """
+        Parse the [tokens] with the [algo]. If an [expression_parser] is given, its runs of
+        binary operations are parsed first and the [algo] must be for its extended grammar; if
+        the tokens cannot be parsed that way, every token is parsed by the [algo]. The table of
+        the [algo] is freed once the AST is built.
+        """
+        nodes = CYKAlgo.tokens_to_clrtoken(tokens)
+        try:
+            if expression_parser is not None:
+                collapsed_nodes, values = expression_parser.collapse(config, nodes, builder)
+                if len(collapsed_nodes) < len(nodes):
+                    algo.parse_nodes(collapsed_nodes)
+                    if algo.derives(starting_rule):
+                        return AstBuilder().run(config, values, algo.dp_table, builder, starting_rule)
+
+            algo.parse_nodes(nodes)
+            return AstBuilder().run(config, algo.tokens, algo.dp_table, builder, starting_rule)
+        finally:
+            algo.clear()
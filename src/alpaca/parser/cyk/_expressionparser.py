@@ -0,0 +1,286 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+
+from alpaca.config import Config
+from alpaca.grammar import CFG, CFGRule, Action
+from alpaca.clr import AST, ASTToken
+from alpaca.parser._builder import Builder
+from alpaca.parser._reduction import Reduction
+
+@dataclass
+class PrecedenceLevel:
+    """
+    A production [symbol] whose rules are binary operations over the same [operand], and a
+    single unit rule, e.g. E7 -> E7 + E8 | E7 - E8 | E8. The [operators] map each operator to
+    the index of its rule, and the [operand_path] lists the unit rules which derive the
+    [operand] from the symbol of the next level, bottom up.
+    """
+    symbol: str
+    operand: str
+    associativity: str
+    operators: dict[str, int]
+    unit_rule: int
+    operand_path: list[int] = field(default_factory=list)
+
+@dataclass
+class PrecedenceChain:
+    """
+    The [levels] of binary operations of a grammar, from the loosest to the tightest, where the
+    operand of each level derives the symbol of the next through unit rules. The [atoms] map
+    each terminal which the operand of the tightest level derives to the unit rules which
+    derive it, bottom up.
+
+    A run of binary operations is replaced by a token of the pseudo [terminal] unless it is
+    preceded by a terminal in [unsafe_before] or followed by one in [unsafe_after], which could
+    bind to the first or last operand of the run more tightly than its operators.
+    """
+    levels: list[PrecedenceLevel]
+    atoms: dict[str, list[int]]
+    operators: dict[str, int]
+    terminal: str
+    unsafe_before: set[str] = field(default_factory=set)
+    unsafe_after: set[str] = field(default_factory=set)
+
+class ExpressionParser():
+    """
+    Parses runs of binary operations (e.g. a + b * 2 < c) by precedence climbing, in time
+    linear in their length; the CYK parser would try every split point of such a run.
+
+    The precedence and associativity of each operator are derived from the rules of the [cfg]
+    (see PrecedenceLevel). An operator is only used if it appears in no other rule, so that a
+    run of operators can only be parsed as a chain of binary operations. Each run is replaced
+    by a single token of a pseudo terminal which the loosest level of its chain derives, and
+    its AST is built by applying the actions of its rules through the Builder, exactly as the
+    CYK parser would.
+    """
+
+    def __init__(self, cfg: CFG):
+        self.cfg = cfg
+        self.reductions = [Reduction(rule, cfg) for rule in cfg.rules]
+        self.chains = self._get_chains()
+        self._init_boundaries()
+
+    def get_extended_cfg(self) -> CFG:
+        """
+        Return the [cfg] with a rule which derives the loosest level of each chain from its
+        pseudo terminal.
+        """
+        rules = [*self.cfg.rules, *(CFGRule(chain.levels[0].symbol, chain.terminal, Action("pass"))
+            for chain in self.chains)]
+        return CFG(rules, [*self.cfg.terminals, *(chain.terminal for chain in self.chains)])
+
+    def collapse(self, config: Config, nodes: list[ASTToken], builder: Builder
+                 ) -> tuple[list[ASTToken], list[ASTToken | AST]]:
+        """
+        Replace each run of binary operations in the [nodes] with a token of the pseudo
+        terminal of its chain. Return the tokens to parse, and the nodes to build the AST from,
+        where each run is replaced by its AST.
+        """
+        tokens: list[ASTToken] = []
+        values: list[ASTToken | AST] = []
+        pos = 0
+        while pos < len(nodes):
+            chain, end = self._get_run(nodes, pos)
+            if chain is None:
+                tokens.extend(nodes[pos: end])
+                values.extend(nodes[pos: end])
+                pos = end
+                continue
+
+            steps: list[int] = []
+            self._add_steps(chain, 0, nodes, pos, end, steps)
+            tokens.append(ASTToken([chain.terminal],
+                " ".join(node.value for node in nodes[pos: end]), nodes[pos].line_number))
+            values.append(Reduction.build(config, nodes[pos: end], builder, self.reductions, steps))
+            pos = end
+
+        return tokens, values
+
+    def _get_run(self, nodes: list[ASTToken], pos: int) -> tuple[PrecedenceChain | None, int]:
+        """
+        Return the chain of the longest run of binary operations which begins at [pos] and the
+        position after it, or None and the position to continue from if the run cannot be
+        replaced.
+        """
+        for chain in self.chains:
+            end = pos + 1
+            while (end + 1 < len(nodes)
+                    and nodes[pos].type in chain.atoms
+                    and nodes[end].type in chain.operators
+                    and nodes[end + 1].type in chain.atoms):
+                end += 2
+
+            if end == pos + 1:
+                continue
+            if pos > 0 and nodes[pos - 1].type in chain.unsafe_before:
+                return None, end
+            if end < len(nodes) and nodes[end].type in chain.unsafe_after:
+                return None, end
+            return chain, end
+        return None, pos + 1
+
+    def _add_steps(self, chain: PrecedenceChain, k: int, nodes: list[ASTToken], start: int,
+                   end: int, steps: list[int]):
+        """
+        Add the shifts and reductions (see Reduction.build) which derive the symbol of the
+        [k]th level of the [chain] from the nodes[start: end] to the [steps]. Past the tightest
+        level, the nodes are a single atom and the steps derive the operand of the tightest
+        level.
+        """
+        if k == len(chain.levels):
+            steps.append(Reduction.shift)
+            steps.extend(chain.atoms[nodes[start].type])
+            return
+
+        level = chain.levels[k]
+        operators = [pos for pos in range(start + 1, end, 2)
+            if chain.operators[nodes[pos].type] == k]
+        if not operators:
+            self._add_steps(chain, k + 1, nodes, start, end, steps)
+            steps.extend(level.operand_path)
+            steps.append(level.unit_rule)
+            return
+
+        operands = list(zip([start, *(pos + 1 for pos in operators)], [*operators, end]))
+        if level.associativity == "left":
+            self._add_steps(chain, k, nodes, *operands[0], steps)
+            for pos, operand in zip(operators, operands[1:]):
+                steps.append(Reduction.shift)
+                self._add_steps(chain, k + 1, nodes, *operand, steps)
+                steps.extend(level.operand_path)
+                steps.append(level.operators[nodes[pos].type])
+        else:
+            for operand in operands[:-1]:
+                self._add_steps(chain, k + 1, nodes, *operand, steps)
+                steps.extend(level.operand_path)
+                steps.append(Reduction.shift)
+            self._add_steps(chain, k, nodes, *operands[-1], steps)
+            steps.extend(level.operators[nodes[pos].type] for pos in reversed(operators))
+
+    def _get_level(self, symbol: str) -> PrecedenceLevel | None:
+        rules = [(i, rule) for i, rule in enumerate(self.cfg.rules) if rule.production_symbol == symbol]
+        unit_rules = [(i, rule) for i, rule in rules
+            if len(rule.pattern) == 1 and self.cfg.is_production_symbol(rule.pattern[0])]
+        if len(unit_rules) != 1 or unit_rules[0][1].pattern[0] == symbol:
+            return None
+
+        unit_rule, operand = unit_rules[0][0], unit_rules[0][1].pattern[0]
+        shapes = {"left": [symbol, operand], "right": [operand, symbol]}
+        operators: dict[str, int] = {}
+        associativities = set()
+        for i, rule in rules:
+            if i == unit_rule:
+                continue
+            if len(rule.pattern) != 3 or self.cfg.is_production_symbol(rule.pattern[1]):
+                return None
+            associativity = next((name for name, shape in shapes.items()
+                if [rule.pattern[0], rule.pattern[2]] == shape), None)
+            if associativity is None:
+                return None
+            associativities.add(associativity)
+            operators[rule.pattern[1]] = i
+
+        if len(associativities) != 1:
+            return None
+        return PrecedenceLevel(symbol, operand, associativities.pop(), operators, unit_rule)
+
+    def _get_unit_paths(self, symbol: str) -> dict[str, list[list[int]]]:
+        """
+        Return each symbol which the [symbol] derives through unit rules, and each terminal
+        which it derives through unit rules and a final rule of the form X -> terminal, mapped
+        to the paths of rules which derive it, bottom up.
+        """
+        paths: dict[str, list[list[int]]] = {symbol: [[]]}
+        stack = [(symbol, [])]
+        while stack:
+            current, path = stack.pop()
+            for i, rule in enumerate(self.cfg.rules):
+                if rule.production_symbol != current or len(rule.pattern) != 1:
+                    continue
+                child = rule.pattern[0]
+                if any(self.cfg.rules[j].production_symbol == child for j in path) or child == symbol:
+                    continue
+                child_path = [i, *path]
+                paths.setdefault(child, []).append(child_path)
+                if self.cfg.is_production_symbol(child):
+                    stack.append((child, child_path))
+        return paths
+
+    def _get_chains(self) -> list[PrecedenceChain]:
+        symbols = []
+        for rule in self.cfg.rules:
+            if rule.production_symbol not in symbols:
+                symbols.append(rule.production_symbol)
+        levels = {level.symbol: level for level in map(self._get_level, symbols) if level is not None}
+
+        # Operators which appear in any other rule, or in more than one level, are not used.
+        n_uses: dict[str, int] = {}
+        for rule in self.cfg.rules:
+            for symbol in rule.pattern:
+                if not self.cfg.is_production_symbol(symbol):
+                    n_uses[symbol] = n_uses.get(symbol, 0) + 1
+        for level in levels.values():
+            for operator in [op for op in level.operators if n_uses[op] != 1]:
+                del level.operators[operator]
+        levels = {symbol: level for symbol, level in levels.items() if level.operators}
+
+        # Link each level to the nearest level which its operand derives through a unique path.
+        next_levels: dict[str, str] = {}
+        for level in levels.values():
+            paths = self._get_unit_paths(level.operand)
+            candidates = [(len(paths[symbol][0]), symbol) for symbol in levels
+                if symbol in paths and len(paths[symbol]) == 1 and symbol != level.symbol]
+            if candidates:
+                next_levels[level.symbol] = min(candidates)[1]
+
+        chains = []
+        claimed = set()
+        heads = [symbol for symbol in levels if symbol not in next_levels.values()]
+        for head in heads:
+            chain_levels = [levels[head]]
+            while chain_levels[-1].symbol in next_levels:
+                chain_levels.append(levels[next_levels[chain_levels[-1].symbol]])
+            if claimed & {level.symbol for level in chain_levels}:
+                continue
+            claimed |= {level.symbol for level in chain_levels}
+
+            for level, next_level in zip(chain_levels, chain_levels[1:]):
+                level.operand_path = self._get_unit_paths(level.operand)[next_level.symbol][0]
+            tightest = chain_levels[-1]
+            atoms = {symbol: paths[0] for symbol, paths in self._get_unit_paths(tightest.operand).items()
+                if not self.cfg.is_production_symbol(symbol) and len(paths) == 1}
+            if not atoms:
+                continue
+
+            operators = {op: k for k, level in enumerate(chain_levels) for op in level.operators}
+            chains.append(PrecedenceChain(chain_levels, atoms, operators,
+                terminal=f"__expr({head})"))
+        return chains
+
+    def _init_boundaries(self):
+        first: dict[str, set[str]] = {symbol: {symbol} for symbol in self.cfg.terminals}
+        last: dict[str, set[str]] = {symbol: {symbol} for symbol in self.cfg.terminals}
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.cfg.rules:
+                for sets, symbol in ((first, rule.pattern[0]), (last, rule.pattern[-1])):
+                    lhs = sets.setdefault(rule.production_symbol, set())
+                    n = len(lhs)
+                    lhs |= sets.get(symbol, set())
+                    changed = changed or len(lhs) != n
+
+        for chain in self.chains:
+            # The symbols which may derive part of a run, rather than all of it.
+            inner = {symbol for symbol, paths in self._get_unit_paths(chain.levels[0].symbol).items()
+                if self.cfg.is_production_symbol(symbol)}
+
+            def is_part_of_run(symbol: str, rule: CFGRule) -> bool:
+                return symbol in inner or (symbol in chain.atoms and rule.production_symbol in inner)
+
+            for rule in self.cfg.rules:
+                for left, right in zip(rule.pattern, rule.pattern[1:]):
+                    if is_part_of_run(right, rule):
+                        chain.unsafe_before |= last.get(left, set())
+                    if is_part_of_run(left, rule):
+                        chain.unsafe_after |= first.get(right, set())
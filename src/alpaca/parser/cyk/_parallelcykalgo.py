@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from alpaca.grammar import CFG
+from alpaca.clr import ASTToken
+from alpaca.parser.cyk._cykalgo import CYKAlgo, DpTable, RuleQuery
+
+class SharedChart():
+    """
+    The CYK table for [n] tokens in shared memory, so that worker processes can fill the cells
+    of a diagonal in parallel. The cells of row y are the spans y to x, for each x >= y, and
+    are stored from the offset of the row onwards.
+
+    [bits] stores the symbols which derive each cell as a bitset of [width] bytes, indexed by
+    symbol id. As the sparse DpTable does, each row also lists the x of its non-empty cells in
+    increasing order: [ends] stores the list of each row from the offset of the row, and
+    [counts] stores its length. Likewise each column x lists y - 1 for its non-empty cells, the
+    split points at which they can be a right child: [splits] stores the list of each column
+    from the offset of row n - 1 - x, and [split_counts] stores its length.
+
+    While a diagonal is filled, each worker only adds to the row and column of its own cells,
+    and only reads the cells of earlier diagonals, so no locking is needed.
+    """
+
+    def __init__(self, n: int, width: int, names: tuple[str, ...] | None = None):
+        self.n = n
+        self.width = width
+        self.row_offsets = [y * n - y * (y - 1) // 2 for y in range(n)]
+        n_cells = n * (n + 1) // 2
+        sizes = (max(1, n_cells * width), 4 * n_cells, 4 * n, 4 * n_cells, 4 * n)
+        if names is None:
+            self.memory = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        else:
+            self.memory = [shared_memory.SharedMemory(name=name) for name in names]
+
+        self.bits = self.memory[0].buf
+        self.ends = self.memory[1].buf.cast("i")
+        self.counts = self.memory[2].buf.cast("i")
+        self.splits = self.memory[3].buf.cast("i")
+        self.split_counts = self.memory[4].buf.cast("i")
+
+    def get_names(self) -> tuple[str, ...]:
+        return tuple(memory.name for memory in self.memory)
+
+    def get_bits(self, x: int, y: int) -> int:
+        offset = (self.row_offsets[y] + x - y) * self.width
+        return int.from_bytes(self.bits[offset: offset + self.width], "little")
+
+    def get_ends(self, y: int) -> list[int]:
+        offset = self.row_offsets[y]
+        return self.ends[offset: offset + self.counts[y]].tolist()
+
+    def get_splits(self, x: int) -> list[int]:
+        offset = self.row_offsets[self.n - 1 - x]
+        return self.splits[offset: offset + self.split_counts[x]].tolist()
+
+    def add_cell(self, x: int, y: int, bits: int):
+        offset = (self.row_offsets[y] + x - y) * self.width
+        self.bits[offset: offset + self.width] = bits.to_bytes(self.width, "little")
+        self.ends[self.row_offsets[y] + self.counts[y]] = x
+        self.counts[y] += 1
+        self.splits[self.row_offsets[self.n - 1 - x] + self.split_counts[x]] = y - 1
+        self.split_counts[x] += 1
+
+    def close(self, unlink: bool = False):
+        for view in (self.ends, self.counts, self.splits, self.split_counts):
+            view.release()
+        self.bits = self.ends = self.counts = self.splits = self.split_counts = None
+        for memory in self.memory:
+            memory.close()
+            if unlink:
+                memory.unlink()
+
+class SharedDpTable(DpTable):
+    """
+    A DpTable over a SharedChart. Only the symbols of each cell are stored, so the alternatives
+    of a symbol are found when they are needed, by checking each split point of its rules.
+    """
+
+    def __init__(self, chart: SharedChart, query: RuleQuery, nodes: list[ASTToken]):
+        self.n = chart.n
+        self.query = query
+        self.chart = chart
+        self.nodes = nodes
+        self.rules_for_symbol: dict[int, list[int]] = {}
+        for rule_index, children in enumerate(query.children):
+            if children is not None:
+                symbol = query.symbol_ids[query.cfg.rules[rule_index].production_symbol]
+                self.rules_for_symbol.setdefault(symbol, []).append(rule_index)
+
+    def get_symbols(self, x: int, y: int) -> list[str]:
+        bits = self.chart.get_bits(x, y)
+        return [symbol for i, symbol in enumerate(self.query.symbols) if bits >> i & 1]
+
+    def derives(self, symbol: str) -> bool:
+        symbol_id = self.query.symbol_ids.get(symbol, None)
+        return symbol_id is not None and bool(self.chart.get_bits(self.n - 1, 0) >> symbol_id & 1)
+
+    def get_alternatives(self, x: int, y: int, symbol: int) -> list[tuple[int, int]]:
+        if x == y:
+            return sorted((rule_index, 0)
+                for s, rule_index in self.query.get_rules_for_token(self.nodes[x]) if s == symbol)
+
+        alternatives = []
+        for m in set(self.chart.get_ends(y)).intersection(self.chart.get_splits(x)):
+            if m < y or m >= x:
+                continue
+            left, right = self.chart.get_bits(m, y), self.chart.get_bits(x, m + 1)
+            for rule_index in self.rules_for_symbol.get(symbol, []):
+                left_symbol, right_symbol = self.query.children[rule_index]
+                if left >> left_symbol & 1 and right >> right_symbol & 1:
+                    alternatives.append((rule_index, m - y))
+        return sorted(alternatives)
+
+# The chart and grammar tables of a worker process, set once by _init_worker.
+_chart: SharedChart = None
+_right_masks: list[int] = None
+_pairs: list[list[tuple[int, int]]] = None
+
+def _init_worker(n: int, width: int, names: tuple[str, ...], right_masks: list[int],
+                 pairs: list[list[tuple[int, int]]]):
+    global _chart, _right_masks, _pairs
+    _chart = SharedChart(n, width, names)
+    _right_masks = right_masks
+    _pairs = pairs
+
+def _fill_cells(diagonal_number: int, starts: range):
+    # The cells are read inline, as this loop is where the parser spends its time.
+    chart_bits, row_offsets, width = _chart.bits, _chart.row_offsets, _chart.width
+    for y in starts:
+        x = y + diagonal_number
+        bits = 0
+        # The splits where both the left and right child are non-empty.
+        for m in set(_chart.get_ends(y)).intersection(_chart.get_splits(x)):
+            offset = (row_offsets[m + 1] + x - m - 1) * width
+            right = int.from_bytes(chart_bits[offset: offset + width], "little")
+            offset = (row_offsets[y] + m - y) * width
+            left = int.from_bytes(chart_bits[offset: offset + width], "little")
+            while left:
+                lowest = left & -left
+                left_symbol = lowest.bit_length() - 1
+                left ^= lowest
+                if right & _right_masks[left_symbol]:
+                    for right_symbol, symbol_bit in _pairs[left_symbol]:
+                        if right >> right_symbol & 1:
+                            bits |= symbol_bit
+        if bits:
+            _chart.add_cell(x, y, bits)
+
+class ParallelCYKAlgo(CYKAlgo):
+    """
+    A CYK parser which fills each diagonal of the table in parallel with [jobs] worker
+    processes, for inputs of at least [min_tokens] tokens; shorter inputs are parsed as by the
+    CYKAlgo. All cells of a diagonal depend only on the cells of earlier diagonals, so the
+    workers only synchronize once per diagonal.
+
+    The table is kept in a SharedChart, which only records the symbols of each cell; the AST
+    is then built by finding the alternatives of each node it uses (see SharedDpTable).
+    """
+
+    def __init__(self, cfg: CFG, jobs: int | None = None, min_tokens: int = 1000):
+        super().__init__(cfg)
+        self.jobs = jobs if jobs is not None else os.cpu_count()
+        self.min_tokens = min_tokens
+
+        n_symbols = len(self.query.symbols)
+        self.width = (n_symbols + 7) // 8
+        # For each left symbol, the bitset of the right symbols it forms a rule with, and each
+        # right symbol with the bitset of the symbols the rules produce.
+        self.right_masks = [0] * n_symbols
+        self.pairs: list[list[tuple[int, int]]] = [[] for _ in range(n_symbols)]
+        for left in range(n_symbols):
+            for right, rules in self.query.get_rules_for_left(left).items():
+                self.right_masks[left] |= 1 << right
+                bits = 0
+                for symbol, _ in rules:
+                    bits |= 1 << symbol
+                self.pairs[left].append((right, bits))
+
+    def parse_nodes(self, nodes: list[ASTToken]):
+        self.clear()
+        if len(nodes) < self.min_tokens or self.jobs <= 1:
+            super().parse_nodes(nodes)
+            return
+
+        self.n = len(nodes)
+        self.tokens = nodes
+        chart = SharedChart(self.n, self.width)
+        self.dp_table = SharedDpTable(chart, self.query, nodes)
+        for y, node in enumerate(nodes):
+            bits = 0
+            for symbol, _ in self.query.get_rules_for_token(node):
+                bits |= 1 << symbol
+            if bits:
+                chart.add_cell(y, y, bits)
+
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                initargs=(self.n, self.width, chart.get_names(), self.right_masks, self.pairs)) as executor:
+            for i in range(1, self.n):
+                starts = range(self.n - i)
+                chunks = [starts[k::self.jobs] for k in range(min(self.jobs, len(starts)))]
+                list(executor.map(_fill_cells, [i] * len(chunks), chunks))
+
+    def clear(self):
+        if isinstance(self.dp_table, SharedDpTable):
+            self.dp_table.chart.close(unlink=True)
+        super().clear()
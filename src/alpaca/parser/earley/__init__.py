@@ -0,0 +1,2 @@
+from alpaca.parser.earley._earleyparser import EarleyParser
+from alpaca.parser.earley._earleyalgo import EarleyAlgo
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+from alpaca.config import Config
+from alpaca.grammar import CFG
+from alpaca.lexer import Token
+from alpaca.clr import AST, ASTToken
+from alpaca.parser._builder import Builder
+from alpaca.parser._reduction import Reduction
+
+class EarleyAlgo():
+    """
+    An Earley parser for the [cfg], beginning at the [start_symbol]. Unlike the CYK parser, it
+    runs on the original grammar rather than its normalized (CNF) form, and parses unambiguous
+    grammars in time close to linear in the number of tokens.
+
+    The chart is integer indexed. Each dotted rule (a rule with a dot at some position of its
+    pattern) has an index d, and the item for d which began at the set 'origin' is stored as the
+    single integer d * (n + 1) + origin, for n tokens. Moving the dot of an item forward adds
+    n + 1 to it.
+
+    Right recursion (e.g. LINES -> LINE ENDLS LINES) would complete a chain of items at every
+    token, taking quadratic time. Leo's optimization completes only the topmost item of such a
+    chain of deterministic reductions, and remembers how it was reached so that the skipped
+    items can be rebuilt along with the AST.
+
+    Alpaca grammars have no empty rules, so no item is completed in the set it began in.
+    """
+
+    def __init__(self, cfg: CFG, start_symbol: str = "START"):
+        self.cfg = cfg
+        self.start_symbol = start_symbol
+        self.rules = cfg.rules
+        self.reductions = [Reduction(rule, cfg) for rule in cfg.rules]
+        self.terminals = set(cfg.terminals)
+
+        self.first_dot: list[int] = []
+        self.dot_rule: list[int] = []
+        self.next_symbol: list[str | None] = []
+        for i, rule in enumerate(self.rules):
+            self.first_dot.append(len(self.dot_rule))
+            for pos in range(len(rule.pattern) + 1):
+                self.dot_rule.append(i)
+                self.next_symbol.append(rule.pattern[pos] if pos < len(rule.pattern) else None)
+
+        # Maps each production symbol to the first dotted rules of its rules.
+        self.predictions: dict[str, list[int]] = {}
+        for i, rule in enumerate(self.rules):
+            self.predictions.setdefault(rule.production_symbol, []).append(self.first_dot[i])
+
+    @classmethod
+    def tokens_to_clrtoken(cls, tokens: list[Token]) -> list[ASTToken]:
+        return [ASTToken(t.rule.type_chain, t.value, t.line_number) for t in tokens]
+
+    def parse(self, config: Config, tokens: list[Token], builder: Builder) -> AST:
+        nodes = EarleyAlgo.tokens_to_clrtoken(tokens)
+        self.recognize(nodes)
+        return Reduction.build(config, nodes, builder, self.reductions, self.get_steps())
+
+    def recognize(self, nodes: list[ASTToken]):
+        """
+        Fill the chart for the [nodes], raising an exception if they cannot be parsed.
+        """
+        n = len(nodes)
+        self.nodes = nodes
+        self.stride = stride = n + 1
+
+        # For each set of the chart: its items, in the order they were added; the same items as
+        # a set; the items waiting on each production symbol; the rule * stride + origin of the
+        # completed items of each production symbol; the memo of Leo's transitive items; and
+        # for each completed item added as a transitive item, the (origin, symbol) whose
+        # completion led to it.
+        self.sets: list[list[int]] = [[] for _ in range(n + 1)]
+        self.keys: list[set[int]] = [set() for _ in range(n + 1)]
+        self.waiting: list[dict[str, list[int]]] = [{} for _ in range(n + 1)]
+        self.completed: list[dict[str, list[int]]] = [{} for _ in range(n + 1)]
+        self.leo: list[dict[str, int | None]] = [{} for _ in range(n + 1)]
+        self.leo_links: list[dict[int, tuple[int, str]]] = [{} for _ in range(n + 1)]
+
+        next_symbol, dot_rule, rules = self.next_symbol, self.dot_rule, self.rules
+        for d in self.predictions.get(self.start_symbol, []):
+            self._add(0, d * stride)
+
+        for i in range(n + 1):
+            items, waiting, completed = self.sets[i], self.waiting[i], self.completed[i]
+            terminal = nodes[i].type if i < n else None
+            predicted: set[str] = set()
+            k = 0
+            while k < len(items):
+                item = items[k]
+                k += 1
+                d, origin = divmod(item, stride)
+                symbol = next_symbol[d]
+
+                if symbol is None:
+                    rule = dot_rule[d]
+                    production_symbol = rules[rule].production_symbol
+                    completed.setdefault(production_symbol, []).append(rule * stride + origin)
+                    top = self._get_transitive_item(origin, production_symbol)
+                    if top is not None:
+                        if self._add(i, top):
+                            top_rule, top_origin = self._get_completed_item(top)
+                            self.leo_links[i][top_rule * stride + top_origin] = (origin, production_symbol)
+                        continue
+                    for waiting_item in self.waiting[origin].get(production_symbol, []):
+                        self._add(i, waiting_item + stride)
+
+                elif symbol in self.terminals:
+                    if symbol == terminal:
+                        self._add(i + 1, item + stride)
+
+                else:
+                    waiting.setdefault(symbol, []).append(item)
+                    if symbol not in predicted:
+                        predicted.add(symbol)
+                        for first_dot in self.predictions.get(symbol, []):
+                            self._add(i, first_dot * stride + i)
+
+            if i < n and not self.sets[i + 1]:
+                raise self._get_syntax_error(i)
+
+        if not any(item % stride == 0 for item in self.completed[n].get(self.start_symbol, [])):
+            raise self._get_syntax_error(n)
+
+    def _add(self, i: int, item: int) -> bool:
+        keys = self.keys[i]
+        if item in keys:
+            return False
+        keys.add(item)
+        self.sets[i].append(item)
+        return True
+
+    def _get_completed_item(self, item: int) -> tuple[int, int]:
+        d, origin = divmod(item, self.stride)
+        return self.dot_rule[d], origin
+
+    def _get_transitive_item(self, origin: int, symbol: str) -> int | None:
+        """
+        Return the topmost item of the chain of deterministic reductions which the completion of
+        [symbol] at the set [origin] begins, or None if there is no such chain. The reduction is
+        deterministic if exactly one item of the set [origin] waits on [symbol], with [symbol]
+        as the last symbol of its pattern.
+        """
+        stride = self.stride
+        # The (set, symbol, completed item) of each deterministic reduction found on the way up
+        # the chain, whose transitive items are not yet known.
+        chain: list[tuple[int, str, int]] = []
+        while True:
+            memo = self.leo[origin]
+            if symbol in memo:
+                top = memo[symbol]
+                break
+
+            waiting_items = self.waiting[origin].get(symbol, [])
+            if len(waiting_items) != 1 or self.next_symbol[waiting_items[0] // stride + 1] is not None:
+                memo[symbol] = top = None
+                break
+
+            completed_item = waiting_items[0] + stride
+            chain.append((origin, symbol, completed_item))
+            d, origin = divmod(waiting_items[0], stride)
+            symbol = self.rules[self.dot_rule[d]].production_symbol
+
+        for chain_origin, chain_symbol, completed_item in reversed(chain):
+            if top is None:
+                top = completed_item
+            self.leo[chain_origin][chain_symbol] = top
+        return self.leo[chain[0][0]][chain[0][1]] if chain else top
+
+    def _get_leo_chain(self, origin: int, symbol: str, top: tuple[int, int]) -> list[tuple[int, int]]:
+        """
+        Return the (rule, origin) of each item skipped by the transitive [top] item which the
+        completion of [symbol] at the set [origin] led to, from the bottom of the chain up to
+        and including [top].
+        """
+        chain = []
+        while True:
+            d, origin = divmod(self.waiting[origin][symbol][0], self.stride)
+            rule = self.dot_rule[d]
+            chain.append((rule, origin))
+            if (rule, origin) == top:
+                return chain
+            symbol = self.rules[rule].production_symbol
+
+    def get_steps(self) -> list[int]:
+        """
+        Return the sequence of shifts and reductions of a parse of the recognized tokens (see
+        Reduction.build). Where the tokens have more than one parse, the completed item of the
+        rule which appears first in the grammar is chosen.
+        """
+        stride = self.stride
+        n = len(self.nodes)
+        reversed_steps: list[int] = []
+
+        # Each task is either None, to shift a token; a (symbol, start, end) to parse; or a
+        # (rule, start, end, chain, index, link) for an item which is known to parse, where the
+        # [chain] and [link] are those of the Leo chain the item is the [index]th item of.
+        tasks: list = [(self.start_symbol, 0, n)]
+        while tasks:
+            task = tasks.pop()
+            if task is None:
+                reversed_steps.append(Reduction.shift)
+                continue
+
+            if len(task) == 3:
+                symbol, start, end = task
+                rule = min(item // stride for item in self.completed[end][symbol]
+                    if item % stride == start)
+                link = self.leo_links[end].get(rule * stride + start, None)
+                if link is None:
+                    task = (rule, start, end, None, 0, None)
+                else:
+                    chain = self._get_leo_chain(*link, top=(rule, start))
+                    task = (rule, start, end, chain, len(chain) - 1, link)
+
+            reversed_steps.append(task[0])
+            tasks.extend(self._get_children(*task))
+
+        reversed_steps.reverse()
+        return reversed_steps
+
+    def _get_children(self, rule: int, start: int, end: int, chain: list[tuple[int, int]] | None,
+                      index: int, link: tuple[int, str] | None) -> list:
+        """
+        Return the tasks to parse each child of the completed item of [rule] from [start] to
+        [end], in order.
+        """
+        stride = self.stride
+        pattern = self.rules[rule].pattern
+        children = []
+        pos = end
+        for k in range(len(pattern) - 1, -1, -1):
+            symbol = pattern[k]
+            if symbol in self.terminals:
+                children.append(None)
+                pos -= 1
+            elif k == len(pattern) - 1 and chain is not None:
+                # The last child of an item of a Leo chain is the item below it in the chain.
+                if index > 0:
+                    child_rule, child_start = chain[index - 1]
+                    children.append((child_rule, child_start, pos, chain, index - 1, link))
+                    pos = child_start
+                else:
+                    child_start, child_symbol = link
+                    children.append((child_symbol, child_start, pos))
+                    pos = child_start
+            elif k == 0:
+                children.append((symbol, start, pos))
+                pos = start
+            else:
+                # Find where the child begins: the item of [rule] with the dot before the child
+                # must be in the set at that position.
+                prefix_item = (self.first_dot[rule] + k) * stride + start
+                child_start = next(item % stride for item in self.completed[pos][symbol]
+                    if prefix_item in self.keys[item % stride])
+                children.append((symbol, child_start, pos))
+                pos = child_start
+
+        children.reverse()
+        return children
+
+    def _get_syntax_error(self, pos: int) -> Exception:
+        expected = sorted({self.next_symbol[item // self.stride] for item in self.sets[pos]}
+            & self.terminals)
+        expected = ", ".join(f"'{terminal}'" for terminal in expected)
+        nodes = self.nodes
+        if pos == len(nodes):
+            line_number = nodes[-1].line_number if nodes else 0
+            return Exception(f"syntax error on line {line_number}: unexpected end of input "
+                + f"while parsing '{self.start_symbol}', expected one of {expected}")
+        return Exception(f"syntax error on line {nodes[pos].line_number}: unexpected "
+            + f"'{nodes[pos].value.strip()}' ({nodes[pos].type}), expected one of {expected}")
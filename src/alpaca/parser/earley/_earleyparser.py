@@ -0,0 +1,11 @@
+from __future__ import annotations
+from alpaca.config import Config
+from alpaca.parser._builder import Builder
+from alpaca.clr import AST
+from alpaca.lexer import Token
+from alpaca.parser.earley._earleyalgo import EarleyAlgo
+
+class EarleyParser:
+    def __new__(cls, config : Config, tokens : list[Token], builder : Builder) -> AST:
+        algo = EarleyAlgo(config.cfg, "START")
+        return algo.parse(config, tokens, builder)
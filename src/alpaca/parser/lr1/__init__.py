@@ -0,0 +1,3 @@
+from alpaca.parser.lr1._lr1parser import LR1Parser
+from alpaca.parser.lr1._lr1algo import LR1Algo
+from alpaca.parser.lr1._lr1table import ParseTable, ParseTableGenerator, Conflict
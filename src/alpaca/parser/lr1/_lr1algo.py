@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from alpaca.config import Config
+from alpaca.grammar import CFG
+from alpaca.lexer import Token
+from alpaca.clr import AST, ASTToken
+from alpaca.parser._builder import Builder
+from alpaca.parser._reduction import Reduction
+from alpaca.parser.lr1._lr1table import ParseTable
+
+class LR1Algo():
+    """
+    A table driven LR parser for the [cfg], beginning at the [start_symbol]. The actions of
+    each rule are applied through the Builder once the input is parsed, producing the same AST
+    as the CYK parser.
+
+    Where the table has a Conflict, the parser tries its actions in order and backtracks to the
+    last conflict if the input cannot be parsed. For grammars which are mostly deterministic
+    this is rare, and parsing takes time linear in the number of tokens. To backtrack cheaply,
+    the stack of states is a linked list of (state, rest of stack) pairs, and the Builder only
+    runs over the sequence of shifts and reductions of the parse which succeeded.
+    """
+
+    def __init__(self, cfg: CFG, start_symbol: str = "START", method: str = "lalr",
+                 cache_dir: str | None = ParseTable.default_cache_dir):
+        self.cfg = cfg
+        self.start_symbol = start_symbol
+        self.table = ParseTable.load(cfg, start_symbol, method, cache_dir)
+        self.reductions = [Reduction(rule, cfg) for rule in cfg.rules]
+
+    @classmethod
+    def tokens_to_clrtoken(cls, tokens: list[Token]) -> list[ASTToken]:
+        return [ASTToken(t.rule.type_chain, t.value, t.line_number) for t in tokens]
+
+    def parse(self, config: Config, tokens: list[Token], builder: Builder) -> AST:
+        nodes = LR1Algo.tokens_to_clrtoken(tokens)
+        return Reduction.build(config, nodes, builder, self.reductions, self.get_steps(nodes))
+
+    def get_steps(self, nodes: list[ASTToken]) -> list[int]:
+        """
+        Return the sequence of shifts and reductions which parses the [nodes] (see
+        Reduction.build).
+        """
+        actions, gotos = self.table.actions, self.table.gotos
+        end_of_input = ParseTable.end_of_input
+        rules = [(reduction.n_symbols, reduction.rule.production_symbol)
+            for reduction in self.reductions]
+
+        stack = (0, None)
+        steps: list[int] = []
+        pos = 0
+        # Each (pos, stack, number of steps, actions) from which the parse can be resumed with
+        # the untried actions of a Conflict.
+        backtracking_points: list[tuple[int, tuple, int, tuple[int, ...]]] = []
+        furthest_error: tuple[int, int] = (-1, 0)
+        while True:
+            terminal = nodes[pos].type if pos < len(nodes) else end_of_input
+            action = actions[stack[0]].get(terminal, None)
+            if type(action) is tuple:
+                backtracking_points.append((pos, stack, len(steps), action[1:]))
+                action = action[0]
+
+            if action is None:
+                if pos > furthest_error[0]:
+                    furthest_error = (pos, stack[0])
+                if not backtracking_points:
+                    raise self._get_syntax_error(nodes, *furthest_error)
+
+                pos, stack, n_steps, untried_actions = backtracking_points.pop()
+                del steps[n_steps:]
+                if len(untried_actions) > 1:
+                    backtracking_points.append((pos, stack, n_steps, untried_actions[1:]))
+                action = untried_actions[0]
+
+            if action >= 0:
+                stack = (action, stack)
+                steps.append(Reduction.shift)
+                pos += 1
+                continue
+
+            rule_index = -action - 1
+            if rule_index == self.table.accept_rule:
+                return steps
+
+            n_symbols, production_symbol = rules[rule_index]
+            for _ in range(n_symbols):
+                stack = stack[1]
+            stack = (gotos[stack[0]][production_symbol], stack)
+            steps.append(rule_index)
+
+    def _get_syntax_error(self, nodes: list[ASTToken], pos: int, state: int) -> Exception:
+        expected = ", ".join(f"'{terminal}'" for terminal in sorted(self.table.actions[state]))
+        if pos == len(nodes):
+            line_number = nodes[-1].line_number if nodes else 0
+            return Exception(f"syntax error on line {line_number}: unexpected end of input "
+                + f"while parsing '{self.start_symbol}', expected one of {expected}")
+        return Exception(f"syntax error on line {nodes[pos].line_number}: unexpected "
+            + f"'{nodes[pos].value.strip()}' ({nodes[pos].type}), expected one of {expected}")
@@ -3,7 +3,9 @@ from alpaca.config import Config
 from alpaca.parser._builder import Builder
 from alpaca.clr import AST
 from alpaca.lexer import Token
+from alpaca.parser.lr1._lr1algo import LR1Algo
 
 class LR1Parser:
-    def __new__(cls, config : Config, tokens : list[Token], builder : Builder) -> AST:
-        pass
+    def __new__(cls, config : Config, tokens : list[Token], builder : Builder, method : str="lalr") -> AST:
+        algo = LR1Algo(config.cfg, "START", method)
+        return algo.parse(config, tokens, builder)
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import os
+import pickle
+import hashlib
+import pathlib
+from dataclasses import dataclass
+
+from alpaca.grammar import CFG, CFGRule, Action
+
+Item = tuple[int, int]
+
+@dataclass
+class Conflict:
+    """
+    A cell of the ACTION table, for the [state] and the lookahead [terminal], which has more
+    than one possible action. The parser tries the [actions] in order, backtracking to the next
+    one if the input cannot be parsed with the previous: shifts are tried before reductions,
+    and reductions by rules which appear earlier in the grammar are tried first.
+    """
+    state: int
+    terminal: str
+    kind: str
+    actions: list[str]
+
+    def __str__(self) -> str:
+        return (f"state {self.state} on '{self.terminal}': {self.kind} conflict between "
+            + ", ".join(f"'{action}'" for action in self.actions))
+
+
+class ParseTable():
+    """
+    The ACTION and GOTO tables of an LR parser for a CFG, beginning at the [start_symbol]. The
+    [actions] of each state map a terminal to a number n:
+
+        n >= 0      shift the terminal and go to the state n
+        n < 0       reduce by the rule -(n+1) of the CFG; reducing by the [accept_rule] (which
+                    is one past the last rule of the CFG) accepts the input
+
+    If the cell has a Conflict, the action is instead a tuple of these numbers, in the order
+    in which they are tried. The [gotos] of each state map a production symbol to the state
+    after it is reduced.
+
+    As generating a table for a large grammar is slow, tables are cached in memory and, if a
+    [cache_dir] is given, as files named by the fingerprint of the grammar they were generated
+    for. By default this is a directory in the cache of the user ($XDG_CACHE_HOME, or
+    ~/.cache), so that it does not depend on the working directory.
+    """
+
+    end_of_input = "$"
+    methods = ("lalr", "lr1")
+    default_cache_dir = os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "alpaca", "lr1")
+
+    # Changes whenever the format of the table changes, so that stale cache files are ignored.
+    _version = 2
+    _tables: dict[str, ParseTable] = {}
+
+    def __init__(self, fingerprint: str, start_symbol: str, method: str, accept_rule: int,
+                 actions: list[dict[str, int | tuple[int, ...]]], gotos: list[dict[str, int]],
+                 conflicts: list[Conflict]):
+        self.fingerprint = fingerprint
+        self.start_symbol = start_symbol
+        self.method = method
+        self.accept_rule = accept_rule
+        self.actions = actions
+        self.gotos = gotos
+        self.conflicts = conflicts
+
+    @property
+    def n_states(self) -> int:
+        return len(self.actions)
+
+    def format_conflicts(self) -> str:
+        return "\n".join(str(conflict) for conflict in self.conflicts)
+
+    @staticmethod
+    def get_fingerprint(cfg: CFG, start_symbol: str, method: str) -> str:
+        # Reductions refer to rules by their index, so the order of the rules matters.
+        description = [ParseTable._version, method, start_symbol, sorted(cfg.terminals),
+            [(rule.production_symbol, rule.pattern) for rule in cfg.rules]]
+        return hashlib.sha256(repr(description).encode()).hexdigest()
+
+    @staticmethod
+    def load(cfg: CFG, start_symbol: str, method: str = "lalr",
+             cache_dir: str | None = default_cache_dir) -> ParseTable:
+        """
+        Return the table for the [cfg] from the cache, or generate it and add it to the cache.
+        """
+        if method not in ParseTable.methods:
+            raise Exception(f"unknown method to generate an LR table '{method}'")
+
+        fingerprint = ParseTable.get_fingerprint(cfg, start_symbol, method)
+        table = ParseTable._tables.get(fingerprint, None)
+        if table is None and cache_dir is not None:
+            table = ParseTable._read(pathlib.Path(cache_dir) / (fingerprint + ".pickle"))
+        if table is None:
+            table = ParseTableGenerator(method).run(cfg, start_symbol)
+            if cache_dir is not None:
+                ParseTable._write(pathlib.Path(cache_dir) / (fingerprint + ".pickle"), table)
+
+        ParseTable._tables[fingerprint] = table
+        return table
+
+    @staticmethod
+    def _read(path: pathlib.Path) -> ParseTable | None:
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @staticmethod
+    def _write(path: pathlib.Path, table: ParseTable):
+        # Written under a temporary name first, as other processes may read the cache meanwhile.
+        temporary_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporary_path, "wb") as f:
+                pickle.dump(table, f)
+            os.replace(temporary_path, path)
+        except OSError:
+            pass
+
+
+class ParseTableGenerator():
+    """
+    Generates the ParseTable of a CFG, using either [method]:
+
+        lalr        the LR(0) automaton, with the lookaheads of its items computed by
+                    propagation (the LALR(1) construction)
+        lr1         the canonical LR(1) automaton, which may have many more states, but has no
+                    reduce/reduce conflicts caused by merging states
+
+    Alpaca grammars have no empty rules, so only the kernel items of a state can be complete
+    and the FIRST set of a sequence of symbols is the FIRST set of its first symbol.
+    """
+
+    accept_symbol = "__ACCEPT__"
+
+    # Stands in for the lookaheads which are propagated from a kernel item; contains a space
+    # so it cannot be the name of a terminal.
+    _propagated = "# propagated"
+
+    def __init__(self, method: str = "lalr"):
+        self.method = method
+
+    def run(self, cfg: CFG, start_symbol: str) -> ParseTable:
+        self.cfg = cfg
+        self.rules = cfg.rules + [CFGRule(ParseTableGenerator.accept_symbol, start_symbol, Action("pass"))]
+        self.accept_rule = len(cfg.rules)
+        self.patterns = [rule.pattern for rule in self.rules]
+
+        self.rules_for: dict[str, list[int]] = {}
+        for i, rule in enumerate(self.rules):
+            self.rules_for.setdefault(rule.production_symbol, []).append(i)
+        self._init_first_sets()
+
+        match self.method:
+            case "lalr": transitions, reductions = self._generate_lalr()
+            case "lr1": transitions, reductions = self._generate_lr1()
+            case _: raise Exception(f"unknown method to generate an LR table '{self.method}'")
+
+        actions, gotos, conflicts = self._build_tables(transitions, reductions)
+        return ParseTable(
+            fingerprint=ParseTable.get_fingerprint(cfg, start_symbol, self.method),
+            start_symbol=start_symbol,
+            method=self.method,
+            accept_rule=self.accept_rule,
+            actions=actions,
+            gotos=gotos,
+            conflicts=conflicts)
+
+    def _init_first_sets(self):
+        self.first: dict[str, set[str]] = {symbol: set() for symbol in self.rules_for}
+        changed = True
+        while changed:
+            changed = False
+            for rule, pattern in zip(self.rules, self.patterns):
+                first_of_rule = self._get_first(pattern[0])
+                first_of_symbol = self.first[rule.production_symbol]
+                if not first_of_rule <= first_of_symbol:
+                    first_of_symbol |= first_of_rule
+                    changed = True
+
+    def _get_first(self, symbol: str) -> set[str]:
+        if self.cfg.is_production_symbol(symbol):
+            # A production symbol without rules derives nothing.
+            return self.first.get(symbol, set())
+        return {symbol}
+
+    def _closure(self, kernel: dict[Item, set[str]]) -> dict[Item, set[str]]:
+        """
+        Return the LR(1) closure of the [kernel] items, each mapped to its lookaheads.
+        """
+        items = {item: set(lookaheads) for item, lookaheads in kernel.items()}
+        pending = list(items)
+        while pending:
+            rule, dot = pending.pop()
+            pattern = self.patterns[rule]
+            if dot == len(pattern) or pattern[dot] not in self.rules_for:
+                continue
+
+            lookaheads = (self._get_first(pattern[dot + 1]) if dot + 1 < len(pattern)
+                else items[(rule, dot)])
+            for added_rule in self.rules_for[pattern[dot]]:
+                added_item = (added_rule, 0)
+                existing_lookaheads = items.get(added_item, None)
+                if existing_lookaheads is None:
+                    items[added_item] = set(lookaheads)
+                    pending.append(added_item)
+                elif not lookaheads <= existing_lookaheads:
+                    existing_lookaheads |= lookaheads
+                    pending.append(added_item)
+        return items
+
+    def _advance(self, items: dict[Item, set[str]]) -> dict[str, dict[Item, set[str]]]:
+        """
+        Return the kernels reached from the [items] by each symbol after a dot.
+        """
+        kernels: dict[str, dict[Item, set[str]]] = {}
+        for (rule, dot), lookaheads in items.items():
+            pattern = self.patterns[rule]
+            if dot < len(pattern):
+                kernels.setdefault(pattern[dot], {}).setdefault((rule, dot + 1), set()).update(lookaheads)
+        return kernels
+
+    def _generate_lr1(self) -> tuple[list[dict[str, int]], list[dict[str, list[int]]]]:
+        def get_key(kernel: dict[Item, set[str]]):
+            return frozenset((item, frozenset(lookaheads)) for item, lookaheads in kernel.items())
+
+        kernels = [{(self.accept_rule, 0): {ParseTable.end_of_input}}]
+        states = {get_key(kernels[0]): 0}
+        transitions: list[dict[str, int]] = []
+        reductions: list[dict[str, list[int]]] = []
+        for kernel in kernels:
+            transitions.append({})
+            reductions.append(self._get_reductions(kernel))
+            for symbol, next_kernel in self._advance(self._closure(kernel)).items():
+                key = get_key(next_kernel)
+                if key not in states:
+                    states[key] = len(kernels)
+                    kernels.append(next_kernel)
+                transitions[-1][symbol] = states[key]
+        return transitions, reductions
+
+    def _generate_lalr(self) -> tuple[list[dict[str, int]], list[dict[str, list[int]]]]:
+        # Build the LR(0) automaton.
+        kernels: list[frozenset[Item]] = [frozenset([(self.accept_rule, 0)])]
+        states = {kernels[0]: 0}
+        transitions: list[dict[str, int]] = []
+        for kernel in kernels:
+            transitions.append({})
+            closure = self._closure({item: set() for item in kernel})
+            for symbol, next_kernel in self._advance(closure).items():
+                key = frozenset(next_kernel)
+                if key not in states:
+                    states[key] = len(kernels)
+                    kernels.append(key)
+                transitions[-1][symbol] = states[key]
+
+        # Find the lookaheads which each kernel item generates spontaneously for the kernel items
+        # of its successors, and those which it propagates to them.
+        lookaheads: dict[tuple[int, Item], set[str]] = {(state, item): set()
+            for state, kernel in enumerate(kernels) for item in kernel}
+        propagates_to: dict[tuple[int, Item], list[tuple[int, Item]]] = {}
+        for state, kernel in enumerate(kernels):
+            for kernel_item in kernel:
+                targets = propagates_to.setdefault((state, kernel_item), [])
+                closure = self._closure({kernel_item: {ParseTableGenerator._propagated}})
+                for (rule, dot), item_lookaheads in closure.items():
+                    pattern = self.patterns[rule]
+                    if dot == len(pattern):
+                        continue
+                    target = (transitions[state][pattern[dot]], (rule, dot + 1))
+                    for lookahead in item_lookaheads:
+                        if lookahead == ParseTableGenerator._propagated:
+                            targets.append(target)
+                        else:
+                            lookaheads[target].add(lookahead)
+
+        lookaheads[(0, (self.accept_rule, 0))].add(ParseTable.end_of_input)
+        pending = list(lookaheads)
+        while pending:
+            source = pending.pop()
+            for target in propagates_to[source]:
+                if not lookaheads[source] <= lookaheads[target]:
+                    lookaheads[target] |= lookaheads[source]
+                    pending.append(target)
+
+        reductions = [self._get_reductions({item: lookaheads[(state, item)] for item in kernel})
+            for state, kernel in enumerate(kernels)]
+        return transitions, reductions
+
+    def _get_reductions(self, kernel: dict[Item, set[str]]) -> dict[str, list[int]]:
+        reductions: dict[str, list[int]] = {}
+        for (rule, dot), lookaheads in kernel.items():
+            if dot == len(self.patterns[rule]):
+                for lookahead in lookaheads:
+                    reductions.setdefault(lookahead, []).append(rule)
+        return reductions
+
+    def _build_tables(self, transitions: list[dict[str, int]], reductions: list[dict[str, list[int]]]
+                      ) -> tuple[list[dict[str, int | tuple[int, ...]]], list[dict[str, int]], list[Conflict]]:
+        actions: list[dict[str, int | tuple[int, ...]]] = []
+        gotos: list[dict[str, int]] = []
+        conflicts: list[Conflict] = []
+        for state, (state_transitions, state_reductions) in enumerate(zip(transitions, reductions)):
+            state_actions = {symbol: target for symbol, target in state_transitions.items()
+                if not self.cfg.is_production_symbol(symbol)}
+            gotos.append({symbol: target for symbol, target in state_transitions.items()
+                if self.cfg.is_production_symbol(symbol)})
+
+            for terminal, rules in sorted(state_reductions.items()):
+                rules = sorted(set(rules))
+                descriptions = [str(self.rules[rule]) for rule in rules]
+                reduce_actions = tuple(-(rule + 1) for rule in rules)
+                if terminal in state_actions:
+                    conflicts.append(Conflict(state, terminal, "shift/reduce",
+                        actions=[f"shift {terminal}"] + descriptions))
+                    state_actions[terminal] = (state_actions[terminal],) + reduce_actions
+                elif len(rules) > 1:
+                    conflicts.append(Conflict(state, terminal, "reduce/reduce", actions=descriptions))
+                    state_actions[terminal] = reduce_actions
+                else:
+                    state_actions[terminal] = reduce_actions[0]
+            actions.append(state_actions)
+        return actions, gotos, conflicts
@@ -1,4 +1,5 @@
 from logging import Formatter
 from alpaca.utils._flags import AbstractFlags
 from alpaca.utils._visitor import Visitor, VisitorException
+from alpaca.utils._profiler import VisitorProfiler, ProfileEntry
 from alpaca.utils._formatter import formatter
@@ -111,8 +111,11 @@ class formatter:
         parts = txt.split("\n")
         formatted_txt = ""
         for part in parts:
-            level -= part.count('}')
+            # only braces which close the line's leading blocks dedent the line itself, so that
+            # lines such as 'x = {0};' keep the indentation of their block
+            leading_closes = len(part) - len(part.lstrip('}'))
+            level -= leading_closes
             formatted_txt += indent*level + part + "\n"
-            level += part.count('{')
+            level += part.count('{') - (part.count('}') - leading_closes)
 
         return formatted_txt
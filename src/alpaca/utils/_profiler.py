@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+@dataclass
+class ProfileEntry():
+    visitor_name: str
+    node_type: str
+    calls: int = 0
+    inclusive_ns: int = 0
+    exclusive_ns: int = 0
+
+class _Frame():
+    __slots__ = ("key", "path", "start", "child_ns")
+
+    def __init__(self, key: tuple[str, str], path: str, start: int):
+        self.key = key
+        self.path = path
+        self.start = start
+        self.child_ns = 0
+
+class VisitorProfiler():
+    """
+    Aggregates the time spent by each Visitor inside the handler for each AST node type. Time is
+    tracked both inclusively (including all nested routes) and exclusively (only the time spent in
+    the handler itself), and the nesting of routes is recorded as collapsed stacks which can be
+    fed directly into flamegraph tools.
+    """
+
+    def __init__(self):
+        self.entries: dict[tuple[str, str], ProfileEntry] = {}
+        self.stacks: dict[str, int] = {}
+        self._frames: list[_Frame] = []
+        self._active: dict[tuple[str, str], int] = {}
+
+    @staticmethod
+    def frame_name(visitor_name: str, node_type: str) -> str:
+        return f"{visitor_name}({node_type})"
+
+    def enter(self, visitor_name: str, node_type: str):
+        name = VisitorProfiler.frame_name(visitor_name, node_type)
+        path = name if not self._frames else self._frames[-1].path + ";" + name
+        key = (visitor_name, node_type)
+        self._active[key] = self._active.get(key, 0) + 1
+        self._frames.append(_Frame(key, path, time.perf_counter_ns()))
+
+    def exit(self):
+        end = time.perf_counter_ns()
+        frame = self._frames.pop()
+        inclusive_ns = end - frame.start
+        exclusive_ns = inclusive_ns - frame.child_ns
+        if self._frames:
+            self._frames[-1].child_ns += inclusive_ns
+
+        entry = self.entries.get(frame.key)
+        if entry is None:
+            entry = ProfileEntry(*frame.key)
+            self.entries[frame.key] = entry
+
+        entry.calls += 1
+        entry.exclusive_ns += exclusive_ns
+        # only the outermost frame of a (visitor, node_type) pair contributes inclusive time, so
+        # that recursive node types (e.g. nested 'seq') are not counted multiple times.
+        self._active[frame.key] -= 1
+        if self._active[frame.key] == 0:
+            entry.inclusive_ns += inclusive_ns
+
+        self.stacks[frame.path] = self.stacks.get(frame.path, 0) + exclusive_ns
+
+    def reset(self):
+        self.entries = {}
+        self.stacks = {}
+        self._frames = []
+        self._active = {}
+
+    def get_entries(self) -> list[ProfileEntry]:
+        return sorted(self.entries.values(), key=lambda e: e.exclusive_ns, reverse=True)
+
+    def format_collapsed_stacks(self) -> str:
+        """
+        Return the profile in the collapsed stack format ('frame;frame;frame value') used by
+        flamegraph.pl, speedscope and similar tools. Values are exclusive times in microseconds.
+        """
+        return "".join(f"{path} {ns // 1000}\n" for path, ns in self.stacks.items())
+
+    def format_table(self, limit: int = None) -> str:
+        entries = self.get_entries()
+        if limit is not None:
+            entries = entries[:limit]
+
+        header = ("visitor", "node", "calls", "incl ms", "excl ms")
+        rows = [(e.visitor_name, e.node_type, str(e.calls),
+                 str(round(e.inclusive_ns / 1_000_000, 3)),
+                 str(round(e.exclusive_ns / 1_000_000, 3))) for e in entries]
+
+        widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header))]
+        lines = []
+        for row in [header] + rows:
+            # left align the names, right align the numbers
+            lines.append("  ".join(
+                [row[i].ljust(widths[i]) for i in range(2)]
+                + [row[i].rjust(widths[i]) for i in range(2, len(header))]))
+        return "\n".join(lines) + "\n"
+
+    def write_collapsed_stacks(self, filename: str):
+        with open(filename, 'w') as f:
+            f.write(self.format_collapsed_stacks())
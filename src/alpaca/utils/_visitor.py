@@ -4,6 +4,7 @@ import sys
 
 from alpaca.clr import AST, ASTToken
 from alpaca.logging._logger import Logger
+from alpaca.utils._profiler import VisitorProfiler
 
 class TaggedTransform():
     def __init__(self, types: list[str], f):
@@ -47,6 +48,25 @@ sys.excepthook = exceptions_hook
 class Visitor():
     max_depth = 100
 
+    # shared profiler for all visitors; if set, every route is timed and aggregated by visitor
+    # and ast type.
+    profiler: VisitorProfiler = None
+
+    # _route is only replaced by the profiling version while profiling is enabled, as each
+    # extra frame per node reduces how deeply nested the ASTs we can visit may be.
+    @staticmethod
+    def enable_profiling() -> VisitorProfiler:
+        Visitor.profiler = VisitorProfiler()
+        Visitor._route = Visitor._route_with_profiling
+        return Visitor.profiler
+
+    @staticmethod
+    def disable_profiling() -> VisitorProfiler:
+        profiler = Visitor.profiler
+        Visitor.profiler = None
+        Visitor._route = Visitor._route_without_profiling
+        return profiler
+
     @staticmethod
     def for_ast_types(*args: list[str]):
         def decorator(f):
@@ -116,7 +136,7 @@ class Visitor():
 
 
     def _perform_debug_safety_checks(self, ast: AST):
-        self.logger.log_debug(f"Depth: {self._depth}, routing for {ast.type}")
+        self.logger.log_debug("Depth: %i, routing for %s", self._depth, ast.type)
         self._depth += 1
         if self.debug and self._depth > self.max_depth:
             raise Exception(f"{self._get_loggable_name()} may be stuck in infinite recursion.")
@@ -138,5 +158,15 @@ class Visitor():
         except Exception as e:
             raise VisitorException(f"\n{self._get_loggable_name()} thrown from ast:\n{ast}") from e
 
+    _route_without_profiling = _route
+
+    def _route_with_profiling(self, ast: AST, state: Any):
+        profiler = Visitor.profiler
+        profiler.enter(self._get_loggable_name(), ast.type)
+        try:
+            return self._route_without_profiling(ast, state)
+        finally:
+            profiler.exit()
+
     def _get_loggable_name(self) -> str:
         return type(self).__name__
@@ -208,6 +208,10 @@ class Writer(Visitor):
                 raise Exception(f"if_ unknown type {child.type}")
         return parts
 
+    @Visitor.for_ast_types("paren")
+    def paren_(fn, ast: AST) -> list[str]:
+        return ["("] + fn.delegate(ast) + [")"]
+
     @Visitor.for_ast_types("addr")
     def addr_(fn, ast: AST) -> list[str]:
         return ["&"] + fn.delegate(ast)
@@ -0,0 +1,63 @@
+"""
+A thin client for a compiler started with `python src/main.py --serve SOCKET`. It only uses the
+standard library, so that it starts quickly, and sends a single request to the server.
+
+    python src/client.py SOCKET run path/to/file.en --target c -O2
+"""
+
+from __future__ import annotations
+
+import sys
+import json
+import socket
+import argparse
+import pathlib
+
+def request(socket_path: str, method: str, params: dict) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        message = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        connection.sendall((json.dumps(message) + "\n").encode())
+        with connection.makefile('r') as f:
+            return json.loads(f.readline())
+
+
+def print_result(method: str, result: dict):
+    for diagnostic in result["diagnostics"]:
+        print(f"line {diagnostic['line']}: {diagnostic['type']}: {diagnostic['description']}"
+            + (f" ({diagnostic['message']})" if diagnostic["message"] else ""),
+            file=sys.stderr)
+    match method:
+        case "compile" if result["artifact"] is not None: print(result["artifact"])
+        case "run" if result["output"] is not None: print(result["output"], end="")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("socket", type=str)
+    parser.add_argument("method", type=str, choices=["check", "compile", "run", "shutdown"])
+    parser.add_argument("input", type=str, nargs="?")
+    parser.add_argument("--target", type=str, default="python",
+        choices=["python", "c", "vm", "closures"])
+    parser.add_argument("-O", "--optimize", type=int, nargs="?", const=1, default=0)
+    parser.add_argument("--tree-shake", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print the raw JSON response")
+    args = parser.parse_args()
+
+    params = {}
+    if args.method != "shutdown":
+        if args.input is None:
+            parser.error(f"an input file is required for '{args.method}'")
+        params = {"path": str(pathlib.Path(args.input).resolve()), "tree_shaking": args.tree_shake}
+        if args.method != "check":
+            params |= {"target": args.target, "optimization_level": args.optimize}
+
+    response = request(args.socket, args.method, params)
+    if args.json:
+        print(json.dumps(response, indent=2))
+    elif "error" in response:
+        print(f"error: {response['error']['message']}", file=sys.stderr)
+        sys.exit(2)
+    elif response["result"] is not None:
+        print_result(args.method, response["result"])
+        sys.exit(0 if response["result"]["success"] else 1)
@@ -2,13 +2,18 @@ from eisen.tests.testrunner import TestRunner
 from eisen.parsing.builder import EisenBuilder
 from eisen.parsing.callback import EisenCallback
 from eisen.validation.workflow import Workflow
+from eisen.optimization.optimizer import Optimizer
 from eisen.parsing.superparser import SuperParser
 from eisen.interpretation.ast_interpreter import AstInterpreter
+from eisen.interpretation.bytecode_compiler import BytecodeCompiler
+from eisen.interpretation.vm import VirtualMachine
+from eisen.interpretation.closure_compiler import ClosureCompiler, ClosureInterpreter
 
 from eisen.conversion.writer import Writer
 from eisen.conversion.flattener import Flattener
 from eisen.conversion.transmutation import CTransmutation
 from eisen.conversion.dot_deref_filter import DotDerefFilter
 from eisen.conversion.to_python import ToPython
+from eisen.conversion.to_c import ToC
 
 from eisen.state.basestate import BaseState
@@ -28,6 +28,7 @@ class _SharedMixins:
         """
         if self.state.but_with_first_child().get_instances() is None: return None
         maybe_defining_ast = self.state.but_with_first_child().get_instances()[0].ast
+        if maybe_defining_ast is None: return None
         match maybe_defining_ast.type:
             case "def": return maybe_defining_ast
             case "create": return maybe_defining_ast
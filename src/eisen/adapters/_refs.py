@@ -148,11 +148,22 @@ class ModuleScope(AbstractNodeInterface):
         end = self.second_child().value
         return end, self._follow_chain(self.first_child())
 
-    def get_end_instance(self) -> Instance:
-        end, mods = self._unpack_structure()
+    def _resolve_module(self, mods: list[str]) -> Module:
+        # The first module is looked up in the enclosing module, then in each module which
+        # contains it, so that sibling modules (e.g. modules loaded from other files) can refer
+        # to each other.
         current_mod = self.state.get_enclosing_module()
+        while (current_mod.parent is not None
+                and mods[0] not in [child.name for child in current_mod.children]):
+            current_mod = current_mod.parent
+
         for mod_name in mods:
             current_mod = current_mod.get_child_by_name(mod_name)
+        return current_mod
+
+    def get_end_instance(self) -> Instance:
+        end, mods = self._unpack_structure()
+        current_mod = self._resolve_module(mods)
 
         instance = current_mod.get_obj("instance", end)
         if instance is None:
@@ -166,10 +177,7 @@ class ModuleScope(AbstractNodeInterface):
 
     def get_module(self) -> Module:
         _, mods = self._unpack_structure()
-        current_mod = self.state.get_enclosing_module()
-        for mod_name in mods:
-            current_mod = current_mod.get_child_by_name(mod_name)
-        return current_mod
+        return self._resolve_module(mods)
 
     def get_instance(self) -> Instance:
         return self.get_end_instance()
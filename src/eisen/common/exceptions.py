@@ -102,3 +102,7 @@ class Exceptions():
     class PartialConditionalInitialization(AbstractException):
         type = "PartialConditionalInitialization"
         description = "all branches must initialize/not-initialize references"
+
+    class UnsupportedByTarget(AbstractException):
+        type = "UnsupportedByTarget"
+        description = "feature is not supported by the target language"
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+from alpaca.concepts import SourceText
 from eisen.state.basestate import BaseState
 
 class ExceptionsHandler():
     def apply(cls, state: BaseState):
-        for e in state.exceptions:
+        source = SourceText.of(state.txt)
+        for e in state.watcher.take_unreported(state.exceptions):
             if state.print_to_watcher:
-                state.watcher.write(e.to_str_with_context(state.txt))
+                state.watcher.add_diagnostic(e, source)
             else:
-                print(e.to_str_with_context(state.txt))
+                print(e.to_str_with_context(source))
 
         return state.exceptions
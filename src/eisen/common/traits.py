@@ -68,20 +68,31 @@ class TraitsLogic:
         return f"#{details.trait_name}_for_{details.implementing_struct_name}_" + name_of_implemented_function
 
     @staticmethod
-    def get_python_writable_name_for_trait_class(
-            struct_name: str,
-            trait_name: str) -> str:
+    def get_python_writable_name_for_trait_method(
+            trait_name: str,
+            function_name: str) -> str:
+        """
+        Return the name of the method through which a trait function is called when converting to
+        Python. In Python, a trait is implemented by installing each of its functions directly as a
+        method of the class of the implementing struct, so a cast to the trait leaves the object
+        unchanged, and instance_of_struct.as(trait).function() becomes
+        instance_of_struct.trait__function(). The trait name is included to avoid collisions
+        between traits which declare functions of the same name.
         """
-        Return the name of the trait class to create when converting to Python. In Python, a trait is
-        represented as a class decorator which wraps the struct, stores an internal reference to the
-        struct, and contains the function definitions for all of the trait functions.
 
-        Thus, when a (trait_def ...) is processed, a Python class must be produced with name following
-        the form trait_for_struct, and when a instance_of_struct.as(trait) is processed, a new instance
-        of that decorator class is created like so: trait_for_struct(instance_of_struct)
+        return f"{trait_name}__{function_name}"
+
+    @staticmethod
+    def get_python_writable_name_for_trait_function(
+            struct_name: str,
+            trait_name: str,
+            function_name: str) -> str:
+        """
+        Return the name of the module level Python function which implements the trait function
+        [function_name] of [trait_name] for [struct_name], before it is installed as a method.
         """
 
-        return f"{trait_name}_for_{struct_name}"
+        return f"{trait_name}_for_{struct_name}_{function_name}"
 
     @staticmethod
     def is_trait_function(state: State, function_type: Type):
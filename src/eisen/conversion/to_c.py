@@ -0,0 +1,747 @@
+from __future__ import annotations
+
+import re
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken
+from alpaca.concepts import Type, TypeManifest
+import c
+
+from eisen.common.binding import Binding
+from eisen.common.eiseninstance import Instance
+from eisen.state.tocstate import ToCState as State
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor
+import eisen.adapters as adapters
+
+def code(value: str) -> ASTToken:
+    return ASTToken(type_chain=["code"], value=value)
+
+def call(name: str, params: list[AST | ASTToken]) -> AST:
+    return AST("call", lst=[AST("fn", lst=[code(name)]), AST("params", lst=params)])
+
+def decl(c_type: str, name: str, value: AST | ASTToken = None) -> AST:
+    declaration = AST("decl", lst=[AST("type", lst=[code(c_type)]), code(name)])
+    if value is None:
+        return declaration
+    return AST("=", lst=[declaration, value])
+
+
+class CNames:
+    """
+    Conventions for the names of everything that appears in the generated C source.
+    """
+
+    # Eisen identifiers which would collide with C keywords or with the parts of the C standard
+    # library used by the generated code.
+    reserved = {
+        "auto", "break", "case", "char", "const", "continue", "default", "do", "double", "else",
+        "enum", "extern", "float", "for", "goto", "if", "inline", "int", "long", "register",
+        "restrict", "return", "short", "signed", "sizeof", "static", "struct", "switch",
+        "typedef", "union", "unsigned", "void", "volatile", "while", "main", "printf", "malloc",
+        "calloc", "free", "strcmp", "NULL"}
+
+    @staticmethod
+    def sanitize(name: str) -> str:
+        return re.sub(r"\W", "_", name)
+
+    @staticmethod
+    def variable(name: str) -> str:
+        if name in CNames.reserved:
+            return name + "_"
+        return name
+
+    @staticmethod
+    def of_function(instance: Instance) -> str:
+        if instance.is_constructor:
+            # constructors are not mangled, so are suffixed to avoid shadowing by variables
+            return CNames.sanitize(instance.get_full_name()) + "_create"
+        return CNames.sanitize(instance.get_full_name())
+
+    @staticmethod
+    def of_realized_type(type: Type) -> str:
+        parts = [part for part in type.namespace.split("::") if part] + [type.name]
+        return CNames.sanitize("_".join(parts))
+
+    @staticmethod
+    def of_signature(type: Type) -> str:
+        return CNames.sanitize(Instance.get_signature_string(type))
+
+    @staticmethod
+    def of_trait_implementation(trait: Type, struct: Type) -> str:
+        return f"{CNames.of_realized_type(trait)}_for_{CNames.of_realized_type(struct)}"
+
+
+class CProgram:
+    """
+    Collects the parts of the C translation unit which are not produced directly from a function
+    body, such as type definitions, prototypes, and the glue which supports function values and
+    traits, and assembles them into a single source file.
+
+    Function values are represented as pointers to a 'struct __eisen_lmda', whose first member is
+    the function pointer which is called with the closure itself as its first argument. Curried
+    function values extend this struct with the curried arguments.
+    """
+
+    prelude = """#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+struct __eisen_lmda {
+    void (*f)(void);
+};
+
+static int __eisen_floordiv(int a, int b) {
+    int q = a / b;
+    if (a % b != 0 && (a < 0) != (b < 0)) q -= 1;
+    return q;
+}
+
+static const char* __eisen_bool_str(int b) {
+    return b ? "True" : "False";
+}
+
+static void* __eisen_move(void** owner) {
+    void* p = *owner;
+    *owner = NULL;
+    return p;
+}
+"""
+
+    def __init__(self):
+        self.forward_declarations: list[str] = []
+        self.traits: list[AST] = []
+        self.tuples: dict[str, AST] = {}
+        self.structs: list[AST] = []
+        self.prototypes: dict[str, str] = {}
+        self.support: dict[str, str] = {}
+        self.entry_point: str = None
+        self.n_curries = 0
+        self.n_temporaries = 0
+
+    @staticmethod
+    def realize(type: Type) -> Type:
+        if isinstance(type, TypeManifest):
+            return type.get_type()
+        return type
+
+    @staticmethod
+    def unpack(type: Type) -> list[Type]:
+        return [t for t in type.unpack() if not t.is_void()]
+
+    def new_temporary(self) -> str:
+        self.n_temporaries += 1
+        return f"__tmp{self.n_temporaries}"
+
+    def type_of(self, type: Type) -> str:
+        type = CProgram.realize(type)
+        if type.is_void(): return "void"
+        if type.is_nil(): return "void*"
+        if type.is_function(): return "struct __eisen_lmda*"
+        if type.is_tuple(): return f"struct {self.add_tuple(type)}"
+        if type.is_trait(): return f"struct {CNames.of_realized_type(type)}"
+        if type.is_struct(): return f"struct {CNames.of_realized_type(type)}*"
+        if type.is_novel():
+            match type.name:
+                case "int" | "bool": return "int"
+                case "flt": return "double"
+                case "str": return "char*"
+        raise Exception(f"C target does not support values of type {type}")
+
+    @staticmethod
+    def zero_of(c_type: str) -> str:
+        if c_type.endswith("*"): return "NULL"
+        if c_type.startswith("struct "): return "{0}"
+        return "0"
+
+    def argument_types_of(self, function_type: Type) -> list[str]:
+        return [self.type_of(t) for t in CProgram.unpack(function_type.get_argument_type())]
+
+    def add_tuple(self, type: Type) -> str:
+        name = "__tuple_" + CNames.of_signature(type)
+        if name not in self.tuples:
+            self.forward_declarations.append(f"struct {name};")
+            self.tuples[name] = AST("struct", lst=[code(name)]
+                + [decl(self.type_of(t), f"_{i}") for i, t in enumerate(type.unpack())])
+        return name
+
+    def add_struct(self, type: Type):
+        name = CNames.of_realized_type(type)
+        self.forward_declarations.append(f"struct {name};")
+        fields = [decl(self.type_of(t), CNames.variable(n))
+            for n, t in type.get_direct_attribute_name_type_pairs()]
+        self.structs.append(AST("struct", lst=[code(name)] + (fields or [code("char __empty")])))
+
+    def add_trait(self, type: Type):
+        """
+        A trait value is a struct holding the object which implements the trait, along with a
+        pointer to the implementation of each of the trait's functions for that object.
+        """
+        name = CNames.of_realized_type(type)
+        self.forward_declarations.append(f"struct {name};")
+        members = [code("void* _me")]
+        for fn_name, fn_type in type.get_direct_attribute_name_type_pairs():
+            ret = self.type_of(fn_type.get_return_type())
+            args = ["void*"] + [self.type_of(t) for t in CProgram.unpack(fn_type.get_argument_type())[1:]]
+            members.append(code(f"{ret} (*{CNames.variable(fn_name)})({', '.join(args)})"))
+
+            # Calling a trait function forwards the object stored in the trait value.
+            params = [f"struct {name} __t"] + [f"{t} __a{i}" for i, t in enumerate(args[1:])]
+            forwarded = ["__t._me"] + [f"__a{i}" for i in range(len(args) - 1)]
+            self._add_function(
+                name=f"{name}__{CNames.variable(fn_name)}",
+                ret=ret,
+                params=params,
+                body=f"__t.{CNames.variable(fn_name)}({', '.join(forwarded)})")
+        self.traits.append(AST("struct", lst=[code(name)] + members))
+
+    def add_trait_implementation(self, trait: Type, struct: Type):
+        name = CNames.of_trait_implementation(trait, struct)
+        if name in self.support:
+            return
+
+        # The implementations may be defined in another translation unit.
+        for fn_name, fn_type in trait.get_direct_attribute_name_type_pairs():
+            implementation = f"{name}_{CNames.variable(fn_name)}"
+            args = ["void*"] + [self.type_of(t) for t in CProgram.unpack(fn_type.get_argument_type())[1:]]
+            self.prototypes.setdefault(implementation,
+                f"{self.type_of(fn_type.get_return_type())} {implementation}({', '.join(args)});")
+
+        lines = [f"    struct {CNames.of_realized_type(trait)} __t;", "    __t._me = __me;"]
+        for fn_name in trait.get_all_component_names():
+            lines.append(f"    __t.{CNames.variable(fn_name)} = {name}_{CNames.variable(fn_name)};")
+        lines.append("    return __t;")
+        self.support[name] = (f"static struct {CNames.of_realized_type(trait)} {name}"
+            + f"(struct {CNames.of_realized_type(struct)}* __me) {{\n"
+            + "\n".join(lines) + "\n}\n")
+
+    def _add_function(self, name: str, ret: str, params: list[str], body: str):
+        statement = body if ret == "void" else "return " + body
+        self.support[name] = (f"static {ret} {name}({', '.join(params) or 'void'}) {{\n"
+            + f"    {statement};\n}}\n")
+
+    def declare_function(self, instance: Instance) -> str:
+        """
+        Return the name of the function [instance], which is declared by a prototype, as it may
+        be defined later or in another translation unit.
+        """
+        name = CNames.of_function(instance)
+        if name not in self.prototypes:
+            params = self.argument_types_of(instance.type)
+            self.prototypes[name] = (f"{self.type_of(instance.type.get_return_type())} {name}"
+                + f"({', '.join(params) or 'void'});")
+        return name
+
+    def get_invoker(self, function_type: Type) -> str:
+        """
+        Return the name of the function which calls a function value of [function_type].
+        """
+        name = "__invoke_" + CNames.of_signature(function_type)
+        if name not in self.support:
+            args = self.argument_types_of(function_type)
+            ret = self.type_of(function_type.get_return_type())
+            pointer_type = f"{ret} (*)({', '.join(['struct __eisen_lmda*'] + args)})"
+            forwarded = ["__c"] + [f"__a{i}" for i in range(len(args))]
+            self._add_function(
+                name=name,
+                ret=ret,
+                params=["struct __eisen_lmda* __c"] + [f"{t} __a{i}" for i, t in enumerate(args)],
+                body=f"(({pointer_type})__c->f)({', '.join(forwarded)})")
+        return name
+
+    def get_closure(self, instance: Instance) -> str:
+        """
+        Return an expression for the function value of the function [instance].
+        """
+        fn_name = self.declare_function(instance)
+        thunk, closure = fn_name + "__thunk", fn_name + "__closure"
+        if closure not in self.support:
+            args = self.argument_types_of(instance.type)
+            self._add_function(
+                name=thunk,
+                ret=self.type_of(instance.type.get_return_type()),
+                params=["struct __eisen_lmda* __c"] + [f"{t} __a{i}" for i, t in enumerate(args)],
+                body=f"{fn_name}({', '.join(f'__a{i}' for i in range(len(args)))})")
+            self.support[closure] = \
+                f"static struct __eisen_lmda {closure} = {{ (void (*)(void)){thunk} }};\n"
+        return "&" + closure
+
+    def add_curry(self, function_type: Type, n_curried: int, instance: Instance = None) -> str:
+        """
+        Return the name of the function which creates the function value obtained by currying the
+        first [n_curried] arguments of either the function [instance], or, if no instance is
+        given, of a function value (passed as the first parameter) of [function_type].
+        """
+        self.n_curries += 1
+        name = f"__curry{self.n_curries}"
+        args = self.argument_types_of(function_type)
+        curried, remaining = args[:n_curried], args[n_curried:]
+        ret = self.type_of(function_type.get_return_type())
+
+        members = ["void (*f)(void);"]
+        forwarded = [f"__e->a{i}" for i in range(len(curried))] \
+            + [f"__b{i}" for i in range(len(remaining))]
+        if instance is None:
+            members.append("struct __eisen_lmda* inner;")
+            target = self.get_invoker(function_type)
+            forwarded = ["__e->inner"] + forwarded
+        else:
+            target = self.declare_function(instance)
+        members += [f"{t} a{i};" for i, t in enumerate(curried)]
+        self.support[name] = f"struct {name} {{\n" + "".join(f"    {m}\n" for m in members) + "};\n"
+
+        statement = f"{target}({', '.join(forwarded)})"
+        if ret != "void":
+            statement = "return " + statement
+        self.support[name + "__thunk"] = (
+            f"static {ret} {name}__thunk("
+            + ", ".join(["struct __eisen_lmda* __c"] + [f"{t} __b{i}" for i, t in enumerate(remaining)])
+            + f") {{\n    struct {name}* __e = (struct {name}*)__c;\n    {statement};\n}}\n")
+
+        params = ([] if instance is not None else ["struct __eisen_lmda* inner"]) \
+            + [f"{t} a{i}" for i, t in enumerate(curried)]
+        lines = [f"struct {name}* __e = malloc(sizeof(struct {name}));",
+                 f"__e->f = (void (*)(void)){name}__thunk;"]
+        if instance is None:
+            lines.append("__e->inner = inner;")
+        lines += [f"__e->a{i} = a{i};" for i in range(len(curried))]
+        lines.append("return (struct __eisen_lmda*)__e;")
+        self.support[name + "__new"] = (
+            f"static struct __eisen_lmda* {name}__new({', '.join(params) or 'void'}) {{\n"
+            + "".join(f"    {line}\n" for line in lines) + "}\n")
+        return name + "__new"
+
+    def write(self, functions: list[AST]) -> str:
+        sections = [
+            CProgram.prelude,
+            "\n".join(self.forward_declarations) + "\n",
+            c.Writer().run(AST("start", lst=self.traits + list(self.tuples.values()) + self.structs)),
+            "\n".join(self.prototypes.values()) + "\n",
+            "\n".join(self.support.values()),
+            c.Writer().run(AST("start", lst=functions))]
+        if self.entry_point is not None:
+            sections.append(f"int main(void) {{\n    {self.entry_point}();\n    return 0;\n}}\n")
+        return "\n".join(sections)
+
+
+class ToC(Visitor):
+    """
+    Converts the Eisen AST into a C translation unit. Structs are heap allocated, and are referred
+    to by pointer; traits are passed by value as a pair of the implementing object and its
+    implementations of the trait functions.
+
+    A struct is freed when the variable which owns it goes out of scope. A variable owns the
+    struct if its binding makes it an allocation (e.g. 'let p = point(1, 2)'), or if the struct
+    is moved into it as an argument. Moving a struct out of a variable sets the variable to NULL,
+    so that it is not freed twice, even if the move is conditional. Struct allocations returned
+    from a function are owned by the caller, and unused results are freed immediately.
+
+    Function values created by currying are heap allocated and are never freed.
+    """
+
+    binary_ops = ["+", "-", "*", "/", "<", ">", "<=", ">=", "==", "!=", "and", "or"]
+
+    def __init__(self, debug: bool = False):
+        super().__init__(debug)
+        self.program: CProgram = None
+        self.external_modules: set[str] = set()
+
+    def run(self, state: State_PostInstanceVisitor, external_modules: list[str] = None) -> str:
+        """
+        Return the C translation unit of the program in [state]. The top level modules named in
+        [external_modules] are compiled in other translation units, so only their types are
+        defined in this one.
+        """
+        self.program = CProgram()
+        self.external_modules = set(external_modules or [])
+        functions = self.apply(State.create_from_basestate(state))
+        return self.program.write(functions)
+
+    def apply(self, state: State) -> AST:
+        return self._route(state.get_ast(), state)
+
+    def _apply_to_operand(fn, state: State, child: AST) -> AST:
+        result = fn.apply(state.but_with(ast=child))
+        if isinstance(child, AST) and child.type in ToC.binary_ops + ["!"]:
+            return AST("paren", lst=[result])
+        return result
+
+    def _is_of_novel_type(state: State, child: AST, name: str) -> bool:
+        type = CProgram.realize(state.but_with(ast=child).get_returned_type())
+        return type.is_novel() and type.name == name
+
+    @staticmethod
+    def _is_owner(type: Type) -> bool:
+        """
+        True if a variable of [type] owns the struct it refers to.
+        """
+        return (type.modifier in (Binding.new, Binding.mut_new, Binding.move)
+            and CProgram.realize(type).is_struct())
+
+    @staticmethod
+    def _is_allocation(type: Type) -> bool:
+        """
+        True if a call which returns [type] returns a new struct allocation.
+        """
+        return type.modifier == Binding.ret_new and CProgram.realize(type).is_struct()
+
+    @staticmethod
+    def _free(names: list[str]) -> list[AST]:
+        return [call("free", [code(name)]) for name in reversed(names)]
+
+    @Visitor.for_ast_types("annotation", "trait", "interface")
+    def annotation_(fn, state: State):
+        if state.get_ast_type() == "trait":
+            fn.program.add_trait(adapters.Trait(state).get_this_type())
+        return None
+
+    @Visitor.for_ast_types("start")
+    def start_(fn, state: State) -> list[AST]:
+        return fn._apply_to_definitions(state, state.get_all_children())
+
+    @Visitor.for_ast_types("mod")
+    def mod_(fn, state: State) -> list[AST]:
+        node = adapters.Mod(state)
+        if (node.get_module_name() in fn.external_modules
+                and state.get_enclosing_module() is state.get_global_module()):
+            fn._define_types(state.but_with(mod=node.get_entered_module()), state.get_child_asts())
+            return []
+        return fn._apply_to_definitions(state.but_with(mod=node.get_entered_module()),
+            state.get_child_asts())
+
+    def _define_types(fn, state: State, asts: list[AST]):
+        """
+        Define the structs and traits declared in [asts], which are part of a module compiled in
+        another translation unit. Its functions are declared where they are used.
+        """
+        for child in asts:
+            match child.type:
+                case "struct":
+                    fn.program.add_struct(adapters.Struct(state.but_with(ast=child)).get_this_type())
+                case "trait":
+                    fn.program.add_trait(adapters.Trait(state.but_with(ast=child)).get_this_type())
+                case "mod":
+                    node = adapters.Mod(state.but_with(ast=child))
+                    fn._define_types(state.but_with(mod=node.get_entered_module()),
+                        state.but_with(ast=child).get_child_asts())
+
+    def _apply_to_definitions(fn, state: State, asts: list[AST]) -> list[AST]:
+        definitions = []
+        for child in asts:
+            match fn.apply(state.but_with(ast=child)):
+                case list() as lst: definitions.extend(lst)
+                case None: pass
+                case ast: definitions.append(ast)
+        return definitions
+
+    @Visitor.for_ast_types("struct")
+    def struct_(fn, state: State) -> list[AST]:
+        node = adapters.Struct(state)
+        fn.program.add_struct(node.get_this_type())
+        if not node.has_create_ast():
+            return []
+        return [fn.apply(state.but_with(ast=node.get_create_ast()))]
+
+    @Visitor.for_ast_types("trait_def")
+    def trait_def_(fn, state: State) -> list[AST]:
+        node = adapters.TraitDef(state)
+        trait, struct = [state.get_corpus().get_type(
+                name=name,
+                environmental_namespace=state.get_enclosing_module().get_namespace_str(),
+                specified_namespace=None)
+            for name in (node.get_trait_name(), node.get_struct_name())]
+        fn.program.add_trait_implementation(trait, struct)
+        prefix = CNames.of_trait_implementation(trait, struct)
+        return [fn.apply(state.but_with(ast=child, trait_implementation_prefix=prefix))
+            for child in node.get_asts_of_implemented_functions()]
+
+    @Visitor.for_ast_types("def", "create")
+    def def_(fn, state: State) -> AST:
+        node = adapters.Def(state)
+        instance: Instance = state.get_instances()[0]
+        arg_names = [CNames.variable(name) for name in node.get_arg_names()]
+        arg_types = [fn.program.type_of(t) for t in CProgram.unpack(instance.type.get_argument_type())]
+        ret_names = [CNames.variable(name) for name in node.get_ret_names()]
+        ret_types = [fn.program.type_of(t) for t in CProgram.unpack(instance.type.get_return_type())]
+        ret_type = fn.program.type_of(instance.type.get_return_type())
+
+        name = CNames.of_function(instance)
+        params = list(zip(arg_types, arg_names))
+        prologue = []
+        if state.get_trait_implementation_prefix():
+            # Trait functions receive the implementing object untyped, as it is stored inside
+            # the trait value.
+            name = state.get_trait_implementation_prefix() + "_" + CNames.variable(node.get_function_name())
+            params[0] = ("void*", "__self")
+            prologue.append(decl(arg_types[0], arg_names[0], code("__self")))
+
+        for c_type, ret_name in zip(ret_types, ret_names):
+            value = CProgram.zero_of(c_type)
+            if instance.is_constructor:
+                value = f"calloc(1, sizeof({c_type[:-1]}))"
+            prologue.append(decl(c_type, ret_name, code(value)))
+
+        # Arguments which are moved into the function are owned by it.
+        owned_args = [name for name, t in zip(arg_names, CProgram.unpack(instance.type.get_argument_type()))
+            if ToC._is_owner(t)]
+        seq = fn.apply(state.but_with(
+            ast=node.get_seq_ast(),
+            ret_names=ret_names,
+            ret_type=instance.type.get_return_type(),
+            owners=[owned_args]))
+        seq._list = (prologue + seq._list + ToC._free(owned_args)
+            + [ToC._return(fn, ret_names, instance.type.get_return_type())])
+
+        c_params = [f"{t} {n}" for t, n in params]
+        fn.program.prototypes[name] = f"{ret_type} {name}({', '.join(c_params) or 'void'});"
+        if instance.name == "main" and state.get_enclosing_module() is state.get_global_module():
+            fn.program.entry_point = name
+
+        return AST("def", lst=[
+            AST("type", lst=[code(ret_type)]),
+            code(name),
+            AST("args", lst=[decl(t, n) for t, n in params] or [code("void")]),
+            seq])
+
+    def _return(fn, ret_names: list[str], ret_type: Type) -> AST:
+        match len(ret_names):
+            case 0: return AST("return", lst=[])
+            case 1: return AST("return", lst=[code(ret_names[0])])
+            case _: return AST("return", lst=[
+                code(f"({fn.program.type_of(ret_type)}){{{', '.join(ret_names)}}}")])
+
+    @Visitor.for_ast_types("return")
+    def return_(fn, state: State) -> list[AST]:
+        owners = [name for scope in state.get_owners() for name in scope]
+        return ToC._free(owners) + [ToC._return(fn, state.get_ret_names(), state.get_ret_type())]
+
+    @Visitor.for_ast_types("seq")
+    def seq_(fn, state: State) -> AST:
+        owners: list[str] = []
+        state = state.but_with(owners=state.get_owners() + [owners])
+        statements = []
+        for child in state.get_all_children():
+            match fn.apply(state.but_with(ast=child)):
+                case list() as lst: statements.extend(lst)
+                case None: pass
+                case ast if child.type == "call" and ToC._is_allocation(
+                        state.but_with(ast=child).get_returned_type()):
+                    statements.append(call("free", [ast]))
+                case ast: statements.append(ast)
+
+        if not statements or statements[-1].type != "return":
+            statements += ToC._free(owners)
+        return AST("seq", lst=statements)
+
+    @Visitor.for_ast_types("let")
+    def let_(fn, state: State) -> list[AST]:
+        names = [CNames.variable(name) for name in adapters.Decl(state).get_names()]
+        c_types = [fn.program.type_of(t) for t in state.get_returned_type().unpack()]
+        return [decl(t, name, code(CProgram.zero_of(t))) for t, name in zip(c_types, names)]
+
+    @Visitor.for_ast_types("ilet")
+    def ilet_(fn, state: State) -> list[AST]:
+        names = [CNames.variable(name) for name in adapters.InferenceAssign(state).get_names()]
+        c_types = [fn.program.type_of(t) for t in state.get_returned_type().unpack()]
+        state.get_owners()[-1].extend(name for name, t in zip(names, state.get_returned_type().unpack())
+            if ToC._is_owner(t))
+        if len(names) == 1:
+            return [decl(c_types[0], names[0], fn.apply(state.but_with_second_child()))]
+        statements, values = fn._unpack_values(state, state.second_child())
+        return statements + [decl(t, name, value) for t, name, value in zip(c_types, names, values)]
+
+    def _unpack_values(fn, state: State, ast: AST) -> tuple[list[AST], list[AST]]:
+        """
+        Return the values of the (tuple ...) or multiple return (call ...) [ast], along with any
+        statements which must precede them. The result of a call is stored in a temporary first.
+        """
+        if ast.type == "tuple":
+            return [], [fn.apply(state.but_with(ast=child)) for child in ast]
+
+        tmp = fn.program.new_temporary()
+        tuple_type = state.but_with(ast=ast).get_returned_type()
+        statements = [decl(fn.program.type_of(tuple_type), tmp, fn.apply(state.but_with(ast=ast)))]
+        return statements, [code(f"{tmp}._{i}") for i in range(len(tuple_type.unpack()))]
+
+    @Visitor.for_ast_types("=", "<-")
+    def assign_(fn, state: State) -> AST | list[AST]:
+        if state.first_child().type != "lvals":
+            return AST("=", lst=[fn.apply(state.but_with(ast=child))
+                for child in state.get_all_children()])
+
+        # Multiple assignment evaluates all values before assigning any of them.
+        targets = [fn.apply(state.but_with(ast=child)) for child in state.first_child()]
+        statements, values = fn._unpack_values(state, state.second_child())
+        if state.second_child().type == "tuple":
+            temporaries = []
+            for child, value in zip(state.second_child(), values):
+                tmp = fn.program.new_temporary()
+                c_type = fn.program.type_of(state.but_with(ast=child).get_returned_type())
+                statements.append(decl(c_type, tmp, value))
+                temporaries.append(code(tmp))
+            values = temporaries
+        return statements + [AST("=", lst=[target, value]) for target, value in zip(targets, values)]
+
+    @Visitor.for_ast_types("+=", "-=", "*=")
+    def compound_assign_(fn, state: State) -> AST:
+        return AST(state.get_ast_type(), lst=[fn.apply(state.but_with(ast=child))
+            for child in state.get_all_children()])
+
+    @Visitor.for_ast_types("/=")
+    def div_eq_(fn, state: State) -> AST:
+        target = fn.apply(state.but_with_first_child())
+        if not ToC._is_of_novel_type(state, state.first_child(), "int"):
+            return AST("/=", lst=[target, fn.apply(state.but_with_second_child())])
+        return AST("=", lst=[target,
+            call("__eisen_floordiv", [target, fn.apply(state.but_with_second_child())])])
+
+    @Visitor.for_ast_types("/")
+    def div_(fn, state: State) -> AST:
+        if not ToC._is_of_novel_type(state, state.first_child(), "int"):
+            return ToC.binop_(fn, state)
+        return call("__eisen_floordiv", [fn.apply(state.but_with(ast=child))
+            for child in state.get_all_children()])
+
+    @Visitor.for_ast_types("==", "!=")
+    def eq_(fn, state: State) -> AST:
+        if not ToC._is_of_novel_type(state, state.first_child(), "str"):
+            return ToC.binop_(fn, state)
+        return AST(state.get_ast_type(), lst=[
+            call("strcmp", [fn.apply(state.but_with(ast=child)) for child in state.get_all_children()]),
+            code("0")])
+
+    @Visitor.for_ast_types("+", "-", "*", "<", ">", "<=", ">=", "and", "or")
+    def binop_(fn, state: State) -> AST:
+        return AST(state.get_ast_type(), lst=[fn._apply_to_operand(state, child)
+            for child in state.get_all_children()])
+
+    @Visitor.for_ast_types("!")
+    def not_(fn, state: State) -> AST:
+        return AST("!", lst=[fn._apply_to_operand(state, state.first_child())])
+
+    @Visitor.for_ast_types("if", "while")
+    def if_(fn, state: State) -> AST:
+        return AST(state.get_ast_type(), lst=[fn.apply(state.but_with(ast=child))
+            for child in state.get_all_children()])
+
+    @Visitor.for_ast_types("cond")
+    def cond_(fn, state: State) -> AST:
+        return AST("cond", lst=[fn.apply(state.but_with(ast=child))
+            for child in state.get_all_children()])
+
+    @Visitor.for_ast_types("ref")
+    def ref_(fn, state: State) -> ASTToken:
+        return code(CNames.variable(adapters.Ref(state).get_name()))
+
+    @Visitor.for_ast_types(*adapters.BindingAST.ast_types)
+    def binding_(fn, state: State) -> ASTToken:
+        return code(CNames.variable(state.first_child().value))
+
+    @Visitor.for_ast_types(".")
+    def dot_(fn, state: State) -> AST:
+        return AST("->", lst=[
+            fn._apply_to_operand(state, state.first_child()),
+            code(CNames.variable(adapters.Scope(state).get_attribute_name()))])
+
+    @Visitor.for_ast_types("fn", "::")
+    def fn_(fn, state: State) -> ASTToken:
+        return code(fn.program.get_closure(ToC._get_function_instance(state)))
+
+    def _get_function_instance(state: State) -> Instance:
+        if state.get_ast_type() == "::":
+            return adapters.ModuleScope(state).get_instance()
+        return state.get_instances()[0]
+
+    @Visitor.for_ast_types("cast")
+    def cast_(fn, state: State) -> AST:
+        node = adapters.Cast(state)
+        if not node.get_cast_into_type().is_trait():
+            raise Exception("cast should only be for trait?")
+        fn.program.add_trait_implementation(node.get_cast_into_type(), node.get_original_type())
+        name = CNames.of_trait_implementation(node.get_cast_into_type(), node.get_original_type())
+        return call(name, [fn.apply(state.but_with_first_child())])
+
+    @Visitor.for_ast_types("call")
+    def call_(fn, state: State) -> AST:
+        node = adapters.Call(state)
+        if node.is_print():
+            return fn._print(state)
+        if node.is_append():
+            raise Exception("C target does not support vectors")
+
+        params = [ToC._apply_to_argument(fn, state, child, t)
+            for child, t in zip(state.second_child(), node.get_function_argument_type().unpack())]
+        if node.is_trait_function_call():
+            trait = CProgram.realize(state.but_with(ast=state.second_child().first()).get_returned_type())
+            attribute_name = adapters.Scope(state.but_with_first_child()).get_attribute_name()
+            return call(f"{CNames.of_realized_type(trait)}__{CNames.variable(attribute_name)}", params)
+
+        if state.first_child().type in ("fn", "::"):
+            instance = ToC._get_function_instance(state.but_with_first_child())
+            return call(fn.program.declare_function(instance), params)
+
+        function_type = state.but_with_first_child().get_returned_type()
+        return call(fn.program.get_invoker(function_type),
+            [fn.apply(state.but_with_first_child())] + params)
+
+    def _apply_to_argument(fn, state: State, child: AST, argument_type: Type) -> AST:
+        if argument_type.modifier == Binding.move and child.type == "ref":
+            name = CNames.variable(adapters.Ref(state.but_with(ast=child)).get_name())
+            return call("__eisen_move", [code(f"(void**)&{name}")])
+        return fn.apply(state.but_with(ast=child))
+
+    @Visitor.for_ast_types("curry_call")
+    def curry_call_(fn, state: State) -> AST:
+        curried = [fn.apply(state.but_with(ast=child)) for child in state.second_child()]
+        if state.first_child().type in ("fn", "::"):
+            instance = ToC._get_function_instance(state.but_with_first_child())
+            return call(fn.program.add_curry(instance.type, len(curried), instance), curried)
+
+        function_type = state.but_with_first_child().get_returned_type()
+        return call(fn.program.add_curry(function_type, len(curried)),
+            [fn.apply(state.but_with_first_child())] + curried)
+
+    def _print(fn, state: State) -> AST:
+        """
+        print(str, ...) formats each '%i' in the string with the next argument.
+        """
+        other_params = state.second_child()[1:]
+        parts = state.second_child().first().value.split("%i")
+        format_str = parts[0].replace("%", "%%")
+        args = []
+        for part, child in zip(parts[1:], other_params):
+            arg = fn.apply(state.but_with(ast=child))
+            type = CProgram.realize(state.but_with(ast=child).get_returned_type())
+            match type.name if type.is_novel() else None:
+                case "int": specifier = "%d"
+                case "str": specifier = "%s"
+                case "flt": specifier = "%g"
+                case "bool":
+                    specifier = "%s"
+                    arg = call("__eisen_bool_str", [arg])
+                case _: specifier = "%p"
+            format_str += specifier + part.replace("%", "%%")
+            args.append(arg)
+        return call("printf", [ToC._str(format_str)] + args)
+
+    @staticmethod
+    def _str(value: str) -> ASTToken:
+        escaped = (value.replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n")
+            .replace("\t", "\\t"))
+        return ASTToken(type_chain=["str"], value=escaped)
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State) -> ASTToken:
+        token: ASTToken = state.get_ast()
+        match token.value:
+            case "true": return code("1")
+            case "false": return code("0")
+            case "nil": return code("NULL")
+        if token.type == "str":
+            return ToC._str(token.value)
+        return code(token.value)
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        raise Exception(f"C target does not support '{state.get_ast_type()}'")
@@ -18,27 +18,14 @@ def no_content() -> AST:
     return AST("no_content", lst=[])
 
 class ToPython(Visitor):
+    # Eisen variables are emitted under their own names, so helpers are bound to names prefixed
+    # with '__eisen', which are reserved for the generated code, to avoid being shadowed.
     builtins = """
+import functools as __eisen_functools
+
 def append(a, b):
-    if isinstance(b, lmda):
-        b = b()
     a.append(b)
 
-"""
-
-    lmda = """
-class lmda:
-    def __init__(self, f):
-        self.f = f
-        self.params=list()
-
-    def __call__(self, *args):
-        return self.f(*self.params, *args)
-
-    def curry(self, args):
-        fn = lmda(self.f)
-        fn.params = self.params + args
-        return fn
 """
 
     def __init__(self, debug: bool = False):
@@ -63,7 +50,7 @@ class lmda:
         lst = []
         for child in state.get_all_children():
             match child.type:
-                case "mod": lst.extend(fn.apply(state.but_with(ast=child)))
+                case "mod" | "trait_def": lst.extend(fn.apply(state.but_with(ast=child)))
                 case "trait": pass
                 case _: lst.append(fn.apply(state.but_with(ast=child)))
 
@@ -72,16 +59,17 @@ class lmda:
     @Visitor.for_ast_types("mod")
     def mod_(fn, state: State) -> list[AST]:
         """
-        This is the only node which returns a list of ASTs, and must be handled differently
+        This node, like (trait_def ...), returns a list of ASTs, and must be handled differently
         """
         node = adapters.Mod(state)
         parts = []
         for child in state.get_child_asts():
             match child.type:
-                case "mod":
+                case "mod" | "trait_def":
                     parts.extend(fn.apply(state.but_with(
                         ast=child,
                         mod=node.get_entered_module())))
+                case "trait": pass
                 case _:
                     parts.append(fn.apply(state.but_with(
                         ast=child,
@@ -89,52 +77,44 @@ class lmda:
         return parts
 
     @Visitor.for_ast_types("trait_def")
-    def trait_def(fn, state: State):
+    def trait_def(fn, state: State) -> list[AST]:
+        """
+        A trait implementation is installed directly onto the class of the implementing struct.
+        Each implemented function is defined at module level, and then assigned as a method of the
+        struct class, so a cast is free and a call of a trait function is a single method lookup.
+        """
         node = adapters.TraitDef(state)
-        trait_class_name = TraitsLogic.get_python_writable_name_for_trait_class(
-            struct_name=node.get_struct_name(),
-            trait_name=node.get_trait_name())
-
-        # First build a new class representing the trait's implementation
-        class_pattern = """
-        ('class TRAIT_IMPLEMENTATION_CLASS_NAME
-            ('init
-                ('args 'self 'obj)
-                ('seq ('= ('. ('ref 'self) '_me) 'obj))))"""
-
-        x = Pattern(class_pattern).build({
-            "TRAIT_IMPLEMENTATION_CLASS_NAME": new_token(trait_class_name)
-        })
-
-        # Apply this visitor on the child (def ...) ASTs
-        fns = [fn.apply(state.but_with(ast=child))
-               for child in node.get_asts_of_implemented_functions()]
-
-        # Map the obtained (def ...) ASTs so that the [FIRST] argument (which is the object which
-        # implements the trait), is assigned to 'self._me' inside the trait object. When a cast
-        # occurs, the object will be wrapped with a new class of type [TRAIT_IMPLEMENTATION_CLASS_NAME]
-        # which will store a reference to the original object as 'self._me'
-        def_pattern = Pattern("('def NAME ('args FIRST XS_ARGS...) ('seq XS_SEQ...))")
-        new_fns = [
-            def_pattern.match(fn).to("""
-                ('def NAME ('args '__self XS_ARGS...)
-                    ('seq
-                        ('= ('ref FIRST) ('. ('ref '__self) '_me))
-                        XS_SEQ...
-                        ))""")
-            for fn in fns
-        ]
-
-        x._list.extend(new_fns)
-        return x
+        parts = []
+        def_pattern = Pattern("('def NAME ARGS SEQ)")
+        for child in node.get_asts_of_implemented_functions():
+            function_name = adapters.Def(state.but_with(ast=child)).get_function_name()
+            implementation_name = TraitsLogic.get_python_writable_name_for_trait_function(
+                struct_name=node.get_struct_name(),
+                trait_name=node.get_trait_name(),
+                function_name=function_name)
+            method_name = TraitsLogic.get_python_writable_name_for_trait_method(
+                trait_name=node.get_trait_name(),
+                function_name=function_name)
+
+            match = def_pattern.match(fn.apply(state.but_with(ast=child)))
+            parts.append(def_pattern.build({
+                "NAME": new_token(implementation_name),
+                "ARGS": match.ARGS,
+                "SEQ": match.SEQ}))
+            parts.append(Pattern("('= ('. STRUCT METHOD) IMPLEMENTATION)").build({
+                "STRUCT": new_token(node.get_struct_name()),
+                "METHOD": new_token(method_name),
+                "IMPLEMENTATION": new_token(implementation_name)}))
+        return parts
 
     @Visitor.for_ast_types("struct")
     def struct_(fn, state: State):
         class_pattern = """
         ('class NAME
+            ('= '__slots__ SLOTS)
             ('init
                 ('args SELF_NAME ARGS...)
-                ('seq DECLS... SEQ...)))
+                ('seq SEQ...)))
         """
 
         node = adapters.Struct(state)
@@ -149,17 +129,19 @@ class lmda:
 
         seq = fn.apply(state.but_with(create_node.get_seq_ast()))._list
 
-        # These are the self.attr = None lines that must be added.
-        decls = Pattern("(': (?? attr_name) _)").map(state.get_ast(),
-            into_pattern=f"('= ('. ('ref '{self_name.value}) attr_name) 'None)")
+        # The layout of the struct is fixed, so instances only need a slot for each attribute
+        # rather than a __dict__. No attribute is pre-assigned to None as the BindingChecker has
+        # already verified that the constructor initializes every attribute before it is used.
+        slots = AST("list", lst=[ASTToken(["str"], value=attr_name)
+            for attr_name in node.get_this_type().get_all_component_names()])
 
         return Pattern(class_pattern).build(
             {
                 "NAME": name,
+                "SLOTS": slots,
                 "SELF_NAME": self_name,
                 "ARGS": args,
                 "SEQ": seq,
-                "DECLS": decls
             }
         )
 
@@ -253,12 +235,10 @@ class lmda:
 
     @Visitor.for_ast_types("fn")
     def fn_(fn, state: State):
+        # Function values are plain Python functions; they are called directly and curried with
+        # functools.partial, so they never need to be wrapped.
         instance = state.get_instances()[0]
-        ast = Pattern(f"('fn '{instance.get_full_name()})").build()
-
-        if instance.no_lambda:
-            return Pattern("('fn name)").match(ast).to("('ref name)")
-        return Pattern("('fn name)").match(ast).to("('call ('ref 'lmda) ('params name))")
+        return Pattern(f"('ref '{instance.get_full_name()})").build()
 
     @Visitor.for_ast_types("call")
     def call_(fn, state: State):
@@ -283,6 +263,15 @@ class lmda:
         if node.is_trait_function_call():
             # Remove the first parameters which is the original object
             state.second_child()._list = state.second_child()._list[1:]
+            if state.first_child().type == ".":
+                method_name = TraitsLogic.get_python_writable_name_for_trait_method(
+                    trait_name=node.get_caller_type().name,
+                    function_name=state.first_child().second().value)
+                return AST("call", lst=[
+                    AST(".", lst=[
+                        fn.apply(state.but_with(ast=state.first_child().first())),
+                        new_token(method_name)]),
+                    fn.apply(state.but_with(ast=state.second_child()))])
 
         return AST("call", lst=[fn.apply(state.but_with(ast=child))
             for child in state.get_all_children()])
@@ -332,19 +321,15 @@ class lmda:
         node = adapters.Cast(state)
         if not node.get_cast_into_type().is_trait(): raise Exception("cast should only be for trait?")
 
-        name = TraitsLogic.get_python_writable_name_for_trait_class(
-            struct_name=node.get_original_type().name,
-            trait_name=node.get_cast_into_type().name)
-
-        return Pattern(f"('call ('ref '{name}) ('params OBJ))").build({
-            "OBJ": fn.apply(state.but_with_first_child())
-        })
+        # Trait implementations are methods of the struct class itself, so the object is already
+        # a valid trait value.
+        return fn.apply(state.but_with_first_child())
 
     @Visitor.for_ast_types("curry_call")
     def curry_call_(fn, state: State):
         state.get_ast()[0] = fn.apply(state.but_with_first_child())
         return Pattern("('curry_call FN ('curried XS...)").match(state.get_ast())\
-            .to("('call ('. FN 'curry) ('params ('list XS...)))")
+            .to("('call ('. ('ref '__eisen_functools) 'partial) ('params FN XS...))")
 
     @Visitor.for_ast_types("new_vec")
     def new_vec_(fn, state: State):
@@ -154,7 +154,7 @@ class AstInterpreter(Visitor):
         if node.is_print():
             args = [fn.apply(state.but_with(ast=ast))[0] for ast in state.get_ast().second()]
             redirect_to = True if state.print_to_watcher else None
-            state.watcher.txt += PrintFunction.emulate(redirect_to, *args)
+            state.watcher.write(PrintFunction.emulate(redirect_to, *args))
             return []
 
         # enter a new object context
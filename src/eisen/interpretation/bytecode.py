@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+class Op:
+    """
+    Opcodes of the register based bytecode. Each instruction is a tuple (op, a, b, c) where, unless
+    otherwise noted, 'a' is the destination register and 'b' and 'c' are source registers.
+    """
+
+    MOVE = 0            # r[a] = r[b]
+    LOADK = 1           # r[a] = constants[b]
+    ADD = 2             # r[a] = r[b] + r[c]
+    SUB = 3
+    MUL = 4
+    DIV = 5             # floor division
+    LT = 6
+    LE = 7
+    GT = 8
+    GE = 9
+    EQ = 10
+    NE = 11
+    NOT = 12            # r[a] = not r[b]
+    JUMP = 13           # pc = c
+    JUMP_IF_FALSE = 14  # if not r[a]: pc = c
+    JUMP_IF_TRUE = 15   # if r[a]: pc = c
+    GETFIELD = 16       # r[a] = r[b][c]
+    SETFIELD = 17       # r[a][b] = r[c]
+    NEW = 18            # r[a] = [None] * b
+    CALL = 19           # r[a] = functions[b](*r[c])
+    CALL_VALUE = 20     # r[a] = (function value r[b])(*r[c])
+    CALL_TRAIT = 21     # r[a] = (function b of the trait value r[c][0])(*r[c])
+    CURRY = 22          # r[a] = r[b] with the additional arguments r[c]
+    CAST = 23           # r[a] = (r[b], constants[c])
+    UNPACK = 24         # r[a] = r[b][0], r[b][1], ... for registers a
+    PRINT = 25          # print constants[a] formatted with r[b]
+    RETURN = 26         # return r[a] (a tuple of registers)
+
+    jumps = (JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE)
+
+    names: dict[int, str] = {}
+
+Op.names = {value: name for name, value in vars(Op).items() if isinstance(value, int)}
+
+Instruction = tuple[int, Any, Any, Any]
+
+@dataclass
+class BytecodeFunction:
+    """
+    A compiled function. The arguments are passed in the first [n_args] registers, and all locals
+    are resolved to fixed registers at compile time.
+    """
+    name: str
+    n_args: int = 0
+    n_registers: int = 0
+    code: list[Instruction] = field(default_factory=list)
+
+    def disassemble(self, constants: list[Any]) -> str:
+        lines = [f"{self.name} (args={self.n_args}, registers={self.n_registers})"]
+        for i, (op, a, b, c) in enumerate(self.code):
+            operands = [str(x) for x in (a, b, c) if x is not None]
+            comment = ""
+            match op:
+                case Op.LOADK: comment = f"  ; {constants[b]!r}"
+                case Op.PRINT: comment = f"  ; {constants[a]!r}"
+            lines.append(f"  {i:4} {Op.names[op]:<14}{' '.join(operands)}{comment}")
+        return "\n".join(lines)
+
+@dataclass
+class BytecodeProgram:
+    """
+    A program consists of functions referenced by index, and a shared pool of constants.
+    """
+    functions: list[BytecodeFunction] = field(default_factory=list)
+    constants: list[Any] = field(default_factory=list)
+    entry_point: int = None
+
+    def disassemble(self) -> str:
+        return "\n\n".join(f.disassemble(self.constants) for f in self.functions)
+
+class FunctionBuilder():
+    """
+    Emits the instructions of a single BytecodeFunction, and resolves each local variable name
+    to a fixed register.
+    """
+
+    def __init__(self, name: str):
+        self.function = BytecodeFunction(name)
+        self.slots: dict[str, int] = {}
+        self.temporaries: set[int] = set()
+        self.ret_registers: tuple[int, ...] = ()
+
+        # index of the last instruction if it only writes its result to register 'a', in which
+        # case the result can be retargeted to a different register instead of moved.
+        self._retargetable: int = None
+
+    def slot_of(self, name: str) -> int:
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.function.n_registers
+            self.function.n_registers += 1
+            self.slots[name] = slot
+        return slot
+
+    def new_register(self) -> int:
+        register = self.function.n_registers
+        self.function.n_registers += 1
+        self.temporaries.add(register)
+        return register
+
+    def here(self) -> int:
+        return len(self.function.code)
+
+    def emit(self, op: int, a=None, b=None, c=None) -> int:
+        self.function.code.append((op, a, b, c))
+        self._retargetable = None
+        return len(self.function.code) - 1
+
+    def emit_result(self, op: int, b=None, c=None) -> int:
+        """
+        Emit an instruction which writes its result to a new register, and return that register.
+        """
+        register = self.new_register()
+        self.emit(op, register, b, c)
+        self._retargetable = len(self.function.code) - 1
+        return register
+
+    def move(self, dst: int, src: int):
+        if dst == src:
+            return
+        if (self._retargetable == len(self.function.code) - 1
+                and src in self.temporaries
+                and self.function.code[-1][1] == src):
+            op, _, b, c = self.function.code[-1]
+            self.function.code[-1] = (op, dst, b, c)
+            self._retargetable = None
+            return
+        self.emit(Op.MOVE, dst, src)
+
+    def set_jump_target(self, index: int, target: int):
+        op, a, b, _ = self.function.code[index]
+        self.function.code[index] = (op, a, b, target)
+        self._retargetable = None
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+from typing import Any
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST
+from alpaca.concepts import Type, TypeManifest
+
+import eisen.adapters as adapters
+from eisen.common.traits import TraitImplementation
+from eisen.interpretation.bytecode import BytecodeProgram, BytecodeFunction, FunctionBuilder, Op
+from eisen.state.bytecodecompilerstate import BytecodeCompilerState as State
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor
+
+class BytecodeCompiler(Visitor):
+    """
+    Compiles the AST into a BytecodeProgram which can be run by the VirtualMachine. Handlers for
+    expressions return the register which holds the value of the expression; local variables are
+    resolved to a fixed register so their values are never copied to be read.
+
+    Values follow the semantics of the Python target: structs are lists of their fields (in the
+    order of declaration), function values are (function index, curried arguments) pairs, and
+    trait values are (object, table of function indices) pairs.
+    """
+
+    binary_ops = {
+        "+": Op.ADD, "-": Op.SUB, "*": Op.MUL, "/": Op.DIV,
+        "<": Op.LT, "<=": Op.LE, ">": Op.GT, ">=": Op.GE, "==": Op.EQ, "!=": Op.NE,
+    }
+
+    compound_ops = {"+=": Op.ADD, "-=": Op.SUB, "*=": Op.MUL, "/=": Op.DIV}
+
+    def __init__(self, debug: bool = False):
+        super().__init__(debug)
+        self.program: BytecodeProgram = None
+        self._function_indices: dict[str, int] = {}
+        self._constant_indices: dict[tuple[type, Any], int] = {}
+
+    def run(self, state: State_PostInstanceVisitor) -> BytecodeProgram:
+        self.program = BytecodeProgram()
+        self._function_indices = {}
+        self._constant_indices = {}
+        self.apply(State.create_from_basestate(state))
+        return self.program
+
+    def apply(self, state: State) -> int | None:
+        return self._route(state.get_ast(), state)
+
+    def _get_function_index(self, key: str) -> int:
+        """
+        Return the index of the function identified by [key], which may be compiled later.
+        """
+        index = self._function_indices.get(key)
+        if index is None:
+            index = len(self.program.functions)
+            self.program.functions.append(BytecodeFunction(key))
+            self._function_indices[key] = index
+        return index
+
+    def _get_constant(self, value: Any) -> int:
+        key = (type(value), value)
+        index = self._constant_indices.get(key)
+        if index is None:
+            index = len(self.program.constants)
+            self.program.constants.append(value)
+            self._constant_indices[key] = index
+        return index
+
+    @staticmethod
+    def get_field_index(type: Type, name: str) -> int:
+        if isinstance(type, TypeManifest):
+            type = type.get_type()
+        return type.get_all_component_names().index(name)
+
+    @staticmethod
+    def get_function_key(state: State) -> str:
+        if state.get_ast_type() == "::":
+            return adapters.ModuleScope(state).get_instance().get_full_name()
+        return state.get_instances()[0].get_full_name()
+
+    @Visitor.for_ast_types("annotation", "trait", "interface")
+    def skip_(fn, state: State) -> None:
+        return None
+
+    @Visitor.for_ast_types("start", "seq")
+    def seq_(fn, state: State) -> None:
+        for child in state.get_all_children():
+            fn.apply(state.but_with(ast=child))
+
+    @Visitor.for_ast_types("mod")
+    def mod_(fn, state: State) -> None:
+        node = adapters.Mod(state)
+        for child in state.get_child_asts():
+            fn.apply(state.but_with(ast=child, mod=node.get_entered_module()))
+
+    @Visitor.for_ast_types("struct")
+    def struct_(fn, state: State) -> None:
+        node = adapters.Struct(state)
+        if node.has_create_ast():
+            fn.apply(state.but_with(ast=node.get_create_ast()))
+
+    @Visitor.for_ast_types("trait_def")
+    def trait_def_(fn, state: State) -> None:
+        node = adapters.TraitDef(state)
+        trait, struct = [state.get_corpus().get_type(
+                name=name,
+                environmental_namespace=state.get_enclosing_module().get_namespace_str(),
+                specified_namespace=None)
+            for name in (node.get_trait_name(), node.get_struct_name())]
+
+        key = TraitImplementation.get_key(trait, struct)
+        for child in node.get_asts_of_implemented_functions():
+            fn.apply(state.but_with(ast=child, trait_implementation_key=key))
+
+    @Visitor.for_ast_types("def", "create")
+    def def_(fn, state: State) -> None:
+        node = adapters.Def(state)
+        instance = state.get_instances()[0]
+        key = instance.get_full_name()
+        if state.get_trait_implementation_key():
+            key = f"{state.get_trait_implementation_key()}.{node.get_function_name()}"
+
+        index = fn._get_function_index(key)
+        builder = FunctionBuilder(key)
+        for name in node.get_arg_names():
+            builder.slot_of(name)
+        builder.function.n_args = builder.function.n_registers
+        builder.ret_registers = tuple(builder.slot_of(name) for name in node.get_ret_names())
+
+        if instance.is_constructor:
+            n_fields = len(instance.type.get_return_type().get_all_component_names())
+            builder.emit(Op.NEW, builder.ret_registers[0], n_fields)
+
+        fn.apply(state.but_with(ast=node.get_seq_ast(), builder=builder))
+        builder.emit(Op.RETURN, builder.ret_registers)
+        fn.program.functions[index] = builder.function
+
+        if instance.name == "main" and state.get_enclosing_module() is state.get_global_module():
+            fn.program.entry_point = index
+
+    @Visitor.for_ast_types("return")
+    def return_(fn, state: State) -> None:
+        state.get_builder().emit(Op.RETURN, state.get_builder().ret_registers)
+
+    @Visitor.for_ast_types("let")
+    def let_(fn, state: State) -> None:
+        builder = state.get_builder()
+        for name in adapters.Decl(state).get_names():
+            builder.emit(Op.LOADK, builder.slot_of(name), fn._get_constant(None))
+
+    @Visitor.for_ast_types("ilet")
+    def ilet_(fn, state: State) -> None:
+        builder = state.get_builder()
+        slots = [builder.slot_of(name) for name in adapters.InferenceAssign(state).get_names()]
+        value_ast = state.second_child()
+        if len(slots) == 1:
+            builder.move(slots[0], fn.apply(state.but_with_second_child()))
+        elif value_ast.type == "tuple":
+            registers = [fn.apply(state.but_with(ast=child)) for child in value_ast]
+            for slot, register in zip(slots, registers):
+                builder.move(slot, register)
+        else:
+            builder.emit(Op.UNPACK, tuple(slots), fn.apply(state.but_with_second_child()))
+
+    @Visitor.for_ast_types("=", "<-")
+    def assign_(fn, state: State) -> None:
+        builder = state.get_builder()
+        if state.first_child().type != "lvals":
+            fn._assign_to(state, state.first_child(), fn.apply(state.but_with_second_child()))
+            return
+
+        # All values must be obtained before any are assigned, so they are kept in temporaries.
+        targets = state.first_child().get_all_children()
+        if state.second_child().type == "tuple":
+            temporaries = []
+            for child in state.second_child():
+                register = fn.apply(state.but_with(ast=child))
+                if register not in builder.temporaries:
+                    temporary = builder.new_register()
+                    builder.emit(Op.MOVE, temporary, register)
+                    register = temporary
+                temporaries.append(register)
+        else:
+            temporaries = tuple(builder.new_register() for _ in targets)
+            builder.emit(Op.UNPACK, temporaries, fn.apply(state.but_with_second_child()))
+
+        for target, register in zip(targets, temporaries):
+            fn._assign_to(state, target, register)
+
+    def _assign_to(fn, state: State, target: AST, register: int):
+        builder = state.get_builder()
+        match target.type:
+            case ".":
+                obj = fn.apply(state.but_with(ast=target.first()))
+                index = BytecodeCompiler.get_field_index(
+                    state.but_with(ast=target.first()).get_returned_type(),
+                    adapters.Scope(state.but_with(ast=target)).get_attribute_name())
+                builder.emit(Op.SETFIELD, obj, index, register)
+            case _:
+                builder.move(builder.slot_of(target.first().value), register)
+
+    @Visitor.for_ast_types("+=", "-=", "*=", "/=")
+    def compound_assign_(fn, state: State) -> None:
+        builder = state.get_builder()
+        op = BytecodeCompiler.compound_ops[state.get_ast_type()]
+        target = state.first_child()
+        if target.type != ".":
+            slot = builder.slot_of(target.first().value)
+            builder.emit(op, slot, slot, fn.apply(state.but_with_second_child()))
+            return
+
+        obj = fn.apply(state.but_with(ast=target.first()))
+        index = BytecodeCompiler.get_field_index(
+            state.but_with(ast=target.first()).get_returned_type(),
+            adapters.Scope(state.but_with(ast=target)).get_attribute_name())
+        current = builder.emit_result(Op.GETFIELD, obj, index)
+        result = builder.emit_result(op, current, fn.apply(state.but_with_second_child()))
+        builder.emit(Op.SETFIELD, obj, index, result)
+
+    @Visitor.for_ast_types(*binary_ops.keys())
+    def binop_(fn, state: State) -> int:
+        left = fn.apply(state.but_with_first_child())
+        right = fn.apply(state.but_with_second_child())
+        return state.get_builder().emit_result(
+            BytecodeCompiler.binary_ops[state.get_ast_type()], left, right)
+
+    @Visitor.for_ast_types("and", "or")
+    def shortcircuit_(fn, state: State) -> int:
+        builder = state.get_builder()
+        result = builder.new_register()
+        builder.move(result, fn.apply(state.but_with_first_child()))
+        jump = builder.emit(Op.JUMP_IF_FALSE if state.get_ast_type() == "and" else Op.JUMP_IF_TRUE,
+            result)
+        builder.move(result, fn.apply(state.but_with_second_child()))
+        builder.set_jump_target(jump, builder.here())
+        return result
+
+    @Visitor.for_ast_types("!")
+    def not_(fn, state: State) -> int:
+        return state.get_builder().emit_result(Op.NOT, fn.apply(state.but_with_first_child()))
+
+    @Visitor.for_ast_types("if")
+    def if_(fn, state: State) -> None:
+        builder = state.get_builder()
+        jumps_to_end = []
+        for child in state.get_all_children():
+            if child.type != "cond":
+                fn.apply(state.but_with(ast=child))
+                continue
+
+            condition = fn.apply(state.but_with(ast=child.first()))
+            jump_to_next = builder.emit(Op.JUMP_IF_FALSE, condition)
+            fn.apply(state.but_with(ast=child.second()))
+            jumps_to_end.append(builder.emit(Op.JUMP))
+            builder.set_jump_target(jump_to_next, builder.here())
+
+        for jump in jumps_to_end:
+            builder.set_jump_target(jump, builder.here())
+
+    @Visitor.for_ast_types("while")
+    def while_(fn, state: State) -> None:
+        builder = state.get_builder()
+        cond = state.first_child()
+        start = builder.here()
+        jump_to_end = builder.emit(Op.JUMP_IF_FALSE, fn.apply(state.but_with(ast=cond.first())))
+        fn.apply(state.but_with(ast=cond.second()))
+        builder.emit(Op.JUMP, c=start)
+        builder.set_jump_target(jump_to_end, builder.here())
+
+    @Visitor.for_ast_types("call")
+    def call_(fn, state: State) -> int | None:
+        builder = state.get_builder()
+        node = adapters.Call(state)
+        if node.is_print():
+            format_str = state.second_child().first().value.replace("%i", "{}")
+            args = tuple(fn.apply(state.but_with(ast=child)) for child in state.second_child()[1:])
+            builder.emit(Op.PRINT, fn._get_constant(format_str), args)
+            return None
+        if node.is_append():
+            raise Exception("bytecode does not support vectors")
+
+        args = tuple(fn.apply(state.but_with(ast=child)) for child in state.second_child())
+        if node.is_trait_function_call():
+            index = BytecodeCompiler.get_field_index(
+                state.but_with(ast=state.second_child().first()).get_returned_type(),
+                adapters.Scope(state.but_with_first_child()).get_attribute_name())
+            return builder.emit_result(Op.CALL_TRAIT, index, args)
+
+        if state.first_child().type in ("fn", "::"):
+            index = fn._get_function_index(
+                BytecodeCompiler.get_function_key(state.but_with_first_child()))
+            return builder.emit_result(Op.CALL, index, args)
+
+        return builder.emit_result(Op.CALL_VALUE, fn.apply(state.but_with_first_child()), args)
+
+    @Visitor.for_ast_types("curry_call")
+    def curry_call_(fn, state: State) -> int:
+        function = fn.apply(state.but_with_first_child())
+        args = tuple(fn.apply(state.but_with(ast=child)) for child in state.second_child())
+        return state.get_builder().emit_result(Op.CURRY, function, args)
+
+    @Visitor.for_ast_types("fn", "::")
+    def fn_(fn, state: State) -> int:
+        index = fn._get_function_index(BytecodeCompiler.get_function_key(state))
+        return state.get_builder().emit_result(Op.LOADK, fn._get_constant((index, ())))
+
+    @Visitor.for_ast_types("cast")
+    def cast_(fn, state: State) -> int:
+        node = adapters.Cast(state)
+        key = TraitImplementation.get_key(node.get_cast_into_type(), node.get_original_type())
+        table = tuple(fn._get_function_index(f"{key}.{name}")
+            for name in node.get_cast_into_type().get_all_component_names())
+        return state.get_builder().emit_result(Op.CAST,
+            fn.apply(state.but_with_first_child()), fn._get_constant(table))
+
+    @Visitor.for_ast_types(".")
+    def dot_(fn, state: State) -> int:
+        index = BytecodeCompiler.get_field_index(
+            state.but_with_first_child().get_returned_type(),
+            adapters.Scope(state).get_attribute_name())
+        return state.get_builder().emit_result(Op.GETFIELD,
+            fn.apply(state.but_with_first_child()), index)
+
+    @Visitor.for_ast_types("ref")
+    def ref_(fn, state: State) -> int:
+        return state.get_builder().slot_of(adapters.Ref(state).get_name())
+
+    @Visitor.for_tokens
+    def token_(fn, state: State) -> int:
+        token = state.get_ast()
+        match token.type:
+            case "int": value = int(token.value)
+            case "bool": value = token.value == "true"
+            case "nil": value = None
+            case _: value = token.value
+        return state.get_builder().emit_result(Op.LOADK, fn._get_constant(value))
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        raise Exception(f"bytecode does not support '{state.get_ast_type()}'")
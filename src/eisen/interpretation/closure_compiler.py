@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import sys
+from operator import itemgetter
+from typing import Any, Callable
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST
+
+import eisen.adapters as adapters
+from eisen.common.traits import TraitImplementation
+from eisen.interpretation.obj import Obj
+from eisen.interpretation.closures import CompiledFunction, FrameLayout
+from eisen.interpretation.bytecode_compiler import BytecodeCompiler
+from eisen.state.closurecompilerstate import ClosureCompilerState as State
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor
+
+Closure = Callable[[list], Any]
+
+class ClosureCompiler(Visitor):
+    """
+    Compiles the AST into closures, where each node becomes a Python function over the frame of
+    the enclosing Eisen function. Expressions return their value, and statements return True if
+    the function should return, so that no exceptions are needed for control flow.
+
+    Values share the representation used by the VirtualMachine: structs are lists of fields,
+    function values are (function, curried arguments) pairs, and trait values are
+    (object, table of functions) pairs.
+    """
+
+    # nodes which are compiled into statements; any other node used as a statement is an
+    # expression whose value is discarded.
+    statement_types = ["=", "<-", "let", "ilet", "+=", "-=", "*=", "/=",
+                       "if", "while", "return", "seq", "annotation"]
+
+    compound_ops = {"+=": "+", "-=": "-", "*=": "*", "/=": "/"}
+
+    def __init__(self, write: Callable[[str], Any] = None, debug: bool = False):
+        super().__init__(debug)
+        self.write = write
+        self.functions: dict[str, CompiledFunction] = {}
+        self.entry_point: CompiledFunction = None
+
+    def run(self, state: State_PostInstanceVisitor) -> CompiledFunction:
+        """
+        Compile the program and return the 'main' function.
+        """
+        self.functions = {}
+        self.apply(State.create_from_basestate(state))
+        return self.entry_point
+
+    def apply(self, state: State) -> Closure | None:
+        return self._route(state.get_ast(), state)
+
+    def _get_function(self, key: str) -> CompiledFunction:
+        """
+        Return the function identified by [key], which may be compiled later.
+        """
+        function = self.functions.get(key)
+        if function is None:
+            function = CompiledFunction(key)
+            self.functions[key] = function
+        return function
+
+    def _apply_as_statement(fn, state: State) -> Closure:
+        closure = fn.apply(state)
+        if state.get_ast_type() in ClosureCompiler.statement_types:
+            return closure
+
+        def statement(frame):
+            closure(frame)
+        return statement
+
+    @Visitor.for_ast_types("annotation", "trait", "interface")
+    def skip_(fn, state: State) -> Closure:
+        return lambda frame: None
+
+    @Visitor.for_ast_types("start")
+    def start_(fn, state: State) -> None:
+        for child in state.get_all_children():
+            fn.apply(state.but_with(ast=child))
+
+    @Visitor.for_ast_types("mod")
+    def mod_(fn, state: State) -> None:
+        node = adapters.Mod(state)
+        for child in state.get_child_asts():
+            fn.apply(state.but_with(ast=child, mod=node.get_entered_module()))
+
+    @Visitor.for_ast_types("struct")
+    def struct_(fn, state: State) -> None:
+        node = adapters.Struct(state)
+        if node.has_create_ast():
+            fn.apply(state.but_with(ast=node.get_create_ast()))
+
+    @Visitor.for_ast_types("trait_def")
+    def trait_def_(fn, state: State) -> None:
+        node = adapters.TraitDef(state)
+        trait, struct = [state.get_corpus().get_type(
+                name=name,
+                environmental_namespace=state.get_enclosing_module().get_namespace_str(),
+                specified_namespace=None)
+            for name in (node.get_trait_name(), node.get_struct_name())]
+
+        key = TraitImplementation.get_key(trait, struct)
+        for child in node.get_asts_of_implemented_functions():
+            fn.apply(state.but_with(ast=child, trait_implementation_key=key))
+
+    @Visitor.for_ast_types("def", "create")
+    def def_(fn, state: State) -> None:
+        node = adapters.Def(state)
+        instance = state.get_instances()[0]
+        key = instance.get_full_name()
+        if state.get_trait_implementation_key():
+            key = f"{state.get_trait_implementation_key()}.{node.get_function_name()}"
+
+        layout = FrameLayout()
+        for name in node.get_arg_names():
+            layout.slot_of(name)
+        ret_slots = [layout.slot_of(name) for name in node.get_ret_names()]
+
+        body = fn.apply(state.but_with(ast=node.get_seq_ast(), layout=layout))
+        if instance.is_constructor:
+            self_slot = ret_slots[0]
+            n_fields = len(instance.type.get_return_type().get_all_component_names())
+            seq = body
+            def body(frame):
+                frame[self_slot] = [None] * n_fields
+                seq(frame)
+
+        function = fn._get_function(key)
+        function.body = body
+        function.n_slots = len(layout)
+        match len(ret_slots):
+            case 0: function.get_result = lambda frame: None
+            case 1: function.get_result = itemgetter(ret_slots[0])
+            case _: function.get_result = lambda frame: tuple(frame[i] for i in ret_slots)
+
+        if instance.name == "main" and state.get_enclosing_module() is state.get_global_module():
+            fn.entry_point = function
+
+    @Visitor.for_ast_types("return")
+    def return_(fn, state: State) -> Closure:
+        return lambda frame: True
+
+    @Visitor.for_ast_types("seq")
+    def seq_(fn, state: State) -> Closure:
+        statements = [fn._apply_as_statement(state.but_with(ast=child))
+            for child in state.get_all_children()]
+
+        def seq(frame):
+            for statement in statements:
+                if statement(frame):
+                    return True
+        return seq
+
+    @Visitor.for_ast_types("let")
+    def let_(fn, state: State) -> Closure:
+        slots = [state.get_layout().slot_of(name) for name in adapters.Decl(state).get_names()]
+        def let(frame):
+            for slot in slots:
+                frame[slot] = None
+        return let
+
+    @Visitor.for_ast_types("ilet")
+    def ilet_(fn, state: State) -> Closure:
+        slots = [state.get_layout().slot_of(name)
+            for name in adapters.InferenceAssign(state).get_names()]
+        if len(slots) == 1:
+            slot = slots[0]
+            value = fn.apply(state.but_with_second_child())
+            def ilet(frame):
+                frame[slot] = value(frame)
+            return ilet
+
+        values = fn._get_values(state, state.second_child())
+        def ilet_multiple(frame):
+            for slot, result in zip(slots, values(frame)):
+                frame[slot] = result
+        return ilet_multiple
+
+    def _get_values(fn, state: State, ast: AST) -> Closure:
+        """
+        Return a closure for the multiple values of a (tuple ...) or (call ...) [ast].
+        """
+        if ast.type == "tuple":
+            closures = [fn.apply(state.but_with(ast=child)) for child in ast]
+            return lambda frame: [closure(frame) for closure in closures]
+        return fn.apply(state.but_with(ast=ast))
+
+    @Visitor.for_ast_types("=", "<-")
+    def assign_(fn, state: State) -> Closure:
+        target = state.first_child()
+        if target.type == "lvals":
+            # all values are obtained before any are assigned
+            values = fn._get_values(state, state.second_child())
+            setters = [fn._get_setter(state, child) for child in target]
+            def assign_multiple(frame):
+                for setter, result in zip(setters, values(frame)):
+                    setter(frame, result)
+            return assign_multiple
+
+        value = fn.apply(state.but_with_second_child())
+        if target.type != ".":
+            slot = state.get_layout().slot_of(target.first().value)
+            def assign(frame):
+                frame[slot] = value(frame)
+            return assign
+
+        setter = fn._get_setter(state, target)
+        return lambda frame: setter(frame, value(frame))
+
+    def _get_setter(fn, state: State, target: AST) -> Callable[[list, Any], None]:
+        if target.type != ".":
+            slot = state.get_layout().slot_of(target.first().value)
+            def set_slot(frame, result):
+                frame[slot] = result
+            return set_slot
+
+        obj = fn.apply(state.but_with(ast=target.first()))
+        index = BytecodeCompiler.get_field_index(
+            state.but_with(ast=target.first()).get_returned_type(),
+            adapters.Scope(state.but_with(ast=target)).get_attribute_name())
+        def set_field(frame, result):
+            obj(frame)[index] = result
+        return set_field
+
+    @Visitor.for_ast_types("+=", "-=", "*=", "/=")
+    def compound_assign_(fn, state: State) -> Closure:
+        op = Obj.lambda_map[ClosureCompiler.compound_ops[state.get_ast_type()]]
+        value = fn.apply(state.but_with_second_child())
+        target = state.first_child()
+        if target.type != ".":
+            slot = state.get_layout().slot_of(target.first().value)
+            def compound_assign(frame):
+                frame[slot] = op(frame[slot], value(frame))
+            return compound_assign
+
+        obj = fn.apply(state.but_with(ast=target.first()))
+        index = BytecodeCompiler.get_field_index(
+            state.but_with(ast=target.first()).get_returned_type(),
+            adapters.Scope(state.but_with(ast=target)).get_attribute_name())
+        def compound_assign_field(frame):
+            fields = obj(frame)
+            fields[index] = op(fields[index], value(frame))
+        return compound_assign_field
+
+    @Visitor.for_ast_types("+", "-", "*", "/", "<", "<=", ">", ">=", "==", "!=")
+    def binop_(fn, state: State) -> Closure:
+        op = Obj.lambda_map[state.get_ast_type()]
+        left = fn.apply(state.but_with_first_child())
+        right = fn.apply(state.but_with_second_child())
+        return lambda frame: op(left(frame), right(frame))
+
+    @Visitor.for_ast_types("and")
+    def and_(fn, state: State) -> Closure:
+        left = fn.apply(state.but_with_first_child())
+        right = fn.apply(state.but_with_second_child())
+        return lambda frame: left(frame) and right(frame)
+
+    @Visitor.for_ast_types("or")
+    def or_(fn, state: State) -> Closure:
+        left = fn.apply(state.but_with_first_child())
+        right = fn.apply(state.but_with_second_child())
+        return lambda frame: left(frame) or right(frame)
+
+    @Visitor.for_ast_types("!")
+    def not_(fn, state: State) -> Closure:
+        value = fn.apply(state.but_with_first_child())
+        return lambda frame: not value(frame)
+
+    @Visitor.for_ast_types("if")
+    def if_(fn, state: State) -> Closure:
+        branches = []
+        otherwise = None
+        for child in state.get_all_children():
+            if child.type == "cond":
+                branches.append((fn.apply(state.but_with(ast=child.first())),
+                                 fn.apply(state.but_with(ast=child.second()))))
+            else:
+                otherwise = fn.apply(state.but_with(ast=child))
+
+        def if_statement(frame):
+            for condition, body in branches:
+                if condition(frame):
+                    return body(frame)
+            if otherwise is not None:
+                return otherwise(frame)
+        return if_statement
+
+    @Visitor.for_ast_types("while")
+    def while_(fn, state: State) -> Closure:
+        condition = fn.apply(state.but_with(ast=state.first_child().first()))
+        body = fn.apply(state.but_with(ast=state.first_child().second()))
+        def while_statement(frame):
+            while condition(frame):
+                if body(frame):
+                    return True
+        return while_statement
+
+    @Visitor.for_ast_types("call")
+    def call_(fn, state: State) -> Closure:
+        node = adapters.Call(state)
+        if node.is_print():
+            return fn._print(state)
+        if node.is_append():
+            raise Exception("closure compiler does not support vectors")
+
+        args = [fn.apply(state.but_with(ast=child)) for child in state.second_child()]
+        if node.is_trait_function_call():
+            index = BytecodeCompiler.get_field_index(
+                state.but_with(ast=state.second_child().first()).get_returned_type(),
+                adapters.Scope(state.but_with_first_child()).get_attribute_name())
+            trait_value, other_args = args[0], args[1:]
+            def call_trait(frame):
+                obj, table = trait_value(frame)
+                return table[index]([obj] + [arg(frame) for arg in other_args])
+            return call_trait
+
+        if state.first_child().type in ("fn", "::"):
+            function = fn._get_function(BytecodeCompiler.get_function_key(state.but_with_first_child()))
+            return lambda frame: function([arg(frame) for arg in args])
+
+        function_value = fn.apply(state.but_with_first_child())
+        def call_value(frame):
+            function, curried = function_value(frame)
+            return function([*curried, *[arg(frame) for arg in args]])
+        return call_value
+
+    def _print(fn, state: State) -> Closure:
+        format_str = state.second_child().first().value.replace("%i", "{}")
+        args = [fn.apply(state.but_with(ast=child)) for child in state.second_child()[1:]]
+        write = fn.write
+        if write is None:
+            write = state.watcher.write if state.print_to_watcher else sys.stdout.write
+        return lambda frame: write(format_str.format(*[arg(frame) for arg in args]))
+
+    @Visitor.for_ast_types("curry_call")
+    def curry_call_(fn, state: State) -> Closure:
+        function_value = fn.apply(state.but_with_first_child())
+        args = [fn.apply(state.but_with(ast=child)) for child in state.second_child()]
+        def curry(frame):
+            function, curried = function_value(frame)
+            return (function, curried + tuple(arg(frame) for arg in args))
+        return curry
+
+    @Visitor.for_ast_types("fn", "::")
+    def fn_(fn, state: State) -> Closure:
+        value = (fn._get_function(BytecodeCompiler.get_function_key(state)), ())
+        return lambda frame: value
+
+    @Visitor.for_ast_types("cast")
+    def cast_(fn, state: State) -> Closure:
+        node = adapters.Cast(state)
+        key = TraitImplementation.get_key(node.get_cast_into_type(), node.get_original_type())
+        table = tuple(fn._get_function(f"{key}.{name}")
+            for name in node.get_cast_into_type().get_all_component_names())
+        obj = fn.apply(state.but_with_first_child())
+        return lambda frame: (obj(frame), table)
+
+    @Visitor.for_ast_types(".")
+    def dot_(fn, state: State) -> Closure:
+        index = BytecodeCompiler.get_field_index(
+            state.but_with_first_child().get_returned_type(),
+            adapters.Scope(state).get_attribute_name())
+        obj = fn.apply(state.but_with_first_child())
+        return lambda frame: obj(frame)[index]
+
+    @Visitor.for_ast_types("ref")
+    def ref_(fn, state: State) -> Closure:
+        return itemgetter(state.get_layout().slot_of(adapters.Ref(state).get_name()))
+
+    @Visitor.for_tokens
+    def token_(fn, state: State) -> Closure:
+        token = state.get_ast()
+        match token.type:
+            case "int": value = int(token.value)
+            case "bool": value = token.value == "true"
+            case "nil": value = None
+            case _: value = token.value
+        return lambda frame: value
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        raise Exception(f"closure compiler does not support '{state.get_ast_type()}'")
+
+
+class ClosureInterpreter():
+    """
+    Runs a program by first compiling it with the ClosureCompiler. This can be used in place of
+    the AstInterpreter; output is written to the watcher if the state prints to the watcher.
+    """
+
+    def __init__(self, write: Callable[[str], Any] = None):
+        self.write = write
+
+    def run(self, state: State_PostInstanceVisitor) -> State_PostInstanceVisitor:
+        ClosureCompiler(write=self.write).run(state)([])
+        return state
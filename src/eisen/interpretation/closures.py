@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+class FrameLayout():
+    """
+    Resolves the local variable names of a function to indices in its frame.
+    """
+
+    def __init__(self):
+        self.slots: dict[str, int] = {}
+
+    def slot_of(self, name: str) -> int:
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = len(self.slots)
+            self.slots[name] = slot
+        return slot
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+class CompiledFunction():
+    """
+    A function compiled to closures. The [body] is run over a frame (a list of slots) which
+    begins with the arguments, and [get_result] reads the return values out of the frame.
+    """
+    __slots__ = ("name", "n_slots", "body", "get_result")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.n_slots = 0
+        self.body: Callable[[list], Any] = None
+        self.get_result: Callable[[list], Any] = None
+
+    def __call__(self, args: list[Any]) -> Any:
+        frame = args
+        frame.extend([None] * (self.n_slots - len(args)))
+        self.body(frame)
+        return self.get_result(frame)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Callable
+
+from eisen.interpretation.bytecode import BytecodeProgram, Op
+
+# Opcodes are bound to module globals so that the dispatch loop does not need attribute lookups.
+MOVE, LOADK, ADD, SUB, MUL, DIV = Op.MOVE, Op.LOADK, Op.ADD, Op.SUB, Op.MUL, Op.DIV
+LT, LE, GT, GE, EQ, NE, NOT = Op.LT, Op.LE, Op.GT, Op.GE, Op.EQ, Op.NE, Op.NOT
+JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE = Op.JUMP, Op.JUMP_IF_FALSE, Op.JUMP_IF_TRUE
+GETFIELD, SETFIELD, NEW = Op.GETFIELD, Op.SETFIELD, Op.NEW
+CALL, CALL_VALUE, CALL_TRAIT, CURRY, CAST = Op.CALL, Op.CALL_VALUE, Op.CALL_TRAIT, Op.CURRY, Op.CAST
+UNPACK, PRINT, RETURN = Op.UNPACK, Op.PRINT, Op.RETURN
+
+class VirtualMachine():
+    """
+    Runs a BytecodeProgram. Each call executes the instructions of the called function in its own
+    list of registers. Calls do not recurse on the Python stack: the caller's frame is pushed onto
+    an explicit stack, so the depth of recursion in a program is only limited by memory. The
+    dispatch loop is ordered so that the most frequent instructions are checked first.
+    """
+
+    def __init__(self, program: BytecodeProgram, write: Callable[[str], Any] = None):
+        self.program = program
+        self.functions = program.functions
+        self.constants = program.constants
+        self.write = write if write is not None else sys.stdout.write
+
+    def run(self) -> None:
+        self.execute(self.program.entry_point, [])
+
+    def execute(self, function_index: int, args: list[Any]) -> Any:
+        functions = self.functions
+        constants = self.constants
+        # The (code, registers, pc, destination register) of each caller.
+        frames: list[tuple[list, list[Any], int, int]] = []
+
+        function = functions[function_index]
+        r = args
+        r.extend([None] * (function.n_registers - len(args)))
+        code = function.code
+        pc = 0
+        while True:
+            op, a, b, c = code[pc]
+            pc += 1
+            if op == MOVE:
+                r[a] = r[b]
+            elif op == LOADK:
+                r[a] = constants[b]
+            elif op == GETFIELD:
+                r[a] = r[b][c]
+            elif op == ADD:
+                r[a] = r[b] + r[c]
+            elif op == JUMP_IF_FALSE:
+                if not r[a]: pc = c
+            elif op == JUMP:
+                pc = c
+            elif op == SETFIELD:
+                r[a][b] = r[c]
+            elif op == LT:
+                r[a] = r[b] < r[c]
+            elif op == SUB:
+                r[a] = r[b] - r[c]
+            elif op == CALL:
+                frames.append((code, r, pc, a))
+                function = functions[b]
+                r = [r[i] for i in c]
+                r.extend([None] * (function.n_registers - len(r)))
+                code = function.code
+                pc = 0
+            elif op == EQ:
+                r[a] = r[b] == r[c]
+            elif op == MUL:
+                r[a] = r[b] * r[c]
+            elif op == DIV:
+                r[a] = r[b] // r[c]
+            elif op == LE:
+                r[a] = r[b] <= r[c]
+            elif op == GT:
+                r[a] = r[b] > r[c]
+            elif op == GE:
+                r[a] = r[b] >= r[c]
+            elif op == NE:
+                r[a] = r[b] != r[c]
+            elif op == NOT:
+                r[a] = not r[b]
+            elif op == JUMP_IF_TRUE:
+                if r[a]: pc = c
+            elif op == RETURN:
+                match len(a):
+                    case 0: value = None
+                    case 1: value = r[a[0]]
+                    case _: value = tuple(r[i] for i in a)
+                if not frames:
+                    return value
+                code, r, pc, a = frames.pop()
+                r[a] = value
+            elif op == CALL_VALUE:
+                index, curried = r[b]
+                frames.append((code, r, pc, a))
+                function = functions[index]
+                r = [*curried, *[r[i] for i in c]]
+                r.extend([None] * (function.n_registers - len(r)))
+                code = function.code
+                pc = 0
+            elif op == CALL_TRAIT:
+                obj, table = r[c[0]]
+                frames.append((code, r, pc, a))
+                function = functions[table[b]]
+                r = [obj, *[r[i] for i in c[1:]]]
+                r.extend([None] * (function.n_registers - len(r)))
+                code = function.code
+                pc = 0
+            elif op == NEW:
+                r[a] = [None] * b
+            elif op == CAST:
+                r[a] = (r[b], constants[c])
+            elif op == CURRY:
+                index, curried = r[b]
+                r[a] = (index, curried + tuple(r[i] for i in c))
+            elif op == UNPACK:
+                for register, value in zip(a, r[b]):
+                    r[register] = value
+            elif op == PRINT:
+                self.write(constants[a].format(*[r[i] for i in b]))
+            else:
+                raise Exception(f"unknown opcode {op}")
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken, ASTElement
+
+from eisen.common import boolean_return_ops
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.interpretation.obj import Obj
+from eisen.optimization.expressions import Expressions
+
+class ConstantFolder(Visitor):
+    """
+    Replaces arithmetic, comparisons and logic over int and bool literals with the literal result,
+    and simplifies (and ...) and (or ...) expressions whose first operand is a literal.
+    """
+
+    def run(self, state: BaseState) -> BaseState:
+        self.apply(State.create_from_basestate(state))
+        return state
+
+    def apply(self, state: State) -> ASTElement:
+        return self._route(state.get_ast(), state)
+
+    @staticmethod
+    def _fold_children(fn: ConstantFolder, state: State):
+        ast: AST = state.get_ast()
+        for i, child in enumerate(ast):
+            ast[i] = fn.apply(state.but_with(ast=child))
+
+    @Visitor.for_ast_types("and", "or")
+    def logic_(fn, state: State) -> ASTElement:
+        ConstantFolder._fold_children(fn, state)
+        left, right = state.first_child(), state.second_child()
+        if not Expressions.is_literal(left):
+            return state.get_ast()
+
+        # The right operand is only evaluated if the left operand does not decide the result.
+        decided = Expressions.value_of(left) == (state.get_ast_type() == "or")
+        return left if decided else right
+
+    @Visitor.for_ast_types("+", "-", "*", "/", *boolean_return_ops)
+    def binop_(fn, state: State) -> ASTElement:
+        ConstantFolder._fold_children(fn, state)
+        left, right = state.first_child(), state.second_child()
+        if not (Expressions.is_literal(left) and Expressions.is_literal(right)):
+            return state.get_ast()
+        if state.get_ast_type() == "/" and Expressions.value_of(right) == 0:
+            return state.get_ast()
+
+        value = Obj.lambda_map[state.get_ast_type()](Expressions.value_of(left), Expressions.value_of(right))
+        return Expressions.literal(value, like=state.get_ast())
+
+    @Visitor.for_ast_types("!")
+    def not_(fn, state: State) -> ASTElement:
+        ConstantFolder._fold_children(fn, state)
+        if Expressions.is_literal(state.first_child()):
+            return Expressions.literal(not Expressions.value_of(state.first_child()), like=state.get_ast())
+        return state.get_ast()
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State) -> ASTToken:
+        return state.get_ast()
+
+    @Visitor.for_default
+    def default_(fn, state: State) -> AST:
+        ConstantFolder._fold_children(fn, state)
+        return state.get_ast()
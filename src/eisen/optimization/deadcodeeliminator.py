@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken, ASTElement
+
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.optimization.expressions import Expressions
+import eisen.adapters as adapters
+
+class DeadCodeEliminator(Visitor):
+    """
+    Removes code which cannot affect the behavior of the program:
+        1. branches of an (if ...) whose condition is the literal false, along with all branches
+           after one whose condition is the literal true,
+        2. (while ...) loops whose condition is the literal false,
+        3. statements after a (return ...),
+        4. stores of pure expressions to local variables which are never read.
+    """
+
+    def run(self, state: BaseState) -> BaseState:
+        self.apply(State.create_from_basestate(state))
+        return state
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    # (def ...) (create ...)
+    @Visitor.for_ast_types(*adapters.CommonFunction.ast_types)
+    def def_(fn, state: State):
+        node = adapters.Def(state)
+        fn.apply(state.but_with(ast=node.get_seq_ast()))
+
+        parameters = set(node.get_arg_names() + node.get_ret_names())
+        while DeadCodeEliminator._remove_dead_stores(node.get_seq_ast(), parameters):
+            pass
+
+    @Visitor.for_ast_types("seq")
+    def seq_(fn, state: State):
+        statements = []
+        for child in state.get_all_children():
+            fn.apply(state.but_with(ast=child))
+            statements.extend(DeadCodeEliminator._simplify(child))
+            if child.type == "return":
+                break
+        state.get_ast().update(type="seq", lst=statements)
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State):
+        return
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        for child in state.get_child_asts():
+            fn.apply(state.but_with(ast=child))
+
+    @staticmethod
+    def _simplify(statement: AST) -> list[AST]:
+        """
+        Return the statements which replace [statement] after removing its dead branches.
+        """
+        match statement.type:
+            case "if": return DeadCodeEliminator._simplify_if(statement)
+            case "while" if Expressions.is_false(statement.first().first()): return []
+            case _: return [statement]
+
+    @staticmethod
+    def _simplify_if(statement: AST) -> list[AST]:
+        branches: list[AST] = []
+        dropped_condition: ASTToken = None
+        for child in statement:
+            if child.type == "cond" and Expressions.is_false(child.first()):
+                dropped_condition = child.first()
+                continue
+            branches.append(child)
+            if child.type == "seq" or Expressions.is_true(child.first()):
+                break
+
+        if not branches:
+            return []
+
+        first = branches[0]
+        if first.type == "seq" or Expressions.is_true(first.first()):
+            taken = first if first.type == "seq" else first.second()
+
+            # Statements can only be moved into the enclosing block if doing so does not change
+            # the scope of any variables.
+            if not Expressions.declares_variables(taken):
+                return taken.get_all_children()
+            if first.type == "seq":
+                branches[0] = AST("cond", lst=[Expressions.literal(True, like=dropped_condition), taken],
+                    line_number=first.line_number, data=first.data)
+
+        statement.update(type="if", lst=branches)
+        return [statement]
+
+    @staticmethod
+    def _get_read_names(ast: ASTElement) -> set[str]:
+        """
+        Return the names of all variables which are read inside [ast].
+        """
+        if isinstance(ast, ASTToken):
+            return set()
+        if ast.type == "ref":
+            return {ast.first().value}
+
+        children = ast.get_all_children()
+        if ast.type in ("=", "<-"):
+            target = ast.first()
+            targets = list(target) if target.type == "lvals" else [target]
+            children = [t for t in targets if t.type != "ref"] + [ast.second()]
+        elif ast.type in Expressions.declaration_ops:
+            children = children[1:]
+
+        names = set()
+        for child in children:
+            names.update(DeadCodeEliminator._get_read_names(child))
+        return names
+
+    @staticmethod
+    def _get_declared_names(ast: ASTElement) -> set[str]:
+        if isinstance(ast, ASTToken):
+            return set()
+        names = set()
+        if ast.type in Expressions.declaration_ops:
+            names.update(Expressions.get_declared_names(ast))
+        for child in ast:
+            names.update(DeadCodeEliminator._get_declared_names(child))
+        return names
+
+    @staticmethod
+    def _remove_dead_stores(seq: AST, parameters: set[str]) -> bool:
+        """
+        Remove the stores to local variables of the function with body [seq] which are never read.
+        Returns true if any statements were removed.
+        """
+        dead_names = (DeadCodeEliminator._get_declared_names(seq)
+            - parameters
+            - DeadCodeEliminator._get_read_names(seq))
+        if not dead_names:
+            return False
+
+        referenced_names = set(Expressions.get_referenced_names(seq))
+        return DeadCodeEliminator._remove_stores_in(seq, dead_names, referenced_names)
+
+    @staticmethod
+    def _is_dead_store(statement: AST, dead_names: set[str], referenced_names: set[str]) -> bool:
+        match statement.type:
+            case "=" | "<-":
+                return (statement.first().type == "ref"
+                    and statement.first().first().value in dead_names
+                    and Expressions.is_pure(statement.second()))
+            case "ilet":
+                return (statement.first().type != "bindings"
+                    and Expressions.get_declared_names(statement)[0] in dead_names
+                    and Expressions.is_pure(statement.second()))
+            case "let":
+                return all(name in dead_names and name not in referenced_names
+                    for name in Expressions.get_declared_names(statement))
+            case _:
+                return False
+
+    @staticmethod
+    def _remove_stores_in(ast: AST, dead_names: set[str], referenced_names: set[str]) -> bool:
+        removed = False
+        if ast.type == "seq":
+            statements = [s for s in ast
+                if not DeadCodeEliminator._is_dead_store(s, dead_names, referenced_names)]
+            removed = len(statements) != len(ast)
+            ast.update(type="seq", lst=statements)
+
+        for child in ast:
+            if isinstance(child, AST):
+                removed = DeadCodeEliminator._remove_stores_in(child, dead_names, referenced_names) or removed
+        return removed
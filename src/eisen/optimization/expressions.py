@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from alpaca.clr import AST, ASTToken, ASTElement
+from alpaca.concepts import Type
+
+from eisen.common import no_assign_binary_ops, boolean_return_ops
+from eisen.common.nodedata import NodeData
+import eisen.adapters as adapters
+
+class Expressions:
+    """
+    Syntactic queries and constructions over the ASTs of validated Eisen code, shared by the
+    optimization passes.
+    """
+
+    operators = no_assign_binary_ops + boolean_return_ops
+    assignment_ops = ["=", "<-", "+=", "-=", "*=", "/="]
+    declaration_ops = adapters.InferenceAssign.ast_types + adapters.Decl.ast_types
+
+    @staticmethod
+    def is_literal(ast: ASTElement) -> bool:
+        return isinstance(ast, ASTToken) and ast.type in ("int", "bool")
+
+    @staticmethod
+    def is_true(ast: ASTElement) -> bool:
+        return Expressions.is_literal(ast) and ast.value == "true"
+
+    @staticmethod
+    def is_false(ast: ASTElement) -> bool:
+        return Expressions.is_literal(ast) and ast.value == "false"
+
+    @staticmethod
+    def value_of(token: ASTToken) -> int | bool:
+        match token.type:
+            case "int": return int(token.value)
+            case "bool": return token.value == "true"
+
+    @staticmethod
+    def literal(value: int | bool, like: ASTElement) -> ASTToken:
+        """
+        Create a literal token for [value], which takes the place of the expression [like].
+        """
+        match value:
+            case bool(): token = ASTToken(["bool"], "true" if value else "false", like.line_number)
+            case int(): token = ASTToken(["int"], str(value), like.line_number)
+        token.data = like.data
+        return token
+
+    @staticmethod
+    def ref(name: str, type: Type, like: ASTElement) -> AST:
+        """
+        Create a (ref name) AST of [type], which takes the place of the expression [like].
+        """
+        data = NodeData()
+        data.returned_type = type
+        token = ASTToken(["TAG"], name, like.line_number)
+        token.data = NodeData()
+        return AST("ref", lst=[token], line_number=like.line_number, data=data)
+
+    @staticmethod
+    def is_trivial(ast: ASTElement) -> bool:
+        """
+        True if evaluating [ast] is free of side effects and costs no more than reading a variable.
+        """
+        return isinstance(ast, ASTToken) or ast.type in ("ref", "fn")
+
+    @staticmethod
+    def is_pure(ast: ASTElement) -> bool:
+        """
+        True if [ast] is an expression over literals and local variables which cannot fail and has
+        no side effects. Field accesses are excluded, as the field could be changed through an
+        alias of the object.
+        """
+        if Expressions.is_trivial(ast):
+            return True
+        if ast.type == "/":
+            return (Expressions.is_pure(ast.first())
+                and Expressions.is_literal(ast.second())
+                and Expressions.value_of(ast.second()) != 0)
+        if ast.type in Expressions.operators or ast.type == "!":
+            return all(Expressions.is_pure(child) for child in ast)
+        return False
+
+    @staticmethod
+    def contains_call(ast: ASTElement) -> bool:
+        if isinstance(ast, ASTToken):
+            return False
+        if ast.type in ("call", "curry_call", "raw_call"):
+            return True
+        return any(Expressions.contains_call(child) for child in ast)
+
+    @staticmethod
+    def size(ast: ASTElement) -> int:
+        if isinstance(ast, ASTToken):
+            return 1
+        return 1 + sum(Expressions.size(child) for child in ast)
+
+    @staticmethod
+    def copy(ast: ASTElement) -> ASTElement:
+        """
+        Copy the structure of [ast]; the node data of the copy is shared with the original.
+        """
+        if isinstance(ast, ASTToken):
+            token = ASTToken(ast.type_chain, ast.value, ast.line_number)
+            token.data = ast.data
+            return token
+        return AST(ast.type, lst=[Expressions.copy(child) for child in ast],
+            line_number=ast.line_number, data=ast.data)
+
+    @staticmethod
+    def get_referenced_names(ast: ASTElement) -> list[str]:
+        """
+        Return the names of all variables referenced by (ref ...) ASTs inside [ast], in order of
+        evaluation and with repetition.
+        """
+        if isinstance(ast, ASTToken):
+            return []
+        if ast.type == "ref":
+            return [ast.first().value]
+        return [name for child in ast for name in Expressions.get_referenced_names(child)]
+
+    @staticmethod
+    def get_declared_names(ast: AST) -> list[str]:
+        """
+        Return the names declared by the (ilet ...) or (let ...) [ast].
+        """
+        bindings = ast.first()
+        if bindings.type == "bindings":
+            return [binding.first().value for binding in bindings]
+        return [bindings.first().value]
+
+    @staticmethod
+    def get_assigned_names(ast: AST) -> list[str]:
+        """
+        Return the names of the variables (not fields) which are assigned by the assignment [ast].
+        """
+        target = ast.first()
+        targets = list(target) if target.type == "lvals" else [target]
+        return [t.first().value for t in targets if t.type == "ref"]
+
+    @staticmethod
+    def get_written_names(ast: ASTElement) -> set[str]:
+        """
+        Return the names of all variables which may be declared or assigned when [ast] executes.
+        """
+        if isinstance(ast, ASTToken):
+            return set()
+        names = set()
+        if ast.type in Expressions.declaration_ops:
+            names.update(Expressions.get_declared_names(ast))
+        elif ast.type in Expressions.assignment_ops:
+            names.update(Expressions.get_assigned_names(ast))
+        for child in ast:
+            names.update(Expressions.get_written_names(child))
+        return names
+
+    @staticmethod
+    def declares_variables(seq: AST) -> bool:
+        return any(statement.type in Expressions.declaration_ops for statement in seq)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken, ASTElement
+
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.optimization.expressions import Expressions
+import eisen.adapters as adapters
+
+class Inliner(Visitor):
+    """
+    Replaces calls of small, non-recursive functions with the body of the called function. A
+    function is small if it returns a single value which it assigns exactly once, from an
+    expression over its arguments:
+
+        fn square(x: int) -> r: int {
+            r = x * x
+        }
+
+    The arguments of the call are substituted for the parameters of the function, which is only
+    done where it keeps the number and order of evaluations of each argument the same, and where
+    no call in an argument can change a variable argument before the body reads it.
+    """
+
+    # The maximum number of nodes in the returned expression of an inlined function.
+    max_size = 32
+
+    def run(self, state: BaseState) -> BaseState:
+        self.apply(State.create_from_basestate(state))
+        return state
+
+    def apply(self, state: State) -> ASTElement:
+        return self._route(state.get_ast(), state)
+
+    @staticmethod
+    def get_inlinable_expression(state: State, defining_ast: AST) -> tuple[list[str], AST] | None:
+        """
+        Return the parameter names and the returned expression of the function defined by
+        [defining_ast], or None if the function cannot be inlined.
+        """
+        if defining_ast is None or defining_ast.type != "def":
+            return None
+        if state.but_with(ast=defining_ast).get_instances()[0].is_recursive_function:
+            return None
+
+        node = adapters.Def(state.but_with(ast=defining_ast))
+        ret_names = node.get_ret_names()
+        statements = node.get_seq_ast().get_all_children()
+        if len(ret_names) != 1 or len(statements) != 1:
+            return None
+
+        statement = statements[0]
+        if (statement.type != "="
+                or statement.first().type != "ref"
+                or statement.first().first().value != ret_names[0]):
+            return None
+
+        expression = statement.second()
+        arg_names = node.get_arg_names()
+        if (Expressions.size(expression) > Inliner.max_size
+                or any(name not in arg_names for name in Expressions.get_referenced_names(expression))):
+            return None
+        return arg_names, expression
+
+    @staticmethod
+    def can_substitute(arg_names: list[str], params: list[ASTElement], expression: AST) -> bool:
+        """
+        True if the [params] can be substituted for the [arg_names] in the [expression] without
+        changing how often, or in which order, each parameter is evaluated, or what the
+        [expression] reads through its parameters.
+        """
+        if len(params) != len(arg_names):
+            return False
+
+        references = Expressions.get_referenced_names(expression)
+        evaluated = [name for name, param in zip(arg_names, params) if not Expressions.is_trivial(param)]
+        if not evaluated:
+            return True
+        if Expressions.contains_call(expression):
+            return False
+
+        # A call in an argument may change what a variable argument refers to, e.g. a field of
+        # an object passed by reference. Such a call would be moved next to the reads of the
+        # variable, which are then no longer guaranteed to see its effects.
+        variables = [name for name, param in zip(arg_names, params)
+            if isinstance(param, AST) and param.type == "ref"]
+        if (any(Expressions.contains_call(param) for param in params)
+                and any(name in variables for name in references)):
+            return False
+        return [name for name in references if name in evaluated] == evaluated
+
+    @staticmethod
+    def substitute(ast: ASTElement, replacements: dict[str, ASTElement]) -> ASTElement:
+        if isinstance(ast, ASTToken):
+            return Expressions.copy(ast)
+        if ast.type == "ref" and ast.first().value in replacements:
+            return Expressions.copy(replacements[ast.first().value])
+        return AST(ast.type, lst=[Inliner.substitute(child, replacements) for child in ast],
+            line_number=ast.line_number, data=ast.data)
+
+    @Visitor.for_ast_types("call")
+    def call_(fn, state: State) -> ASTElement:
+        Inliner._apply_to_children(fn, state)
+        node = adapters.Call(state)
+        if not node.is_pure_function_call():
+            return state.get_ast()
+
+        inlinable = Inliner.get_inlinable_expression(state, node.get_function_definition_if_known())
+        if inlinable is None:
+            return state.get_ast()
+
+        arg_names, expression = inlinable
+        params = node.get_params_ast().get_all_children()
+        if not Inliner.can_substitute(arg_names, params, expression):
+            return state.get_ast()
+
+        # The inlined expression may itself contain calls which can be inlined.
+        inlined = Inliner.substitute(expression, dict(zip(arg_names, params)))
+        return fn.apply(state.but_with(ast=inlined))
+
+    @staticmethod
+    def _apply_to_children(fn: Inliner, state: State):
+        ast: AST = state.get_ast()
+        for i, child in enumerate(ast):
+            ast[i] = fn.apply(state.but_with(ast=child))
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State) -> ASTToken:
+        return state.get_ast()
+
+    @Visitor.for_default
+    def default_(fn, state: State) -> AST:
+        Inliner._apply_to_children(fn, state)
+        return state.get_ast()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from alpaca.utils import Visitor
+
+from eisen.state.basestate import BaseState as State
+from eisen.optimization.constantfolder import ConstantFolder
+from eisen.optimization.deadcodeeliminator import DeadCodeEliminator
+from eisen.optimization.inliner import Inliner
+from eisen.optimization.scalarreplacer import ScalarReplacer
+from eisen.optimization.subexpressioneliminator import SubexpressionEliminator
+from eisen.optimization.tailcalleliminator import TailCallEliminator
+
+class Optimizer():
+    """
+    Rewrites the AST of a validated program into an equivalent, faster one. This runs after the
+    Workflow and before any backend, so every backend benefits from it.
+    """
+
+    # The optimization passes to run at each optimization level, in order.
+    levels: dict[int, list[Visitor]] = {
+        0: [],
+        1: [
+            TailCallEliminator,
+            ConstantFolder,
+            DeadCodeEliminator,
+        ],
+        2: [
+            # Inline first, so the inlined expressions are folded and shared as well
+            Inliner,
+            ScalarReplacer,
+            TailCallEliminator,
+            ConstantFolder,
+            SubexpressionEliminator,
+            DeadCodeEliminator,
+        ],
+    }
+
+    def __init__(self, level: int = 1):
+        self.level = min(level, max(Optimizer.levels))
+
+    def run(self, state: State) -> State:
+        for step in Optimizer.levels[self.level]:
+            state = step().run(state)
+        return state
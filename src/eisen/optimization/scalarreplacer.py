@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken, ASTElement
+from alpaca.concepts import Type, TypeManifest
+
+from eisen.common.nodedata import NodeData
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.optimization.expressions import Expressions
+import eisen.adapters as adapters
+
+@dataclass
+class Allocation:
+    """
+    A local variable [name], declared by [declaration], which holds a new struct constructed by a
+    call to a constructor that only copies each of its arguments into a field. The [fields] are
+    listed in the order of the arguments which initialize them, with their types.
+    """
+    name: str
+    declaration: AST
+    fields: list[tuple[str, Type]]
+
+    def get_scalar_name(self, field: str) -> str:
+        return f"{self.name}__{field}"
+
+@dataclass
+class EscapeSummary:
+    """
+    The local struct allocations of a function, split by whether the struct may be referenced
+    after the function returns, or by anything other than the local variable itself.
+    """
+    escaping: list[Allocation]
+    local: list[Allocation]
+
+class ScalarReplacer(Visitor):
+    """
+    Replaces local structs which never escape their function with one local variable per field.
+    A struct escapes if the variable holding it is used other than to read or write one of its
+    fields, such as being passed to a function, returned, assigned or captured:
+
+        let p = vec2(i, i + 1)          let var p__x = i
+        total += p.x * p.y        ->    let var p__y = i + 1
+                                        total += p__x * p__y
+
+    Only structs whose fields are all primitives are replaced, and only when they are built by
+    a constructor which copies each argument into a distinct field.
+    """
+
+    def run(self, state: BaseState) -> BaseState:
+        self.apply(State.create_from_basestate(state))
+        return state
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    # (def ...) (create ...)
+    @Visitor.for_ast_types(*adapters.CommonFunction.ast_types)
+    def def_(fn, state: State):
+        summary = ScalarReplacer.summarize(state)
+        seq = adapters.Def(state).get_seq_ast()
+        for allocation in summary.local:
+            ScalarReplacer._replace_allocation(seq, allocation)
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State):
+        return
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        for child in state.get_child_asts():
+            fn.apply(state.but_with(ast=child))
+
+    @staticmethod
+    def summarize(state: State) -> EscapeSummary:
+        """
+        Return the EscapeSummary of the function defined by the (def ...) or (create ...) AST of
+        [state].
+        """
+        node = adapters.Def(state)
+        seq = node.get_seq_ast()
+        allocations = [allocation
+            for declaration in ScalarReplacer._get_declarations(seq)
+            if (allocation := ScalarReplacer._get_allocation(state, declaration)) is not None]
+
+        parameters = set(node.get_arg_names() + node.get_ret_names())
+        declared_names = ScalarReplacer._get_all_declared_names(seq)
+        used_names = set(Expressions.get_referenced_names(seq)) | set(declared_names)
+
+        summary = EscapeSummary(escaping=[], local=[])
+        for allocation in allocations:
+            is_local = (allocation.name not in parameters
+                # Shadowed names would need the scope of each use to be resolved.
+                and declared_names.count(allocation.name) == 1
+                and all(allocation.get_scalar_name(field) not in used_names
+                    for field, _ in allocation.fields)
+                and not ScalarReplacer._escapes(seq, allocation))
+            (summary.local if is_local else summary.escaping).append(allocation)
+        return summary
+
+    @staticmethod
+    def _get_declarations(ast: ASTElement) -> list[AST]:
+        if isinstance(ast, ASTToken):
+            return []
+        declarations = [ast] if ast.type == "ilet" and ast.first().type != "bindings" else []
+        for child in ast:
+            declarations += ScalarReplacer._get_declarations(child)
+        return declarations
+
+    @staticmethod
+    def _get_all_declared_names(ast: ASTElement) -> list[str]:
+        if isinstance(ast, ASTToken):
+            return []
+        names = Expressions.get_declared_names(ast) if ast.type in Expressions.declaration_ops else []
+        for child in ast:
+            names += ScalarReplacer._get_all_declared_names(child)
+        return names
+
+    @staticmethod
+    def _get_allocation(state: State, declaration: AST) -> Allocation | None:
+        value = declaration.second()
+        if value.type != "call" or value.first().type != "fn":
+            return None
+
+        call = adapters.Call(state.but_with(ast=value))
+        definition = call.get_function_definition_if_known()
+        if definition is None or not state.but_with(ast=definition).get_instances()[0].is_constructor:
+            return None
+
+        fields_by_arg = ScalarReplacer._get_fields_by_arg(state.but_with(ast=definition))
+        if fields_by_arg is None:
+            return None
+
+        struct_type = state.but_with(ast=definition).get_instances()[0].type.get_return_type()
+        field_types = dict(struct_type.get_all_attribute_name_type_pairs())
+        if not all(ScalarReplacer._is_primitive(t) for t in field_types.values()):
+            return None
+
+        return Allocation(
+            name=Expressions.get_declared_names(declaration)[0],
+            declaration=declaration,
+            fields=[(field, field_types[field]) for field in fields_by_arg])
+
+    @staticmethod
+    def _is_primitive(type: Type) -> bool:
+        if isinstance(type, TypeManifest):
+            type = type.get_type()
+        return type.is_novel()
+
+    @staticmethod
+    def _get_fields_by_arg(state: State) -> list[str] | None:
+        """
+        If the constructor of [state] only assigns each of its arguments to a distinct field, and
+        so initializes every field, return the field initialized by each argument.
+        """
+        node = adapters.Def(state)
+        arg_names = node.get_arg_names()
+        self_name = node.get_ret_names()[0]
+        struct_type = state.get_instances()[0].type.get_return_type()
+
+        fields_by_arg: dict[str, str] = {}
+        for statement in node.get_seq_ast():
+            if (statement.type != "="
+                    or statement.first().type != "."
+                    or statement.first().first().type != "ref"
+                    or statement.first().first().first().value != self_name
+                    or statement.second().type != "ref"):
+                return None
+
+            arg = statement.second().first().value
+            if arg not in arg_names or arg in fields_by_arg:
+                return None
+            fields_by_arg[arg] = statement.first().second().value
+
+        fields = [fields_by_arg.get(arg) for arg in arg_names]
+        if None in fields or sorted(fields) != sorted(struct_type.get_all_component_names()):
+            return None
+        return fields
+
+    @staticmethod
+    def _escapes(ast: ASTElement, allocation: Allocation) -> bool:
+        """
+        True if [ast] uses the variable of [allocation] other than by accessing its fields.
+        """
+        if isinstance(ast, ASTToken):
+            return False
+        if ast.type == "ref":
+            return ast.first().value == allocation.name
+        if ast is allocation.declaration:
+            return ScalarReplacer._escapes(ast.second(), allocation)
+        if ast.type == "." and ast.first().type == "ref" and ast.first().first().value == allocation.name:
+            return ast.second().value not in [field for field, _ in allocation.fields]
+        return any(ScalarReplacer._escapes(child, allocation) for child in ast)
+
+    @staticmethod
+    def _replace_allocation(seq: AST, allocation: Allocation):
+        """
+        Replace the declaration of [allocation] inside [seq] with a declaration for each field,
+        and each access of a field with a reference to its variable.
+        """
+        ScalarReplacer._replace_declaration(seq, allocation)
+        ScalarReplacer._replace_field_accesses(seq, allocation)
+
+    @staticmethod
+    def _replace_declaration(ast: AST, allocation: Allocation) -> bool:
+        statements = ast.get_all_children()
+        if ast.type == "seq" and allocation.declaration in statements:
+            i = statements.index(allocation.declaration)
+            ast.update(type="seq",
+                lst=statements[:i] + ScalarReplacer._declare_fields(allocation) + statements[i+1:])
+            return True
+        return any(ScalarReplacer._replace_declaration(child, allocation)
+            for child in ast if isinstance(child, AST))
+
+    @staticmethod
+    def _declare_fields(allocation: Allocation) -> list[AST]:
+        declaration = allocation.declaration
+        params = declaration.second().second().get_all_children()
+        declarations = []
+        for (field, type), param in zip(allocation.fields, params):
+            data = NodeData()
+            data.returned_type = type
+            token = ASTToken(["TAG"], allocation.get_scalar_name(field), declaration.line_number)
+            token.data = NodeData()
+            binding = AST("var", lst=[token], line_number=declaration.line_number, data=NodeData())
+            declarations.append(AST("ilet", lst=[binding, param],
+                line_number=declaration.line_number, data=data))
+        return declarations
+
+    @staticmethod
+    def _replace_field_accesses(ast: AST, allocation: Allocation):
+        for i, child in enumerate(ast):
+            if isinstance(child, ASTToken):
+                continue
+            if child.type == "." and child.first().type == "ref" and child.first().first().value == allocation.name:
+                ast[i] = Expressions.ref(allocation.get_scalar_name(child.second().value),
+                    child.data.returned_type, like=child)
+            else:
+                ScalarReplacer._replace_field_accesses(child, allocation)
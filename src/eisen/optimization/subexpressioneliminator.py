@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken, ASTElement
+from alpaca.concepts import Type
+
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.optimization.expressions import Expressions
+
+@dataclass
+class AvailableExpression:
+    """
+    A pure expression whose value is held by the variable [name], which remains valid until any
+    of the variables in [depends_on] are written.
+    """
+    name: str
+    type: Type
+    depends_on: set[str]
+
+Availability = dict[str, AvailableExpression]
+
+class SubexpressionEliminator(Visitor):
+    """
+    Replaces a pure expression with a reference to a variable which was declared with the same
+    expression earlier in the block, provided that none of the variables it depends on have been
+    written in between:
+
+        let c = a * 2 + 1           let c = a * 2 + 1
+        let d = a * 2 + 1     ->    let d = c
+    """
+
+    def run(self, state: BaseState) -> BaseState:
+        self.apply(State.create_from_basestate(state))
+        return state
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    @Visitor.for_ast_types("seq")
+    def seq_(fn, state: State):
+        SubexpressionEliminator._eliminate_in(state.get_ast(), {})
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State):
+        return
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        for child in state.get_child_asts():
+            fn.apply(state.but_with(ast=child))
+
+    @staticmethod
+    def _invalidate(available: Availability, written: set[str]):
+        for key in [key for key, entry in available.items() if entry.depends_on & written]:
+            del available[key]
+
+    @staticmethod
+    def _eliminate_in(seq: AST, available: Availability):
+        for statement in seq:
+            match statement.type:
+                case "if":
+                    for child in statement:
+                        if child.type == "cond":
+                            child[0] = SubexpressionEliminator._replace(child.first(), available)
+                            SubexpressionEliminator._eliminate_in(child.second(), available.copy())
+                        else:
+                            SubexpressionEliminator._eliminate_in(child, available.copy())
+                case "while":
+                    # Anything written inside the loop may differ on the next iteration.
+                    SubexpressionEliminator._invalidate(available, Expressions.get_written_names(statement))
+                    cond = statement.first()
+                    cond[0] = SubexpressionEliminator._replace(cond.first(), available)
+                    SubexpressionEliminator._eliminate_in(cond.second(), available.copy())
+                case "annotation":
+                    pass
+                case _ if statement.type in Expressions.declaration_ops or statement.type in Expressions.assignment_ops:
+                    if len(statement) == 2:
+                        statement[1] = SubexpressionEliminator._replace(statement.second(), available)
+                case _:
+                    for i, child in enumerate(statement):
+                        statement[i] = SubexpressionEliminator._replace(child, available)
+
+            SubexpressionEliminator._invalidate(available, Expressions.get_written_names(statement))
+            SubexpressionEliminator._make_available(statement, available)
+
+    @staticmethod
+    def _make_available(statement: AST, available: Availability):
+        if statement.type != "ilet" or statement.first().type == "bindings":
+            return
+
+        value = statement.second()
+        if Expressions.is_trivial(value) or not Expressions.is_pure(value):
+            return
+
+        # If the variable shadows one which the value depends on, the expression no longer
+        # evaluates to the same value.
+        name = Expressions.get_declared_names(statement)[0]
+        depends_on = set(Expressions.get_referenced_names(value))
+        if name in depends_on:
+            return
+
+        available[str(value)] = AvailableExpression(
+            name=name,
+            type=value.data.returned_type,
+            depends_on=depends_on | {name})
+
+    @staticmethod
+    def _replace(ast: ASTElement, available: Availability) -> ASTElement:
+        if isinstance(ast, ASTToken) or Expressions.is_trivial(ast):
+            return ast
+
+        for i, child in enumerate(ast):
+            ast[i] = SubexpressionEliminator._replace(child, available)
+
+        if Expressions.is_pure(ast) and (entry := available.get(str(ast))):
+            return Expressions.ref(entry.name, entry.type, like=ast)
+        return ast
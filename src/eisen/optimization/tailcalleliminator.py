@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken, ASTElement
+from alpaca.concepts import Type, TypeManifest
+
+from eisen.common.nodedata import NodeData
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.optimization.expressions import Expressions
+import eisen.adapters as adapters
+
+class TailCallEliminator(Visitor):
+    """
+    Rewrites recursive functions whose recursive calls are all in tail position into loops. A
+    self call is in tail position if it is the last statement on some path through the function,
+    and assigns its results directly to the return values of the function:
+
+        fn count(n: int, total: int) -> r: int {       fn count(n: int, total: int) -> r: int {
+            if (n == 0) {                                   while (true) {
+                r = total                                       if (n == 0) {
+            }                                                       r = total
+            else {                                   ->             return
+                r = count(n - 1, total + n)                     }
+            }                                                   else {
+        }                                                           n, total = n - 1, total + n
+                                                                }
+                                                            }
+                                                        }
+
+    Simple accumulator style recursion, where each recursive path assigns 'r = e + f(...)' or
+    'r = e * f(...)', is first rewritten to tail calls which accumulate into a new variable.
+    """
+
+    accumulating_ops = {"+": "0", "*": "1"}
+
+    def run(self, state: BaseState) -> BaseState:
+        self.apply(State.create_from_basestate(state))
+        return state
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    @Visitor.for_ast_types("def")
+    def def_(fn, state: State):
+        function = state.get_instances()[0]
+        if not function.is_recursive_function:
+            return
+
+        node = adapters.Def(state)
+        tail = _TailContext(
+            state=state,
+            definition=state.get_ast(),
+            arg_names=node.get_arg_names(),
+            arg_types=function.type.get_argument_type().unpack(),
+            ret_names=node.get_ret_names())
+
+        seq = node.get_seq_ast()
+        accumulator = tail.find_accumulation(seq)
+        if accumulator is None and not tail.has_tail_call(seq):
+            return
+
+        statements = []
+        if accumulator is not None:
+            op, ret_type = accumulator
+            tail.accumulate_with(op, ret_type)
+            statements.append(tail.declare_accumulator(op, ret_type, like=seq))
+
+        tail.rewrite(seq)
+        loop = AST("while", lst=[
+            AST("cond", lst=[_new_token(["bool"], "true", like=seq), AST("seq", lst=seq.get_all_children(), data=seq.data)],
+                line_number=seq.line_number, data=NodeData())],
+            line_number=seq.line_number, data=NodeData())
+        statements.append(loop)
+        seq.update(type="seq", lst=statements)
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State):
+        return
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        for child in state.get_child_asts():
+            fn.apply(state.but_with(ast=child))
+
+
+def _new_token(type_chain: list[str], value: str, like: ASTElement) -> ASTToken:
+    token = ASTToken(type_chain, value, like.line_number)
+    token.data = NodeData()
+    return token
+
+class _TailContext():
+    """
+    The function being rewritten by the TailCallEliminator, and the rewriting of its tail paths.
+    """
+
+    accumulator_name = "__accumulator"
+
+    def __init__(self, state: State, definition: AST, arg_names: list[str], arg_types: list[Type],
+                 ret_names: list[str]):
+        self.state = state
+        self.definition = definition
+        self.arg_names = arg_names
+        self.arg_types = arg_types
+        self.ret_names = ret_names
+        self.op: str = None
+        self.ret_type: Type = None
+
+    def is_self_call(self, ast: ASTElement) -> bool:
+        if not isinstance(ast, AST) or ast.type != "call" or ast.first().type != "fn":
+            return False
+        return adapters.Call(self.state.but_with(ast=ast)).get_function_definition_if_known() is self.definition
+
+    def contains_self_call(self, ast: ASTElement) -> bool:
+        if not isinstance(ast, AST):
+            return False
+        return self.is_self_call(ast) or any(self.contains_self_call(child) for child in ast)
+
+    def assigns_ret_values(self, statement: AST) -> bool:
+        target = statement.first()
+        targets = list(target) if target.type == "lvals" else [target]
+        return (len(targets) == len(self.ret_names)
+            and all(t.type == "ref" and t.first().value == name for t, name in zip(targets, self.ret_names)))
+
+    def get_tail_call(self, statement: AST) -> AST | None:
+        """
+        Return the self call made by [statement] if it is a tail call.
+        """
+        if not self.ret_names:
+            return statement if self.is_self_call(statement) else None
+        if statement.type == "=" and self.assigns_ret_values(statement) and self.is_self_call(statement.second()):
+            return statement.second()
+        return None
+
+    def get_terminal_statements(self, seq: AST) -> list[AST]:
+        """
+        Return the last statement of each path through [seq], where a path through an (if ...)
+        without an else branch which takes no branch is represented by None.
+        """
+        statements = seq.get_all_children()
+        if statements and statements[-1].type == "return":
+            statements = statements[:-1]
+        if not statements:
+            return [None]
+
+        last = statements[-1]
+        if last.type != "if":
+            return [last]
+
+        terminals = []
+        for child in last:
+            terminals += self.get_terminal_statements(child.second() if child.type == "cond" else child)
+        if last[-1].type == "cond":
+            terminals.append(None)
+        return terminals
+
+    def has_tail_call(self, seq: AST) -> bool:
+        return any(self.get_tail_call(statement) is not None
+            for statement in self.get_terminal_statements(seq)
+            if statement is not None)
+
+    def find_accumulation(self, seq: AST) -> tuple[str, Type] | None:
+        """
+        If [seq] implements simple accumulator style recursion, return the accumulating operator
+        and the type of the accumulated value.
+        """
+        if len(self.ret_names) != 1:
+            return None
+
+        ret_name = self.ret_names[0]
+        ret_type = self.state.get_instances()[0].type.get_return_type()
+        realized_type = ret_type.get_type() if isinstance(ret_type, TypeManifest) else ret_type
+        if not realized_type.is_novel() or realized_type.name != "int":
+            return None
+
+        # The return value can only be reassociated if it is otherwise never read, and every path
+        # ends by assigning it.
+        if Expressions.get_referenced_names(seq).count(ret_name) != self.count_assignments(seq, ret_name):
+            return None
+        if self.contains_return(seq):
+            return None
+
+        ops = set()
+        for statement in self.get_terminal_statements(seq):
+            if statement is None or statement.type != "=" or not self.assigns_ret_values(statement):
+                return None
+            value = statement.second()
+            if not self.contains_self_call(value):
+                continue
+            if self.get_accumulated_call(value) is None:
+                return None
+            ops.add(value.type)
+
+        if len(ops) != 1:
+            return None
+        return ops.pop(), ret_type
+
+    def contains_return(self, ast: ASTElement) -> bool:
+        if not isinstance(ast, AST):
+            return False
+        return ast.type == "return" or any(self.contains_return(child) for child in ast)
+
+    def count_assignments(self, ast: ASTElement, name: str) -> int:
+        if not isinstance(ast, AST):
+            return 0
+        count = 1 if ast.type in Expressions.assignment_ops and name in Expressions.get_assigned_names(ast) else 0
+        return count + sum(self.count_assignments(child, name) for child in ast)
+
+    def get_accumulated_call(self, value: AST) -> tuple[AST, AST] | None:
+        """
+        If [value] has the form 'e op f(...)' or 'f(...) op e', where f is this function and e
+        does not depend on it, return the call and e.
+        """
+        if value.type not in TailCallEliminator.accumulating_ops:
+            return None
+
+        left, right = value.first(), value.second()
+        if self.is_self_call(right) and not self.contains_self_call(left):
+            return right, left
+
+        # The other operand would be evaluated before the call rather than after it.
+        if self.is_self_call(left) and Expressions.is_pure(right):
+            return left, right
+        return None
+
+    def accumulate_with(self, op: str, ret_type: Type):
+        self.op = op
+        self.ret_type = ret_type
+
+    def declare_accumulator(self, op: str, ret_type: Type, like: AST) -> AST:
+        data = NodeData()
+        data.returned_type = ret_type
+        binding = AST("var", lst=[_new_token(["TAG"], _TailContext.accumulator_name, like)],
+            line_number=like.line_number, data=NodeData())
+        return AST("ilet", lst=[binding, _new_token(["int"], TailCallEliminator.accumulating_ops[op], like)],
+            line_number=like.line_number, data=data)
+
+    def accumulate(self, value: AST) -> AST:
+        """
+        Return an AST which combines [value] into the accumulator.
+        """
+        return AST(self.op, lst=[Expressions.ref(_TailContext.accumulator_name, self.ret_type, like=value), value],
+            line_number=value.line_number, data=value.data)
+
+    def rewrite(self, seq: AST):
+        """
+        Rewrite each path through [seq] so that tail calls continue the enclosing loop with the new
+        arguments, and all other paths return.
+        """
+        statements = seq.get_all_children()
+        if statements and statements[-1].type == "return":
+            statements = statements[:-1]
+
+        last = statements[-1] if statements else None
+        if last is not None and last.type == "if":
+            for child in last:
+                self.rewrite(child.second() if child.type == "cond" else child)
+            # The path which takes no branch must return, but the paths through the branches may
+            # continue the loop, so the return needs its own branch.
+            if last[-1].type == "cond":
+                otherwise = AST("seq", lst=[self.new_return(like=last)], line_number=last.line_number,
+                    data=NodeData())
+                last.update(type="if", lst=last.get_all_children() + [otherwise])
+        elif last is not None and (call := self.get_tail_call_after_accumulating(last)) is not None:
+            statements = statements[:-1] + self.reassign_arguments(last, call)
+        else:
+            if self.op is not None and last is not None and last.type == "=":
+                last[1] = self.accumulate(last.second())
+            statements.append(self.new_return(like=seq))
+        seq.update(type="seq", lst=statements)
+
+    def get_tail_call_after_accumulating(self, statement: AST) -> AST | None:
+        if self.op is None:
+            return self.get_tail_call(statement)
+        if statement.type != "=" or not self.contains_self_call(statement.second()):
+            return None
+        call, accumulated = self.get_accumulated_call(statement.second())
+        statement[1] = accumulated
+        return call
+
+    def reassign_arguments(self, statement: AST, call: AST) -> list[AST]:
+        """
+        Return the statements which replace the tail call [statement] of [call], which assign the
+        arguments of the call to the parameters of the function.
+        """
+        statements = []
+        if self.op is not None:
+            accumulator = Expressions.ref(_TailContext.accumulator_name, self.ret_type, like=statement)
+            statements.append(AST("=", lst=[accumulator, self.accumulate(statement.second())],
+                line_number=statement.line_number, data=NodeData()))
+
+        # Arguments which are passed unchanged do not need to be reassigned.
+        params = adapters.Call(self.state.but_with(ast=call)).get_params_ast().get_all_children()
+        changed = [(name, arg_type, param) for name, arg_type, param in zip(self.arg_names, self.arg_types, params)
+            if not (param.type == "ref" and param.first().value == name)]
+        if not changed:
+            return statements
+
+        targets = [Expressions.ref(name, arg_type, like=param) for name, arg_type, param in changed]
+        values = [param for _, _, param in changed]
+        if len(changed) == 1:
+            statements.append(AST("=", lst=[targets[0], values[0]],
+                line_number=statement.line_number, data=NodeData()))
+        else:
+            statements.append(AST("=", lst=[
+                    AST("lvals", lst=targets, line_number=statement.line_number, data=NodeData()),
+                    AST("tuple", lst=values, line_number=statement.line_number, data=NodeData())],
+                line_number=statement.line_number, data=NodeData()))
+        return statements
+
+    def new_return(self, like: AST) -> AST:
+        return AST("return", lst=[], line_number=like.line_number, data=NodeData())
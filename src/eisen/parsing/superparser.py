@@ -71,22 +71,45 @@ class ComponentParser(ABC):
         return self.context_name
 
 class ContextParser(ComponentParser):
-    def __init__(self, config: alpaca.config.Config, context_name: str):
+    def __init__(self, config: alpaca.config.Config, context_name: str, algo: str = "cyk"):
         self.config = config
-        normer = alpaca.grammar.CFGNormalizer()
         self.context_name = context_name
-        self.cfg = normer.run(config.cfg.get_subgrammar_from(context_name))
-        self.algo = alpaca.parser.cyk.CYKAlgo(self.cfg)
-        self.builder = alpaca.parser.cyk.AstBuilder()
+        self.algo_name = algo
         self.extended_builder = EisenBuilder()
+        match algo:
+            case "cyk" | "cyk-pratt" | "cyk-parallel":
+                self.cfg = config.cfg.get_subgrammar_from(context_name)
+                self.expression_parser = None
+                if algo == "cyk-pratt":
+                    self.expression_parser = alpaca.parser.cyk.ExpressionParser(self.cfg)
+                    self.cfg = self.expression_parser.get_extended_cfg()
+
+                normer = alpaca.grammar.CFGNormalizer()
+                self.cfg = normer.run(self.cfg)
+                if algo == "cyk-parallel":
+                    self.algo = alpaca.parser.cyk.ParallelCYKAlgo(self.cfg)
+                else:
+                    self.algo = alpaca.parser.cyk.CYKAlgo(self.cfg)
+            case "lr1" | "lr1-canonical":
+                self.cfg = config.cfg.get_subgrammar_from(context_name)
+                self.algo = alpaca.parser.lr1.LR1Algo(self.cfg, start_symbol=context_name,
+                    method="lalr" if algo == "lr1" else "lr1")
+            case "earley":
+                self.cfg = config.cfg.get_subgrammar_from(context_name)
+                self.algo = alpaca.parser.earley.EarleyAlgo(self.cfg, start_symbol=context_name)
+            case _:
+                raise Exception(f"unknown parser algo '{algo}'")
 
     def parse(self, tokens: list[Token]) -> AST:
-        self.algo.parse(tokens)
-        return self.builder.run(
+        if self.algo_name not in ("cyk", "cyk-pratt", "cyk-parallel"):
+            return self.algo.parse(self.config, tokens, self.extended_builder)
+
+        return alpaca.parser.cyk.CYKParser.run(
             config=self.config,
-            nodes=self.algo.tokens,
-            dp_table=self.algo.dp_table,
+            algo=self.algo,
+            tokens=tokens,
             builder=self.extended_builder,
+            expression_parser=self.expression_parser,
             starting_rule=self.context_name)
 
 class ModParser(ComponentParser):
@@ -150,15 +173,16 @@ class TraitDefParser(ComponentParser):
 
 class SuperParser(ComponentParser):
     """
-    Parses a well formed Eisen program into a complete AST.
+    Parses a well formed Eisen program into a complete AST, parsing each context with the
+    parser [algo] (see alpaca.parser.algos).
     """
 
-    def __init__(self, config: alpaca.config.Config):
+    def __init__(self, config: alpaca.config.Config, algo: str = "cyk"):
         self.context_name = "START"
-        self.func_parser = ContextParser(config, "FUNC")
-        self.struct_parser = ContextParser(config, "STRUCT")
-        self.interface_parser = ContextParser(config, "INTERFACE")
-        self.trait_parser = ContextParser(config, "TRAIT")
+        self.func_parser = ContextParser(config, "FUNC", algo)
+        self.struct_parser = ContextParser(config, "STRUCT", algo)
+        self.interface_parser = ContextParser(config, "INTERFACE", algo)
+        self.trait_parser = ContextParser(config, "TRAIT", algo)
 
         # currently only functions are supported inside a trait definition
         self.trait_def_parser = TraitDefParser(parsers=[
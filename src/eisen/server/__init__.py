@@ -0,0 +1,4 @@
+from eisen.server.session import CompilerSession, CompilationResult, Diagnostic
+from eisen.server.jsonrpc import JsonRpcServer
+from eisen.server.document import Document, Segment
+from eisen.server.lsp import LanguageServer
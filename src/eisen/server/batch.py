@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import glob
+import time
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from eisen.server.session import CompilerSession, Diagnostic
+
+@dataclass
+class SourceFile:
+    """
+    An Eisen source file at [path], whose artifacts are written under the output directory at
+    its [relative_path].
+    """
+    path: pathlib.Path
+    relative_path: pathlib.Path
+
+@dataclass
+class FileResult:
+    path: str
+    success: bool
+    time_ms: float
+    diagnostics: list[Diagnostic] = field(default_factory=list)
+    artifact_path: str | None = None
+    error: str | None = None
+
+# Each worker process compiles every file it is given with the same session, so that the
+# grammar configuration and parser are only built once per process.
+_session: CompilerSession = None
+
+def _init_worker():
+    global _session
+    _session = CompilerSession()
+
+def _compile_file(file: SourceFile, artifact_path: pathlib.Path, target: str,
+                  optimization_level: int, tree_shaking: bool) -> FileResult:
+    start = time.perf_counter_ns()
+    try:
+        source = file.path.read_text()
+        result = _session.compile(source.strip(), target, optimization_level, tree_shaking)
+        if result.success:
+            artifact_path.parent.mkdir(parents=True, exist_ok=True)
+            artifact_path.write_text(result.artifact)
+        return FileResult(path=str(file.path), success=result.success,
+            time_ms=(time.perf_counter_ns() - start) / 1_000_000,
+            diagnostics=result.diagnostics,
+            artifact_path=str(artifact_path) if result.success else None)
+    except Exception as e:
+        return FileResult(path=str(file.path), success=False,
+            time_ms=(time.perf_counter_ns() - start) / 1_000_000,
+            error=f"{type(e).__name__}: {e}")
+
+
+class BatchCompiler():
+    """
+    Compiles many Eisen source files across a pool of worker processes, and writes the
+    artifact of each file to a tree under [output_dir] which mirrors the inputs.
+    """
+
+    source_extension = ".en"
+    artifact_extensions = {"python": ".py", "c": ".c"}
+
+    def __init__(self, output_dir: str = "./build", target: str = "python",
+                 optimization_level: int = 0, tree_shaking: bool = False, jobs: int = None):
+        if target not in BatchCompiler.artifact_extensions:
+            raise ValueError(f"cannot compile to target '{target}'")
+        self.output_dir = pathlib.Path(output_dir)
+        self.target = target
+        self.optimization_level = optimization_level
+        self.tree_shaking = tree_shaking
+        self.jobs = jobs if jobs is not None else os.cpu_count()
+
+    @staticmethod
+    def collect(inputs: list[str]) -> list[SourceFile]:
+        """
+        Find the source files described by [inputs], each of which is a directory (searched
+        recursively), a glob pattern or a single file. The relative path of each file is taken
+        from the deepest directory which contains all of them.
+        """
+        # Maps the resolved path of each file to the path it was found at.
+        paths: dict[pathlib.Path, pathlib.Path] = {}
+        for input in inputs:
+            path = pathlib.Path(input)
+            if path.is_dir():
+                matches = sorted(path.rglob("*" + BatchCompiler.source_extension))
+            elif glob.has_magic(input):
+                matches = [p for p in map(pathlib.Path, sorted(glob.glob(input, recursive=True)))
+                    if p.is_file()]
+            elif path.is_file():
+                matches = [path]
+            else:
+                raise ValueError(f"no such file, directory or pattern '{input}'")
+            for p in matches:
+                paths.setdefault(p.resolve(), p)
+
+        if not paths:
+            return []
+        root = pathlib.Path(os.path.commonpath([p.parent for p in paths]))
+        return [SourceFile(path=p, relative_path=resolved.relative_to(root))
+            for resolved, p in paths.items()]
+
+    def get_artifact_path(self, file: SourceFile) -> pathlib.Path:
+        return (self.output_dir / file.relative_path).with_suffix(
+            BatchCompiler.artifact_extensions[self.target])
+
+    def run(self, files: list[SourceFile]) -> list[FileResult]:
+        """
+        Compile all [files], returning their results in the same order.
+        """
+        if not files:
+            return []
+        jobs = max(1, min(self.jobs, len(files)))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+            futures = [executor.submit(_compile_file, file, self.get_artifact_path(file),
+                    self.target, self.optimization_level, self.tree_shaking)
+                for file in files]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def format_summary(results: list[FileResult], elapsed_ms: float, n_slowest: int = 5) -> str:
+        lines = []
+        for result in results:
+            if result.error is not None:
+                lines.append(f"{result.path}: error: {result.error}")
+            for d in result.diagnostics:
+                lines.append(f"{result.path}:{d.line}: {d.type}: {d.description}"
+                    + (f" ({d.message})" if d.message else ""))
+
+        n_failed = sum(1 for result in results if not result.success)
+        if lines:
+            lines.append("")
+        lines.append(f"compiled {len(results) - n_failed}/{len(results)} files"
+            + (f", {n_failed} failed" if n_failed else ""))
+
+        compile_time = sum(result.time_ms for result in results)
+        lines.append(f"elapsed in {round(elapsed_ms, 2)} ms ({round(compile_time, 2)} ms spent compiling)")
+        slowest = sorted(results, key=lambda result: result.time_ms, reverse=True)[:n_slowest]
+        for result in slowest:
+            lines.append(f"    {round(result.time_ms, 2):>10} ms   {result.path}")
+        return "\n".join(lines)
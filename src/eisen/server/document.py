@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import alpaca
+from alpaca.config import Config
+from alpaca.lexer import Token
+from alpaca.clr import AST, ASTToken, ASTElement
+
+from eisen.parsing.callback import EisenCallback
+from eisen.parsing.superparser import SuperParser, ParserSelector, ContextSeparator
+
+@dataclass
+class Segment:
+    """
+    A top level context of a document (a function, struct, module, etc.) which is lexed and
+    parsed on its own. The line numbers of the [tokens] and the [ast] are relative to the
+    [first_line] of the segment, so they remain valid when lines are added or removed above it.
+    If the segment could not be parsed, the [ast] is None and the [error] describes why. A
+    segment which is not [is_complete] runs to the end of the text which was split, as it could
+    not be separated into contexts (e.g. a curly brace is not closed).
+    """
+    first_line: int
+    n_lines: int
+    tokens: list[Token]
+    ast: AST | None
+    error: str | None = None
+    is_complete: bool = True
+
+    @property
+    def last_line(self) -> int:
+        return self.first_line + self.n_lines - 1
+
+    def get_key(self) -> tuple:
+        """
+        Return a key which is equal for two segments only if their tokens are the same, ignoring
+        where the segments begin.
+        """
+        return (tuple((token.type, token.value, token.line_number) for token in self.tokens),
+            self.error)
+
+    def get_ast(self) -> AST:
+        """
+        Return a copy of the AST of this segment, with line numbers relative to the document.
+        """
+        return Segment._copy(self.ast, self.first_line - 1)
+
+    @staticmethod
+    def _copy(ast: ASTElement, offset: int) -> ASTElement:
+        # Nodes without a line number (e.g. the empty (rets) inserted by the builder) keep it.
+        line_number = ast.line_number + offset if ast.line_number else ast.line_number
+        if isinstance(ast, ASTToken):
+            return ASTToken(ast.type_chain, ast.value, line_number)
+        return AST(ast.type, [Segment._copy(child, offset) for child in ast], line_number)
+
+class Document():
+    """
+    The text of a source file being edited, split into the Segments of its top level contexts.
+    An edit only re-lexes and re-parses the segments which it touches; the segments around it
+    are kept, and moved up or down if the edit adds or removes lines.
+
+    If the touched region cannot be split into contexts (e.g. a curly brace is not yet closed),
+    the rest of the document becomes a single incomplete segment, which is lexed again on every
+    edit inside it until it can be split.
+    """
+
+    def __init__(self, text: str, config: Config, parser: SuperParser):
+        self.config = config
+        self.parser = parser
+        self.lines = text.split("\n")
+        self.segments = self._segment_lines(1, len(self.lines))
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def replace(self, text: str):
+        """
+        Replace the entire text of the document.
+        """
+        self.lines = text.split("\n")
+        self.segments = self._segment_lines(1, len(self.lines))
+
+    def edit(self, start: tuple[int, int], end: tuple[int, int], text: str):
+        """
+        Replace the text between the [start] and [end] positions with [text]. Positions are the
+        (line, character) pairs used by the Language Server Protocol, and are zero based.
+        """
+        start_line, start_character = start[0] + 1, start[1]
+        end_line, end_character = end[0] + 1, end[1]
+
+        before = [s for s in self.segments if s.last_line < start_line]
+        after = [s for s in self.segments if s.first_line > end_line]
+        region_first_line = before[-1].last_line + 1 if before else 1
+        region_last_line = after[0].first_line - 1 if after else len(self.lines)
+
+        edited_lines = (self.lines[start_line-1][:start_character]
+            + text
+            + self.lines[end_line-1][end_character:]).split("\n")
+        n_added_lines = len(edited_lines) - (end_line - start_line + 1)
+        self.lines = self.lines[:start_line-1] + edited_lines + self.lines[end_line:]
+
+        for segment in after:
+            segment.first_line += n_added_lines
+        self.segments = before + self._segment_lines(
+            region_first_line, region_last_line + n_added_lines, following=after)
+
+    def get_ast(self) -> AST:
+        """
+        Return a new AST for the segments of the document which could be parsed. Each call returns
+        a fresh copy, as the Workflow modifies the AST which it validates.
+        """
+        return AST(type="start", lst=[s.get_ast() for s in self.segments if s.error is None],
+            line_number=1)
+
+    def get_errors(self) -> list[Segment]:
+        return [s for s in self.segments if s.error is not None]
+
+    def get_key(self) -> tuple:
+        """
+        Return a key which is equal for two documents only if they would be parsed into the
+        same AST, ignoring line numbers.
+        """
+        return tuple(s.get_key() for s in self.segments)
+
+    def find_segment(self, line: int) -> int | None:
+        """
+        Return the index of the segment which contains the [line], if any.
+        """
+        for i, segment in enumerate(self.segments):
+            if segment.first_line <= line <= segment.last_line:
+                return i
+        return None
+
+    def _segment_lines(self, first_line: int, last_line: int,
+                       following: list[Segment] = None) -> list[Segment]:
+        """
+        Lex and parse the lines from [first_line] to [last_line] (inclusive) into segments. The
+        [following] segments are those after [last_line]; if the lines end in a context which is
+        not closed, it may be closed by them, so they are merged and split again.
+        """
+        following = following if following is not None else []
+        if first_line > last_line:
+            return following
+
+        segments = self._split(first_line, last_line)
+        if segments and not segments[-1].is_complete and following:
+            return segments[:-1] + self._split(segments[-1].first_line, len(self.lines))
+        return segments + following
+
+    def _split(self, first_line: int, last_line: int) -> list[Segment]:
+        text = "\n".join(self.lines[first_line-1 : last_line])
+        try:
+            remaining_tokens = alpaca.lexer.run(text=text, config=self.config, callback=EisenCallback)
+        except Exception as e:
+            return [Segment(first_line=first_line, n_lines=last_line - first_line + 1,
+                tokens=[], ast=None, error=str(e), is_complete=False)]
+
+        segments = []
+        while remaining_tokens:
+            try:
+                context_tokens, remaining_tokens = ContextSeparator.split_context(remaining_tokens)
+            except Exception as e:
+                tokens = [t for t in remaining_tokens if t.type != "endl"]
+                segment_first_line = first_line + tokens[0].line_number - 1
+                segments.append(Segment(first_line=segment_first_line,
+                    n_lines=last_line - segment_first_line + 1, tokens=tokens, ast=None,
+                    error=str(e), is_complete=False))
+                break
+            if not context_tokens:
+                break
+
+            shift = context_tokens[0].line_number - 1
+            for token in context_tokens:
+                token.line_number -= shift
+            segment = Segment(first_line=first_line + shift,
+                n_lines=context_tokens[-1].line_number, tokens=context_tokens, ast=None)
+
+            try:
+                parser = ParserSelector.select_parser(context_tokens, self.parser.parsers)
+                segment.ast = parser.parse(context_tokens)
+            except KeyError:
+                segment.error = f"expected a top level context, but found '{context_tokens[0].value}'"
+            except Exception as e:
+                segment.error = str(e)
+            segments.append(segment)
+        return segments
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import os
+import socketserver
+import sys
+from contextlib import redirect_stdout
+from typing import Any, TextIO
+
+from eisen.server.session import CompilerSession
+
+class JsonRpcError(Exception):
+    parse_error = -32700
+    invalid_request = -32600
+    method_not_found = -32601
+    invalid_params = -32602
+    internal_error = -32603
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class JsonRpcServer():
+    """
+    Serves a CompilerSession over JSON-RPC 2.0, where each request and response is a single line
+    of JSON. The supported methods are:
+
+        check(source | path, tree_shaking?)
+        compile(source | path, target?, optimization_level?, tree_shaking?)
+        run(source | path, target?, optimization_level?, tree_shaking?)
+        shutdown()
+
+    Each of check, compile and run returns a CompilationResult as JSON, which reports a program
+    that cannot be parsed with a SyntaxError diagnostic. The source code is either passed
+    directly as [source], or read from the file at [path].
+    """
+
+    methods = ["check", "compile", "run", "shutdown"]
+    options = ["target", "optimization_level", "tree_shaking"]
+
+    def __init__(self, session: CompilerSession = None):
+        self.session = session if session is not None else CompilerSession()
+        self.is_running = True
+
+    def handle_line(self, line: str) -> str | None:
+        """
+        Handle the request encoded by [line], and return the encoded response, or None if the
+        request is a notification. Notifications are not answered even if they fail, and no
+        failure stops the server.
+        """
+        request_id = None
+        is_notification = False
+        try:
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise JsonRpcError(JsonRpcError.parse_error, str(e))
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise JsonRpcError(JsonRpcError.invalid_request, "expected a request object with a method")
+
+            request_id = request.get("id")
+            is_notification = "id" not in request
+            # Anything the compiler prints must not be mixed into the responses.
+            with redirect_stdout(sys.stderr):
+                result = self.dispatch(request["method"], request.get("params", {}))
+            if is_notification:
+                return None
+            return json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result})
+        except JsonRpcError as e:
+            error = {"code": e.code, "message": e.message}
+        except Exception as e:
+            error = {"code": JsonRpcError.internal_error, "message": f"{type(e).__name__}: {e}"}
+
+        if is_notification:
+            return None
+        return json.dumps({"jsonrpc": "2.0", "id": request_id, "error": error})
+
+    def dispatch(self, method: str, params: dict[str, Any]) -> Any:
+        if method not in JsonRpcServer.methods:
+            raise JsonRpcError(JsonRpcError.method_not_found, f"unknown method '{method}'")
+        if not isinstance(params, dict):
+            raise JsonRpcError(JsonRpcError.invalid_params, "params must be an object")
+
+        if method == "shutdown":
+            self.is_running = False
+            return None
+
+        source = JsonRpcServer._get_source(params)
+        options = {k: v for k, v in params.items() if k in JsonRpcServer.options}
+        if method == "check":
+            options.pop("target", None)
+            options.pop("optimization_level", None)
+
+        try:
+            match method:
+                case "check": result = self.session.check(source, **options)
+                case "compile": result = self.session.compile(source, **options)
+                case "run": result = self.session.run(source, **options)
+        except ValueError as e:
+            raise JsonRpcError(JsonRpcError.invalid_params, str(e))
+        except Exception as e:
+            raise JsonRpcError(JsonRpcError.internal_error, f"{type(e).__name__}: {e}")
+        return result.to_json()
+
+    @staticmethod
+    def _get_source(params: dict[str, Any]) -> str:
+        if isinstance(params.get("source"), str):
+            return params["source"]
+        if isinstance(params.get("path"), str):
+            try:
+                with open(params["path"], 'r') as f:
+                    return f.read()
+            except OSError as e:
+                raise JsonRpcError(JsonRpcError.invalid_params, str(e))
+        raise JsonRpcError(JsonRpcError.invalid_params, "expected either 'source' or 'path'")
+
+    def serve_stream(self, input: TextIO, output: TextIO):
+        """
+        Serve requests read from [input] until it closes or a shutdown is requested.
+        """
+        for line in input:
+            if not line.strip():
+                continue
+            response = self.handle_line(line)
+            if response is not None:
+                output.write(response + "\n")
+                output.flush()
+            if not self.is_running:
+                return
+
+    def serve_stdio(self):
+        self.serve_stream(sys.stdin, sys.stdout)
+
+    def serve_unix_socket(self, path: str):
+        """
+        Serve requests from clients connecting to the Unix domain socket at [path]. Clients are
+        handled one at a time, as compilations share the session.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    # Invalid UTF-8 is replaced rather than ending the connection.
+                    response = server.handle_line(line.decode(errors="replace"))
+                    if response is not None:
+                        self.wfile.write((response + "\n").encode())
+                        self.wfile.flush()
+                    if not server.is_running:
+                        return
+
+        if os.path.exists(path):
+            os.remove(path)
+        with socketserver.UnixStreamServer(path, Handler) as unix_server:
+            try:
+                while self.is_running:
+                    unix_server.handle_request()
+            finally:
+                os.remove(path)
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import sys
+import json
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from typing import Any, BinaryIO
+
+from eisen.server.session import CompilerSession, Diagnostic
+from eisen.server.document import Document
+from eisen.server.jsonrpc import JsonRpcError
+
+@dataclass
+class PublishedDiagnostic:
+    """
+    A Diagnostic published for a document, with the index of the segment that contained its line
+    and the line relative to that segment, so it can be moved along with the segment.
+    """
+    diagnostic: Diagnostic
+    segment: int | None
+    relative_line: int
+
+class LanguageServer():
+    """
+    A Language Server Protocol server over stdin/stdout, which publishes the diagnostics of each
+    open document as it is edited.
+
+    Documents are synchronized incrementally, and each edit only re-parses the top level contexts
+    which it touches (see Document). The Workflow is then run over the whole document, as types
+    and memory summaries depend on the other definitions in it; however, if the edit did not
+    change any tokens (e.g. it only changed whitespace or comments), the previous diagnostics are
+    moved to the new positions of their contexts instead.
+    """
+
+    name = "eisen"
+    severity_error = 1
+    message_type_error = 1
+    text_document_sync_incremental = 2
+
+    def __init__(self, session: CompilerSession = None):
+        self.session = session if session is not None else CompilerSession()
+        self.documents: dict[str, Document] = {}
+        self._validated_keys: dict[str, tuple] = {}
+        self._published: dict[str, list[PublishedDiagnostic]] = {}
+        self.output: BinaryIO = None
+        self.is_shutdown = False
+        self.is_running = True
+
+    def serve(self, input: BinaryIO = None, output: BinaryIO = None):
+        """
+        Serve messages read from [input] until it closes or the client sends 'exit'.
+        """
+        input = input if input is not None else sys.stdin.buffer
+        self.output = output if output is not None else sys.stdout.buffer
+        while self.is_running:
+            try:
+                message = LanguageServer._read_message(input)
+            except JsonRpcError as e:
+                self._send({"jsonrpc": "2.0", "id": None,
+                    "error": {"code": e.code, "message": e.message}})
+                continue
+            if message is None:
+                return
+            self.handle(message)
+
+    def handle(self, message: dict[str, Any]):
+        """
+        Handle a single [message]. A failure is reported as an error response to a request, or
+        logged to the client for a notification, so that it never stops the server.
+        """
+        method = message.get("method")
+        params = message.get("params", {})
+        is_request = "id" in message
+        try:
+            # Anything the compiler prints must not be mixed into the protocol stream.
+            with redirect_stdout(sys.stderr):
+                result = self.dispatch(method, params, is_request)
+            if is_request:
+                self._send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+        except JsonRpcError as e:
+            if is_request:
+                self._send({"jsonrpc": "2.0", "id": message["id"],
+                    "error": {"code": e.code, "message": e.message}})
+            else:
+                self._log(f"{method} failed: {e.message}")
+        except Exception as e:
+            description = f"{type(e).__name__}: {e}"
+            if is_request:
+                self._send({"jsonrpc": "2.0", "id": message["id"],
+                    "error": {"code": JsonRpcError.internal_error, "message": description}})
+            else:
+                self._log(f"{method} failed: {description}")
+
+    def dispatch(self, method: str, params: dict[str, Any], is_request: bool) -> Any:
+        match method:
+            case "initialize":
+                return {
+                    "capabilities": {
+                        "textDocumentSync": {
+                            "openClose": True,
+                            "change": LanguageServer.text_document_sync_incremental,
+                        },
+                    },
+                    "serverInfo": {"name": LanguageServer.name},
+                }
+            case "shutdown":
+                self.is_shutdown = True
+                return None
+            case "exit":
+                self.is_running = False
+            case "textDocument/didOpen":
+                document = params["textDocument"]
+                self.documents[document["uri"]] = Document(document["text"],
+                    self.session.config, self.session.parser)
+                self.publish_diagnostics(document["uri"])
+            case "textDocument/didChange":
+                uri = params["textDocument"]["uri"]
+                for change in params["contentChanges"]:
+                    self._apply_change(self.documents[uri], change)
+                self.publish_diagnostics(uri)
+            case "textDocument/didClose":
+                uri = params["textDocument"]["uri"]
+                self.documents.pop(uri, None)
+                self._validated_keys.pop(uri, None)
+                self._published.pop(uri, None)
+                self._send_diagnostics(uri, [])
+            case _ if is_request:
+                raise JsonRpcError(JsonRpcError.method_not_found, f"unknown method '{method}'")
+        return None
+
+    def publish_diagnostics(self, uri: str):
+        document = self.documents[uri]
+        key = document.get_key()
+        if key == self._validated_keys.get(uri):
+            published = self._published[uri]
+            for p in published:
+                if p.segment is not None:
+                    p.diagnostic.line = document.segments[p.segment].first_line + p.relative_line - 1
+        else:
+            published = [self._locate(document, d) for d in self._get_diagnostics(document)]
+            self._validated_keys[uri] = key
+            self._published[uri] = published
+
+        self._send_diagnostics(uri, [self._to_lsp(document, p) for p in published])
+
+    def _get_diagnostics(self, document: Document) -> list[Diagnostic]:
+        errors = document.get_errors()
+        if errors:
+            # The remaining definitions cannot be validated without the ones that are missing.
+            return [Diagnostic.of_syntax_error(segment) for segment in errors]
+
+        try:
+            result, _ = self.session.validate(document.get_ast(), document.text)
+            return result.diagnostics
+        except Exception as e:
+            self._log(f"validation failed: {type(e).__name__}: {e}")
+            return []
+
+    @staticmethod
+    def _locate(document: Document, diagnostic: Diagnostic) -> PublishedDiagnostic:
+        i = document.find_segment(diagnostic.line)
+        relative_line = diagnostic.line - document.segments[i].first_line + 1 if i is not None else 0
+        return PublishedDiagnostic(diagnostic=diagnostic, segment=i, relative_line=relative_line)
+
+    @staticmethod
+    def _to_lsp(document: Document, published: PublishedDiagnostic) -> dict:
+        diagnostic = published.diagnostic
+        first_line = max(diagnostic.line, 1)
+        last_line = first_line
+        if diagnostic.type == "SyntaxError" and published.segment is not None:
+            last_line = document.segments[published.segment].last_line
+        last_line = min(last_line, len(document.lines))
+
+        message = diagnostic.description
+        if diagnostic.message:
+            message += f" ({diagnostic.message})"
+        return {
+            "range": {
+                "start": {"line": first_line - 1, "character": 0},
+                "end": {"line": last_line - 1, "character": len(document.lines[last_line - 1])},
+            },
+            "severity": LanguageServer.severity_error,
+            "source": LanguageServer.name,
+            "code": diagnostic.type,
+            "message": message,
+        }
+
+    @staticmethod
+    def _apply_change(document: Document, change: dict):
+        if "range" not in change:
+            document.replace(change["text"])
+            return
+        start, end = change["range"]["start"], change["range"]["end"]
+        document.edit((start["line"], start["character"]), (end["line"], end["character"]),
+            change["text"])
+
+    def _send_diagnostics(self, uri: str, diagnostics: list[dict]):
+        self._send({"jsonrpc": "2.0", "method": "textDocument/publishDiagnostics",
+            "params": {"uri": uri, "diagnostics": diagnostics}})
+
+    def _log(self, message: str):
+        self._send({"jsonrpc": "2.0", "method": "window/logMessage",
+            "params": {"type": LanguageServer.message_type_error, "message": message}})
+
+    def _send(self, message: dict):
+        body = json.dumps(message).encode()
+        self.output.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        self.output.flush()
+
+    @staticmethod
+    def _read_message(input: BinaryIO) -> dict | None:
+        content_length = None
+        while True:
+            header = input.readline()
+            if not header:
+                return None
+            header = header.decode().strip()
+            if not header:
+                break
+            name, _, value = header.partition(":")
+            if name.lower() == "content-length":
+                content_length = int(value.strip())
+
+        if content_length is None:
+            return None
+        body = input.read(content_length)
+        try:
+            message = json.loads(body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise JsonRpcError(JsonRpcError.parse_error, str(e))
+        if not isinstance(message, dict):
+            raise JsonRpcError(JsonRpcError.invalid_request, "expected a message object")
+        return message
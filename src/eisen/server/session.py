@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import io
+import hashlib
+import json
+import pathlib
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field, asdict
+from typing import Callable
+
+import alpaca
+from alpaca.concepts import AbstractException
+from alpaca.clr import AST
+import python
+
+from eisen.parsing.callback import EisenCallback
+from eisen.parsing.superparser import SuperParser
+from eisen.server.document import Document, Segment
+from eisen.validation.workflow import Workflow
+from eisen.optimization.optimizer import Optimizer
+from eisen.conversion.to_python import ToPython
+from eisen.conversion.to_c import ToC
+from eisen.interpretation.bytecode_compiler import BytecodeCompiler
+from eisen.interpretation.vm import VirtualMachine
+from eisen.interpretation.closure_compiler import ClosureInterpreter
+from eisen.state.basestate import BaseState as State
+
+@dataclass
+class Diagnostic:
+    """
+    A compiler exception, in a form which can be serialized.
+    """
+    type: str
+    description: str
+    message: str
+    line: int
+
+    @staticmethod
+    def of(e: AbstractException) -> Diagnostic:
+        return Diagnostic(type=e.get_name(), description=e.description, message=e.msg,
+            line=e.line_number)
+
+    @staticmethod
+    def of_syntax_error(segment: Segment) -> Diagnostic:
+        return Diagnostic(type="SyntaxError", description="could not parse this definition",
+            message=segment.error, line=segment.first_line)
+
+@dataclass
+class CompilationResult:
+    """
+    The outcome of a request to a CompilerSession. The [artifact] is the generated code for a
+    compile request, and the [output] is what the program printed for a run request.
+    """
+    success: bool
+    diagnostics: list[Diagnostic] = field(default_factory=list)
+    artifact: str | None = None
+    output: str | None = None
+
+    def to_json(self) -> dict:
+        return asdict(self)
+
+class CompilerSession():
+    """
+    Compiles Eisen programs for a long lived process. The grammar configuration and the parser,
+    which take most of the time for a single compilation, are only built once, and results are
+    cached by the request which produced them.
+    """
+
+    grammar_file_path = "./src/eisen/grammar.gm"
+    main_function_name = "main___d_void_I__voidb"
+
+    # Targets which a program can be compiled to, and run on.
+    compile_targets = ["python", "c"]
+    run_targets = ["python", "c", "vm", "closures"]
+
+    # The maximum number of results to cache.
+    max_cached_results = 64
+
+    def __init__(self):
+        self.config = alpaca.config.parser.run(filename=CompilerSession.grammar_file_path)
+        self.parser = SuperParser(self.config)
+        self._cache: dict[str, CompilationResult] = {}
+
+    def check(self, source: str, tree_shaking: bool = False) -> CompilationResult:
+        """
+        Validate the Eisen [source] code without generating any code.
+        """
+        return self._cached(["check", source, tree_shaking],
+            lambda: self._validate(source, tree_shaking)[0])
+
+    def compile(self, source: str, target: str = "python", optimization_level: int = 0,
+                tree_shaking: bool = False) -> CompilationResult:
+        """
+        Compile the Eisen [source] code into the language of the [target].
+        """
+        if target not in CompilerSession.compile_targets:
+            raise ValueError(f"cannot compile to target '{target}'")
+
+        def compile_source() -> CompilationResult:
+            result, state = self._validate(source, tree_shaking, target)
+            if not result.success:
+                return result
+            state = Optimizer(optimization_level).run(state)
+            result.artifact = self._generate_code(state, target)
+            return result
+        return self._cached(["compile", source, target, optimization_level, tree_shaking],
+            compile_source)
+
+    def run(self, source: str, target: str = "python", optimization_level: int = 0,
+            tree_shaking: bool = False) -> CompilationResult:
+        """
+        Compile the Eisen [source] code and run it on the [target], capturing its output.
+        """
+        if target not in CompilerSession.run_targets:
+            raise ValueError(f"cannot run on target '{target}'")
+
+        result, state = self._validate(source, tree_shaking, target)
+        if not result.success:
+            return result
+        state = Optimizer(optimization_level).run(state)
+        result.output = self._run_on_target(state, target)
+        return result
+
+    def _cached(self, request: list, compute: Callable[[], CompilationResult]) -> CompilationResult:
+        """
+        Return the cached result of the [request], which lists the method and its parameters,
+        or [compute] the result and cache it.
+        """
+        key = hashlib.sha256(json.dumps(request).encode()).hexdigest()
+        if key not in self._cache:
+            if len(self._cache) >= CompilerSession.max_cached_results:
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def validate(self, ast: AST, source: str, tree_shaking: bool = False,
+                 target: str = None) -> tuple[CompilationResult, State]:
+        """
+        Run the Workflow over an [ast] which has already been parsed from the [source] code,
+        checking that it can be compiled to the [target], if one is given.
+        """
+        state = State.create_initial(self.config, ast, source, print_to_watcher=True)
+        success, state = Workflow.execute(state, steps=Workflow.get_steps(tree_shaking, target))
+        diagnostics = [Diagnostic.of(e) for e in state.watcher.diagnostics]
+        return CompilationResult(success=success, diagnostics=diagnostics), state
+
+    def _validate(self, source: str, tree_shaking: bool,
+                  target: str = None) -> tuple[CompilationResult, State | None]:
+        try:
+            tokens = alpaca.lexer.run(text=source, config=self.config, callback=EisenCallback)
+            ast = self.parser.parse(tokens)
+        except Exception as e:
+            return CompilationResult(success=False, diagnostics=self._get_syntax_errors(source, e)), None
+        return self.validate(ast, source, tree_shaking, target)
+
+    def _get_syntax_errors(self, source: str, e: Exception) -> list[Diagnostic]:
+        """
+        Return a diagnostic for each definition in the [source] which cannot be parsed, where [e]
+        was raised when parsing the [source] as a whole.
+        """
+        errors = Document(source, self.config, self.parser).get_errors()
+        if not errors:
+            return [Diagnostic(type="SyntaxError", description="could not parse the program",
+                message=str(e), line=0)]
+        return [Diagnostic.of_syntax_error(segment) for segment in errors]
+
+    def _generate_code(self, state: State, target: str) -> str:
+        match target:
+            case "python":
+                proto_code = python.Writer().run(ToPython().run(state))
+                return (ToPython.builtins + python.PostProcessor.run(proto_code)
+                    + f"\n{CompilerSession.main_function_name}()")
+            case "c":
+                return ToC().run(state)
+
+    def _run_on_target(self, state: State, target: str) -> str:
+        parts: list[str] = []
+        match target:
+            case "python":
+                buffer = io.StringIO()
+                with redirect_stdout(buffer):
+                    exec(self._generate_code(state, "python"), {"__name__": "__eisen__"})
+                return buffer.getvalue()
+            case "c":
+                with tempfile.TemporaryDirectory() as build_dir:
+                    source_path = pathlib.Path(build_dir) / "program.c"
+                    binary_path = pathlib.Path(build_dir) / "program"
+                    source_path.write_text(self._generate_code(state, "c"))
+                    subprocess.check_output(["gcc", "-O2", "-w", str(source_path), "-o", str(binary_path)])
+                    return subprocess.check_output([str(binary_path)]).decode()
+            case "vm":
+                VirtualMachine(BytecodeCompiler().run(state), write=parts.append).run()
+                return "".join(parts)
+            case "closures":
+                ClosureInterpreter(write=parts.append).run(state)
+                return "".join(parts)
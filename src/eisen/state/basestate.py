@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import io
 from typing import Self
-from alpaca.concepts import Module, Context, AbstractParams, AbstractException, Corpus, TypeFactory2
+from alpaca.concepts import (Module, Context, AbstractParams, AbstractException, Corpus, TypeFactory2,
+                             SourceText)
 from alpaca.config import Config
 from alpaca.clr import AST
 
@@ -21,11 +23,42 @@ class SharedBool():
         self.value = value
 
 class Watcher():
+    """
+    Collects the output of the compiler. Exceptions are held as structured diagnostics and are
+    only rendered (with the surrounding source context) once the text is actually read.
+    """
     def __init__(self):
-        self.txt = ""
+        self._buffer = io.StringIO()
+        self._pending: list[tuple[AbstractException, SourceText]] = []
+        self.diagnostics: list[AbstractException] = []
+        self.n_reported = 0
 
     def write(self, content: str):
-        self.txt += content
+        self._render_pending()
+        self._buffer.write(content)
+
+    def add_diagnostic(self, e: AbstractException, source: SourceText):
+        self.diagnostics.append(e)
+        self._pending.append((e, source))
+
+    def take_unreported(self, exceptions: list[AbstractException]) -> list[AbstractException]:
+        """
+        Return the [exceptions] which have not yet been passed to this watcher, and mark them
+        as reported.
+        """
+        unreported = exceptions[self.n_reported: ]
+        self.n_reported = len(exceptions)
+        return unreported
+
+    def _render_pending(self):
+        for e, source in self._pending:
+            self._buffer.write(e.to_str_with_context(source))
+        self._pending = []
+
+    @property
+    def txt(self) -> str:
+        self._render_pending()
+        return self._buffer.getvalue()
 
 class SharedCounter():
     def __init__(self, n: int):
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from alpaca.concepts import Module, Context
+from alpaca.clr import AST
+
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.interpretation.bytecode import FunctionBuilder
+
+class BytecodeCompilerState(State):
+    def __init__(self, **kwargs):
+        self._init(**kwargs)
+
+    def but_with(self,
+            ast: AST = None,
+            context: Context = None,
+            mod: Module = None,
+            builder: FunctionBuilder = None,
+            trait_implementation_key: str = None,
+            ) -> BytecodeCompilerState:
+
+        return self._but_with(
+            ast=ast,
+            context=context,
+            mod=mod,
+            builder=builder,
+            trait_implementation_key=trait_implementation_key)
+
+    @classmethod
+    def create_from_basestate(cls, state: BaseState):
+        return BytecodeCompilerState(**state._get(), builder=None, trait_implementation_key=None)
+
+    def get_builder(self) -> FunctionBuilder:
+        return self.builder
+
+    def get_trait_implementation_key(self) -> str | None:
+        return self.trait_implementation_key
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from alpaca.concepts import Module, Context, Type
+from alpaca.clr import AST
+
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+
+class ToCState(State):
+    def __init__(self, **kwargs):
+        self._init(**kwargs)
+
+    def but_with(self,
+            ast: AST = None,
+            context: Context = None,
+            mod: Module = None,
+            ret_names: list[str] = None,
+            ret_type: Type = None,
+            trait_implementation_prefix: str = None,
+            owners: list[list[str]] = None,
+            ) -> ToCState:
+
+        return self._but_with(
+            ast=ast,
+            context=context,
+            mod=mod,
+            ret_names=ret_names,
+            ret_type=ret_type,
+            trait_implementation_prefix=trait_implementation_prefix,
+            owners=owners)
+
+    @classmethod
+    def create_from_basestate(cls, state: BaseState):
+        return ToCState(**state._get(),
+            ret_names=None,
+            ret_type=None,
+            trait_implementation_prefix=None,
+            owners=None)
+
+    def get_ret_names(self) -> list[str] | None:
+        return self.ret_names
+
+    def get_ret_type(self) -> Type | None:
+        return self.ret_type
+
+    def get_trait_implementation_prefix(self) -> str | None:
+        """
+        If inside a (trait_def ...), the prefix of the C names of the functions which implement
+        the trait for the struct.
+        """
+        return self.trait_implementation_prefix
+
+    def get_owners(self) -> list[list[str]] | None:
+        """
+        Inside a function, the names of the variables which own a struct allocation, for each
+        enclosing scope, from the outermost to the innermost.
+        """
+        return self.owners
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import os
+import re
 from os import walk
 import time
 import sys
+import shutil
 import pathlib
 import multiprocessing
 import subprocess
@@ -21,13 +23,35 @@ from eisen.parsing.callback import EisenCallback
 from eisen.parsing.superparser import SuperParser
 from eisen.state.basestate import BaseState as State
 from eisen.validation.workflow import Workflow
+from eisen.optimization.optimizer import Optimizer
 from eisen.conversion.to_python import ToPython
+from eisen.conversion.to_c import ToC
+from eisen.interpretation.bytecode_compiler import BytecodeCompiler
+from eisen.interpretation.vm import VirtualMachine
+from eisen.interpretation.closure_compiler import ClosureInterpreter
+from eisen.units import UnitCompiler, UnitResult
 
 @dataclass
 class CompilerException:
     type: str
     contains: str
 
+    # 'contains' text which refers to a line number, e.g. "Line 12:" or ">> 12"
+    line_reference_regex = re.compile(r"^(?:Line |>> )?(\d+):?$")
+
+    def matches(self, e: AbstractException) -> bool:
+        """
+        True if the reported exception [e] has the expected type and either occurs on the
+        referenced line or contains the expected text in its message.
+        """
+        if self.type not in (e.get_name(), e.type):
+            return False
+
+        line_reference = CompilerException.line_reference_regex.match(self.contains)
+        if line_reference:
+            return int(line_reference.group(1)) == e.line_number
+        return self.contains in e.msg or self.contains in e.description
+
 @dataclass
 class TestExpectation:
     success: bool
@@ -56,18 +80,39 @@ class TestRunnerConfiguration:
     # The shared SuperParser instance
     parser: SuperParser = None
 
+    # The language which tests that compile successfully are converted into and run; either
+    # "python" or "c", or "vm" or "closures" to run them directly on the bytecode VirtualMachine
+    # or with the ClosureInterpreter
+    target = "python"
+
+    # The level at which tests that compile successfully are optimized before running them; a
+    # test may require a higher level with 'optimization_level' in its [Test] metadata
+    optimization_level = 0
+
+    # True to remove code which is unreachable from main before analyzing it; a test which
+    # expects diagnostics from unreachable code opts out with 'tree_shaking = false' in its
+    # [Test] metadata
+    tree_shaking = False
+
+    # The algorithm which the parser uses; one of alpaca.parser.algos
+    parser_algo = "cyk"
+
     deprecated = ["legacy/interface1", "legacy/embed"]
     vectors = ["vector/append", "vector/creation", "vector/append2"]
 
+    # The files which are only compiled as the units declared by tests with 'units = true' in
+    # their [Test] metadata
+    unit_dependencies = ["units/shapes", "units/counters", "units/figures"]
+
     # The list of tests which should not be run
-    disabled_tests = ["legacy/objects"] + vectors + deprecated
+    disabled_tests = ["legacy/objects"] + vectors + deprecated + unit_dependencies
 
     _initialized = False
     @classmethod
     def initialize(cls):
         if cls._initialized: return
         cls.alpaca_config = alpaca.config.parser.run(filename=TestRunnerConfiguration.grammar_file_path)
-        cls.parser = SuperParser(cls.alpaca_config)
+        cls.parser = SuperParser(cls.alpaca_config, cls.parser_algo)
         cls._initialized = True
 
 class Test:
@@ -81,6 +126,9 @@ class Test:
         self.name = self.metadata["Test"]["name"]
         self.path = test_path
         self.info = self.metadata["Test"]["info"]
+        self.optimization_level = self.metadata["Test"].get("optimization_level", 0)
+        self.tree_shaking = self.metadata["Test"].get("tree_shaking", True)
+        self.units = self.metadata["Test"].get("units", False)
         self.expectation = TestExpectation(**self.metadata["Expects"])
 
     def parse_ast(self) -> AST:
@@ -93,13 +141,13 @@ class Test:
         contents = e.contains
         return f"expected to encounter exception '{exception_type}' containing:\n{contents}\nbut got:\n-----\n{state.watcher.txt}\n-----\n"
 
-    def _get_build_file_name(self) -> str:
-        return f"./build/{self.path}.py"
+    def _get_build_file_name(self, extension: str = "py") -> str:
+        return f"./build/{self.path}.{extension}"
 
     def _save_python_target(self, state: State) -> None:
         ast = ToPython().run(state)
         proto_code = python.Writer().run(ast)
-        code = ToPython.builtins + python.PostProcessor.run(proto_code) + ToPython.lmda + "\nmain___d_void_I__voidb()"
+        code = ToPython.builtins + python.PostProcessor.run(proto_code) + "\nmain___d_void_I__voidb()"
         pathlib.Path(self._get_build_file_name()).parent.mkdir(parents=True, exist_ok=True)
         with open(self._get_build_file_name(), 'w') as f:
             f.write(code)
@@ -108,6 +156,81 @@ class Test:
         bytes = subprocess.check_output(["python", self._get_build_file_name()])
         return bytes.decode()
 
+    def _save_c_target(self, state: State) -> None:
+        code = ToC().run(state)
+        pathlib.Path(self._get_build_file_name("c")).parent.mkdir(parents=True, exist_ok=True)
+        with open(self._get_build_file_name("c"), 'w') as f:
+            f.write(code)
+        subprocess.check_output(["gcc", "-O2", "-w", self._get_build_file_name("c"),
+                                 "-o", self._get_build_file_name("out")])
+
+    def _run_c_target(self) -> str:
+        bytes = subprocess.check_output([self._get_build_file_name("out")])
+        return bytes.decode()
+
+    def _run_on_vm(self, state: State) -> str:
+        parts: list[str] = []
+        VirtualMachine(BytecodeCompiler().run(state), write=parts.append).run()
+        return "".join(parts)
+
+    def _run_with_closures(self, state: State) -> str:
+        parts: list[str] = []
+        ClosureInterpreter(write=parts.append).run(state)
+        return "".join(parts)
+
+    def _run_units(self) -> tuple[bool, str]:
+        """
+        Compile this test and the files it declares as separate units, from a copy of the test
+        directory, and check its output. The units are then compiled again to check that none
+        are compiled while unchanged, and that changing the interface of a dependency compiles
+        both the dependency and its dependents.
+        """
+        # Units generate code, so tests which run on the VM or with closures use python.
+        target = TestRunnerConfiguration.target if TestRunnerConfiguration.target == "c" else "python"
+        level = max(TestRunnerConfiguration.optimization_level, self.optimization_level)
+        scratch_dir = pathlib.Path(self._get_build_file_name("units"))
+        source_dir = scratch_dir / "src"
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        shutil.copytree(pathlib.Path(TestRunnerConfiguration.test_dir + self.path).parent, source_dir)
+
+        root = source_dir / (pathlib.Path(self.path).name + ".en")
+        compiler = UnitCompiler(str(scratch_dir / "out"), target, level, jobs=1)
+        results = compiler.run(str(root))
+        if not all(result.success for result in results):
+            return False, "units failed to compile:\n" + UnitCompiler.format_summary(results)
+
+        status, msg = self._check_output(self._run_units_artifacts(compiler, root, results))
+        if not status:
+            return status, msg
+
+        results = compiler.run(str(root))
+        recompiled = [result.name for result in results if not result.up_to_date]
+        if recompiled:
+            return False, f"expected all units to be up to date, but compiled: {', '.join(recompiled)}"
+
+        # A new function changes the interface of the dependency.
+        dependency = next(result.name for result in results if result.name != root.stem)
+        with open(source_dir / (dependency + ".en"), 'a') as f:
+            f.write("\nfn added_by_test_runner() -> r: int {\n    r = 0\n}\n")
+        results = compiler.run(str(root))
+        up_to_date = [result.name for result in results if result.up_to_date]
+        if up_to_date or not all(result.success for result in results):
+            return False, ("expected all units to be compiled after changing the interface of "
+                f"'{dependency}':\n" + UnitCompiler.format_summary(results))
+        return self._check_output(self._run_units_artifacts(compiler, root, results))
+
+    @staticmethod
+    def _run_units_artifacts(compiler: UnitCompiler, root: pathlib.Path, results: list[UnitResult]) -> str:
+        artifact_path = str(compiler.get_root_artifact_path(str(root)))
+        if compiler.target == "python":
+            return subprocess.check_output(["python", artifact_path]).decode()
+
+        # Each unit is a separate translation unit.
+        executable_path = artifact_path.removesuffix(".c")
+        subprocess.check_output(["gcc", "-O2", "-w"] + [result.artifact_path for result in results]
+            + ["-o", executable_path])
+        return subprocess.check_output([executable_path]).decode()
+
     def _check_output(self, output: str):
         if not self.expectation.output:
             return True, "success"
@@ -123,8 +246,19 @@ class Test:
     def _evaluate_result(self, succeeded: bool, state: State) -> tuple[bool, str]:
         match self.expectation.success, succeeded:
             case True, True:
-                self._save_python_target(state)
-                output = self._run_python_target()
+                level = max(TestRunnerConfiguration.optimization_level, self.optimization_level)
+                state = Optimizer(level).run(state)
+                match TestRunnerConfiguration.target:
+                    case "python":
+                        self._save_python_target(state)
+                        output = self._run_python_target()
+                    case "c":
+                        self._save_c_target(state)
+                        output = self._run_c_target()
+                    case "vm":
+                        output = self._run_on_vm(state)
+                    case "closures":
+                        output = self._run_with_closures(state)
                 return self._check_output(output)
             case True, False:
                 print(state.watcher.txt)
@@ -136,18 +270,18 @@ class Test:
 
     def _check_exceptions(self, state: State) -> tuple[bool, str]:
         num_expected_exceptions = len(self.expectation.compiler_exceptions)
-        got_number_of_exceptions = state.watcher.txt.count(AbstractException.delineator)
+        got_number_of_exceptions = len(state.watcher.diagnostics)
         if num_expected_exceptions != got_number_of_exceptions:
             return False, f"expected ({num_expected_exceptions}) exceptions but got ({got_number_of_exceptions}) in: \n{state.watcher.txt}"
 
-        txt = state.watcher.txt
+        unmatched = state.watcher.diagnostics.copy()
         for e in self.expectation.compiler_exceptions:
-            if e.type not in txt or e.contains not in txt:
+            match = next((reported for reported in unmatched if e.matches(reported)), None)
+            if match is None:
                 return False, Test._make_exception_error_msg(e, state)
 
-            # remove the strings from the output to avoid double lookup
-            txt = txt.replace(e.type, "", 1)
-            txt = txt.replace(e.contains, "", 1)
+            # remove the matched exception to avoid double lookup
+            unmatched.remove(match)
         return True, "success"
 
     def run(self) -> tuple[bool, str]:
@@ -159,14 +293,27 @@ class Test:
                 original_hook(e_type, e_value, tb)
 
         sys.excepthook = exceptions_hook
+        if self.units:
+            return self._run_units()
 
         ast = self.parse_ast()
         state = State.create_initial(TestRunnerConfiguration.alpaca_config, ast, txt=self.code, print_to_watcher=True)
-        return self._evaluate_result(*Workflow.execute(state))
+        steps = Workflow.get_steps(TestRunnerConfiguration.tree_shaking and self.tree_shaking,
+            TestRunnerConfiguration.target)
+        return self._evaluate_result(*Workflow.execute(state, steps=steps))
 
 class TestRunner():
     @staticmethod
-    def run_test_by_name(name: str):
+    def run_test_by_name(name: str, target: str = None, optimization_level: int = None,
+                         tree_shaking: bool = None, parser_algo: str = None):
+        if target is not None:
+            TestRunnerConfiguration.target = target
+        if optimization_level is not None:
+            TestRunnerConfiguration.optimization_level = optimization_level
+        if tree_shaking is not None:
+            TestRunnerConfiguration.tree_shaking = tree_shaking
+        if parser_algo is not None:
+            TestRunnerConfiguration.parser_algo = parser_algo
         TestRunnerConfiguration.initialize()
         return Test(name).run()
 
@@ -197,6 +344,11 @@ class TestRunner():
         with multiprocessing.Pool(TestRunnerConfiguration.n_workers) as p:
             data: list[str] = p.map(TestRunner.run_test_in_thread, tests)
 
+            # let the workers exit normally, rather than being terminated, so that they flush
+            # their logs.
+            p.close()
+            p.join()
+
         successes = data.count("success!")
         msg = "\n".join([m for m in data if m != "success!"])
         print(msg)
@@ -240,7 +392,12 @@ class TestRunner():
         print(f"finished in {round(end-start, 4)}s\n{successes}/{total_tests} ({round(100.0*successes/total_tests, 2)}%) succeeded")
 
     @staticmethod
-    def run_all_tests(verbose: bool):
+    def run_all_tests(verbose: bool, target: str = "python", optimization_level: int = 0,
+                      tree_shaking: bool = False, parser_algo: str = "cyk"):
+        TestRunnerConfiguration.target = target
+        TestRunnerConfiguration.optimization_level = optimization_level
+        TestRunnerConfiguration.tree_shaking = tree_shaking
+        TestRunnerConfiguration.parser_algo = parser_algo
         TestRunnerConfiguration.initialize()
         if not verbose:
             TestRunner.run_all_tests_threadpooled()
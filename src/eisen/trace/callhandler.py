@@ -135,6 +135,9 @@ class CallHandler:
                 # functions do not need to be modified, we can skip here.
                 # TODO: can we structure the algorithm so we don't need this?
                 if impression.shadow.entity == origin_entity: continue
+                # the result of a nested call (e.g. f(g(x))) is a temporary which is not held by any
+                # entity of the caller, so there is nothing to update.
+                if self.state.get_shadow(impression.shadow.entity) is None: continue
                 self.state.update_source_of_impression(impression, update_with_shadow)
 
     @staticmethod
@@ -392,13 +395,36 @@ class CallHandlingLogic:
         be applied to add/remove memory dependencies is known.
         """
         for situation in current_situations:
-            delta = fn.function_db.get_function_delta(situation.function_instance.get_uuid_name())
+            name = situation.function_instance.get_uuid_name()
+            delta = fn.function_db.get_function_delta(name)
+            if delta is None:
+                delta = fn.function_db.get_specialized_function_delta(name, situation.blessings)
             if delta is None:
                 delta = FunctionDelta.compute_for(adapters.Def(situation.call_node.state.but_with(
                     ast=situation.function_instance.ast,
                     function_parameters=situation.blessings)), fn)
             situation.delta = delta
-        return current_situations
+        return CallHandlingLogic._without_duplicate_situations(current_situations)
+
+    @staticmethod
+    def _without_duplicate_situations(situations: list[Situation]) -> list[Situation]:
+        """
+        Different blessings may still produce the same FunctionDelta, in which case handling the
+        call for each of them would have the same effect.
+        """
+        unique_situations: list[Situation] = []
+        for situation in situations:
+            if not any(CallHandlingLogic._are_equivalent(situation, other) for other in unique_situations):
+                unique_situations.append(situation)
+        return unique_situations
+
+    @staticmethod
+    def _are_equivalent(a: Situation, b: Situation) -> bool:
+        return (a.delta is b.delta
+            and a.function_instance is b.function_instance
+            and a.caller_impression is b.caller_impression
+            and a.entanglement is b.entanglement
+            and a.call_parameters is b.call_parameters)
 
     @staticmethod
     def assess_entanglements(current_situations: list[Situation]) -> list[Situation]:
@@ -78,12 +78,18 @@ class FunctionDelta():
                     angel_shadows={ angel.uid: fn_state.get_shadow(angel) for angel in angels },
                     ret_memories=[fn_state.get_memory(entity.name) for entity in fn_state.get_ret_entities()])
 
-        # if the node has a function as an argument, we can't add this to the database yet.
+        # if the node has a function as an argument, the delta only holds for the blessings it was
+        # traced with.
         if not node.has_function_as_argument() and not node.has_trait_as_argument():
             # add a new function_delta for this function
             fn.function_db.add_function_delta(
                 name=node.get_function_instance().get_uuid_name(),
                 fc=delta)
+        else:
+            fn.function_db.add_specialized_function_delta(
+                name=node.get_function_instance().get_uuid_name(),
+                blessings=state.get_function_parameters(),
+                fc=delta)
 
         return delta
 
@@ -102,13 +108,24 @@ class FunctionDB():
     """
     A wrapper around a dictionary mapping the FQDN of a function (str) to its computed
     FunctionDelta.
+
+    Functions which take functions or traits as arguments are traced separately for each set of
+    blessings they are called with. Their FunctionDeltas are cached by the FQDN of the function
+    and the signature of the blessings.
     """
 
     def __init__(self) -> None:
         self._function_deltas: dict[str, FunctionDelta] = {}
+        self._specialized_function_deltas: dict[tuple[str, str], FunctionDelta] = {}
 
     def add_function_delta(self, name: str, fc: FunctionDelta):
         self._function_deltas[name] = fc
 
     def get_function_delta(self, name: str) -> FunctionDelta:
         return self._function_deltas.get(name, None)
+
+    def add_specialized_function_delta(self, name: str, blessings: list[Blessing], fc: FunctionDelta):
+        self._specialized_function_deltas[(name, Blessing.get_signature_of_all(blessings))] = fc
+
+    def get_specialized_function_delta(self, name: str, blessings: list[Blessing]) -> FunctionDelta:
+        return self._specialized_function_deltas.get((name, Blessing.get_signature_of_all(blessings)), None)
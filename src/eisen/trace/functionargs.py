@@ -94,6 +94,25 @@ class Blessing:
                 # TODO: implement
                 return
 
+    def get_signature(self) -> str:
+        """
+        A canonical description of what this blessing imparts. A function traced with blessings
+        of the same signatures produces the same FunctionDelta.
+        """
+        match self.type:
+            case Blessing.Type.FunctionArgument:
+                function_instance = self.function_shadow.function_instances[0]
+                curried_args = self.function_shadow.personality.size()
+                return f"fn({function_instance.get_uuid_name()}, {curried_args})"
+            case Blessing.Type.TraitArgument:
+                return f"impl({self.trait_implementer_type.get_uuid_str()})"
+            case _:
+                return "_"
+
+    @staticmethod
+    def get_signature_of_all(blessings: list[Blessing]) -> str:
+        return ", ".join(blessing.get_signature() for blessing in blessings)
+
     @staticmethod
     def is_struct_with_function_attribute(struct_type: Type):
         # TODO: allow for multi-depth handling
@@ -150,8 +169,12 @@ class Blessing:
                                    for param_type, memory in zip(function_argument_type.unpack(), function_params)]
 
         # Each parameter has a set of associated blessings. Return all possible configurations of
-        # blessings taking one from each parameter.
-        return list(itertools.product(*blessings_for_parameter))
+        # blessings taking one from each parameter, but only one configuration of each signature,
+        # as these produce the same FunctionDelta.
+        combinations: dict[str, list[Blessing]] = {}
+        for combination in itertools.product(*blessings_for_parameter):
+            combinations.setdefault(Blessing.get_signature_of_all(combination), combination)
+        return list(combinations.values())
 
 class FunctionsAsArgumentsLogic:
     """
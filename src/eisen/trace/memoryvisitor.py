@@ -264,7 +264,7 @@ class MemoryVisitor(Visitor):
             # Otherwise, mark the state of each Memory as seen.
             encountered_memory_states.add(state_hash)
 
-        fn.logger.log(f"Runs over while loop {times_run} times.")
+        fn.logger.log("Runs over while loop %i times.", times_run)
 
         # ignore the last branch state as this is the one where memories have equilibrated
         # and so is a duplicate.
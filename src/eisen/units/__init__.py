@@ -0,0 +1,4 @@
+from eisen.units.unit import Unit, UnitGraph, split_module_declarations
+from eisen.units.interface import InterfaceSummary, InterfaceSummarizer, InterfaceLoader
+from eisen.units.deltaencoder import DeltaEncoder
+from eisen.units.compiler import UnitCompiler, UnitResult
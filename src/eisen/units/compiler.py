@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import pickle
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import alpaca
+from alpaca.clr import AST
+import python
+
+from eisen.server.session import CompilerSession, Diagnostic
+from eisen.validation.workflow import Workflow
+from eisen.validation.functionvisitor import FunctionVisitor
+from eisen.trace.memoryvisitor import MemoryVisitor
+from eisen.trace.delta import FunctionDB
+from eisen.optimization.optimizer import Optimizer
+from eisen.conversion.to_python import ToPython
+from eisen.conversion.to_c import ToC
+from eisen.state.basestate import BaseState
+from eisen.units.unit import Unit, UnitGraph
+from eisen.units.interface import InterfaceSummary, InterfaceSummarizer, InterfaceLoader
+
+@dataclass
+class UnitResult:
+    """
+    The outcome of compiling a unit. A unit which was [up_to_date] was not compiled again, and
+    its result is read from the previous build.
+    """
+    name: str
+    success: bool
+    up_to_date: bool = False
+    time_ms: float = 0
+    diagnostics: list[Diagnostic] = field(default_factory=list)
+    artifact_path: str | None = None
+    error: str | None = None
+
+
+# Each worker process compiles every unit it is given with the same session, so that the
+# grammar configuration and parser are only built once per process.
+_session: CompilerSession = None
+
+def _init_worker():
+    global _session
+    _session = CompilerSession()
+
+def _with_function_db(function_db: FunctionDB) -> type[MemoryVisitor]:
+    """
+    Return a MemoryVisitor which starts from the FunctionDeltas in [function_db], and adds the
+    FunctionDeltas it computes to it.
+    """
+    class memory_visitor(MemoryVisitor):
+        def __init__(self, debug: bool = False):
+            super().__init__(debug)
+            self.function_db = function_db
+    return memory_visitor
+
+def _compile_unit(unit: Unit, dependencies: list[str], build_dir: pathlib.Path, target: str,
+                  optimization_level: int, dependency_keys: dict[str, str]) -> UnitResult:
+    start = time.perf_counter_ns()
+    try:
+        result = _compile_unit_unsafe(unit, dependencies, build_dir, target, optimization_level,
+            dependency_keys)
+    except Exception as e:
+        result = UnitResult(name=unit.name, success=False, error=f"{type(e).__name__}: {e}")
+    result.time_ms = (time.perf_counter_ns() - start) / 1_000_000
+    return result
+
+def _compile_unit_unsafe(unit: Unit, dependencies: list[str], build_dir: pathlib.Path, target: str,
+                         optimization_level: int, dependency_keys: dict[str, str]) -> UnitResult:
+    children = UnitCompiler.load_ast(build_dir, unit, _session)
+    summaries = [UnitCompiler.read_summary(build_dir, name) for name in dependencies]
+    dependency_children = [child for summary in summaries
+        for child in summary.get_declarations(_session.config)]
+    ast = AST(type="start", lst=dependency_children + children, line_number=1)
+
+    function_db = FunctionDB()
+    steps = [_with_function_db(function_db) if step is MemoryVisitor else step
+        for step in Workflow.get_steps(target=target)]
+    i = steps.index(FunctionVisitor) + 1
+    steps = steps[:i] + [InterfaceLoader.of(summaries, function_db)] + steps[i:]
+
+    state = BaseState.create_initial(_session.config, ast, unit.source, print_to_watcher=True)
+    success, state = Workflow.execute(state, steps=steps)
+    diagnostics = [Diagnostic.of(e) for e in state.watcher.diagnostics]
+    if not success:
+        UnitCompiler.write_manifest(build_dir, unit, target, optimization_level, dependency_keys,
+            summary=None, success=False)
+        return UnitResult(name=unit.name, success=False, diagnostics=diagnostics)
+
+    # The Workflow rewrites the ASTs it validates, so the declarations are printed from a
+    # second copy of the parsed AST.
+    parsed = UnitCompiler.load_ast(build_dir, unit, _session)
+    summary = InterfaceSummarizer(function_db, dependencies).run(state, unit.name, parsed)
+    state = Optimizer(optimization_level).run(state)
+    artifact = UnitCompiler.generate_code(state, unit, dependencies, target)
+    artifact_path = UnitCompiler.get_artifact_path(build_dir, unit.name, target)
+    artifact_path.write_text(artifact)
+
+    UnitCompiler.write_manifest(build_dir, unit, target, optimization_level, dependency_keys,
+        summary=summary, success=True)
+    return UnitResult(name=unit.name, success=True, diagnostics=diagnostics,
+        artifact_path=str(artifact_path))
+
+
+class UnitCompiler():
+    """
+    Compiles a program made of many units, each compiled on its own into [build_dir]:
+
+        NAME.ast.pickle     the parsed AST of the unit, reused while its source is unchanged
+        NAME.unit.json      the InterfaceSummary of the unit, and what it was compiled from
+        NAME.py / NAME.c    the generated code of the unit
+
+    A unit is compiled with the InterfaceSummaries of its dependencies, which declare their
+    structs, traits and functions, and hold the FunctionDeltas which the MemoryVisitor applies
+    where their functions are called. Only the bodies of functions whose deltas cannot be
+    summarized (e.g. those taking functions or traits) are analyzed again by their dependents.
+
+    A unit is only compiled again if its source changed, or if the interface of one of its
+    dependencies changed. Units whose dependencies are compiled are compiled in parallel, by
+    [jobs] worker processes, or in this process for a single job.
+
+    The python artifact of a unit imports the artifacts of its dependencies. The c artifacts
+    are separate translation units, which are linked into one program.
+    """
+
+    artifact_extensions = {"python": ".py", "c": ".c"}
+
+    def __init__(self, build_dir: str = "./build", target: str = "python",
+                 optimization_level: int = 0, jobs: int = None):
+        if target not in UnitCompiler.artifact_extensions:
+            raise ValueError(f"cannot compile to target '{target}'")
+        self.build_dir = pathlib.Path(build_dir)
+        self.target = target
+        self.optimization_level = optimization_level
+        self.jobs = jobs if jobs is not None else os.cpu_count()
+        self.config = alpaca.config.parser.run(filename=CompilerSession.grammar_file_path)
+
+    def run(self, root_path: str) -> list[UnitResult]:
+        """
+        Compile the program whose main function is in the file at [root_path], returning the
+        result for each of its units, in the order they were compiled.
+        """
+        graph = UnitGraph(root_path, self.config)
+        self.build_dir.mkdir(parents=True, exist_ok=True)
+
+        results: dict[str, UnitResult] = {}
+        executor = None
+        try:
+            for level in graph.get_levels():
+                pending = []
+                for unit in level:
+                    dependencies = graph.get_transitive_dependencies(unit)
+                    failed = [d.name for d in dependencies if not results[d.name].success]
+                    if failed:
+                        results[unit.name] = UnitResult(name=unit.name, success=False,
+                            error=f"cannot compile as its dependency '{failed[0]}' failed")
+                        continue
+
+                    keys = {d.name: self._get_dependency_key(d) for d in dependencies}
+                    if self._is_up_to_date(unit, keys):
+                        results[unit.name] = UnitResult(name=unit.name, success=True,
+                            up_to_date=True, artifact_path=self._get_existing_artifact(unit))
+                        continue
+                    pending.append((unit, [d.name for d in dependencies], keys))
+
+                if not pending:
+                    continue
+                if self.jobs <= 1:
+                    # Compiling in this process also works where no worker processes can be
+                    # started, e.g. inside the workers of the TestRunner.
+                    if _session is None:
+                        _init_worker()
+                    for unit, dependencies, keys in pending:
+                        results[unit.name] = _compile_unit(unit, dependencies, self.build_dir,
+                            self.target, self.optimization_level, keys)
+                    continue
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker)
+                futures = [executor.submit(_compile_unit, unit, dependencies, self.build_dir,
+                        self.target, self.optimization_level, keys)
+                    for unit, dependencies, keys in pending]
+                for future in futures:
+                    result = future.result()
+                    results[result.name] = result
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return list(results.values())
+
+    def get_root_artifact_path(self, root_path: str) -> pathlib.Path:
+        return UnitCompiler.get_artifact_path(self.build_dir, pathlib.Path(root_path).stem, self.target)
+
+    def _get_dependency_key(self, unit: Unit) -> str:
+        """
+        Return a key which changes whenever a dependent of [unit] must be compiled again, which
+        is whenever the interface of the unit changes.
+        """
+        return UnitCompiler.read_manifest(self.build_dir, unit.name)["fingerprint"]
+
+    def _is_up_to_date(self, unit: Unit, dependency_keys: dict[str, str]) -> bool:
+        manifest = UnitCompiler.read_manifest(self.build_dir, unit.name)
+        return (manifest is not None
+            and manifest["success"]
+            and manifest["source_hash"] == unit.get_source_hash()
+            and manifest["target"] == self.target
+            and manifest["optimization_level"] == self.optimization_level
+            and manifest["dependency_keys"] == dependency_keys
+            and self._get_existing_artifact(unit) is not None)
+
+    def _get_existing_artifact(self, unit: Unit) -> str | None:
+        path = UnitCompiler.get_artifact_path(self.build_dir, unit.name, self.target)
+        return str(path) if path.exists() else None
+
+    @staticmethod
+    def get_artifact_path(build_dir: pathlib.Path, name: str, target: str) -> pathlib.Path:
+        return build_dir / (name + UnitCompiler.artifact_extensions[target])
+
+    @staticmethod
+    def load_ast(build_dir: pathlib.Path, unit: Unit, session: CompilerSession) -> list[AST]:
+        """
+        Return the parsed AST of [unit], from the previous build if its source has not changed.
+        """
+        path = build_dir / (unit.name + ".ast.pickle")
+        if path.exists():
+            with open(path, "rb") as f:
+                cached = pickle.load(f)
+            if cached["source_hash"] == unit.get_source_hash():
+                return cached["ast"]
+
+        children = unit.parse(session.config, session.parser)
+        with open(path, "wb") as f:
+            pickle.dump({"source_hash": unit.get_source_hash(), "ast": children}, f)
+        return children
+
+    @staticmethod
+    def read_summary(build_dir: pathlib.Path, name: str) -> InterfaceSummary:
+        return InterfaceSummary.from_json(UnitCompiler.read_manifest(build_dir, name)["interface"])
+
+    @staticmethod
+    def read_manifest(build_dir: pathlib.Path, name: str) -> dict | None:
+        path = build_dir / (name + ".unit.json")
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    @staticmethod
+    def write_manifest(build_dir: pathlib.Path, unit: Unit, target: str, optimization_level: int,
+                       dependency_keys: dict[str, str], summary: InterfaceSummary | None,
+                       success: bool):
+        manifest = {
+            "unit": unit.name,
+            "source_hash": unit.get_source_hash(),
+            "target": target,
+            "optimization_level": optimization_level,
+            "dependency_keys": dependency_keys,
+            "success": success,
+            "fingerprint": summary.get_fingerprint() if summary is not None else None,
+            "interface": summary.to_json() if summary is not None else None,
+        }
+        (build_dir / (unit.name + ".unit.json")).write_text(json.dumps(manifest, indent=2))
+
+    @staticmethod
+    def generate_code(state: BaseState, unit: Unit, dependencies: list[str], target: str) -> str:
+        match target:
+            case "python":
+                # Dependencies are imported from their own artifacts, rather than generated again.
+                ast = state.get_ast()
+                ast.update(type="start", lst=[child for child in ast
+                    if not (child.type == "mod" and child.first().value in dependencies)])
+
+                imports = "".join(f"from {name} import *\n" for name in unit.dependencies)
+                code = ToPython.builtins + imports + python.PostProcessor.run(
+                    python.Writer().run(ToPython().run(state)))
+                if unit.is_root:
+                    code += f"\n{CompilerSession.main_function_name}()"
+                else:
+                    # Generated names begin with an underscore, which 'import *' would skip.
+                    code += "\n__all__ = [name for name in dir() if not name.startswith('__')]\n"
+                return code
+            case "c":
+                # Only the types of dependencies are defined again; their functions are declared,
+                # and linked from their own artifacts.
+                return ToC().run(state, external_modules=dependencies)
+
+    @staticmethod
+    def format_summary(results: list[UnitResult]) -> str:
+        lines = []
+        for result in results:
+            status = ("up to date" if result.up_to_date
+                else f"compiled in {round(result.time_ms, 2)} ms" if result.success
+                else "failed")
+            lines.append(f"{result.name:>24}   {status}")
+            if result.error is not None:
+                lines.append(f"{'':>24}   error: {result.error}")
+            for d in result.diagnostics:
+                lines.append(f"{'':>24}   line {d.line}: {d.type}: {d.description}"
+                    + (f" ({d.message})" if d.message else ""))
+        return "\n".join(lines)
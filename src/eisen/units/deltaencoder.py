@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import uuid
+
+from alpaca.concepts import Type
+
+from eisen.common.eiseninstance import FunctionInstance
+from eisen.trace.delta import FunctionDelta
+from eisen.trace.entity import Entity, Angel, Trait, origin_entity
+from eisen.trace.memory import Memory, MemorableSet, Impression
+from eisen.trace.shadow import Shadow, Personality
+from eisen.trace.entanglement import Entanglement
+
+class DeltaEncoder():
+    """
+    Converts a FunctionDelta to and from JSON, so that the dependents of a unit can apply the
+    delta of each of its functions without tracing the body of the function again.
+
+    Each entity which the delta refers to is identified by its position among the arguments
+    ("arg:0"), return values ("ret:0") and angels ("angel:0") of the function, or is the origin
+    entity of pure functions ("origin"). Entanglements are numbered in the order they are found.
+
+    A delta which refers to any other entity, or which holds function values, cannot be encoded,
+    and the function must be traced by its dependents instead.
+    """
+
+    def __init__(self):
+        self.ids: dict[uuid.UUID, str] = {}
+        self.entanglements: dict[uuid.UUID, int] = {}
+
+    @staticmethod
+    def encode(delta: FunctionDelta) -> dict | None:
+        try:
+            return DeltaEncoder()._encode(delta)
+        except DeltaEncoder.NotEncodable:
+            return None
+
+    class NotEncodable(Exception):
+        pass
+
+    def _encode(self, delta: FunctionDelta) -> dict:
+        self.ids[origin_entity.uid] = "origin"
+        entities = {}
+        for prefix, shadows in (("arg", delta.arg_shadows), ("ret", delta.ret_shadows)):
+            for i, shadow in enumerate(shadows):
+                if shadow.entity.uid not in self.ids:
+                    self.ids[shadow.entity.uid] = f"{prefix}:{i}"
+                    entities[f"{prefix}:{i}"] = {"name": shadow.entity.name, "depth": shadow.entity.depth}
+
+        # Angels are created after the entities they guard.
+        for i, angel in enumerate(delta.angels):
+            self.ids[angel.uid] = f"angel:{i}"
+            entities[f"angel:{i}"] = {"guardian": self._id_of(angel.entity), "trait": angel.trait.value}
+
+        return {
+            "entities": entities,
+            "args": [self._shadow(s) for s in delta.arg_shadows],
+            "rets": [self._shadow(s) for s in delta.ret_shadows],
+            "angel_shadows": {self._id_of(angel): self._shadow(delta.angel_shadows[angel.uid])
+                for angel in delta.angels if delta.angel_shadows.get(angel.uid) is not None},
+            "ret_memories": [self._memory(m) for m in delta.ret_memories],
+        }
+
+    def _id_of(self, entity: Entity) -> str:
+        if entity.uid not in self.ids:
+            raise DeltaEncoder.NotEncodable()
+        return self.ids[entity.uid]
+
+    def _shadow(self, shadow: Shadow) -> dict:
+        if shadow.function_instances:
+            raise DeltaEncoder.NotEncodable()
+        return {
+            "entity": self._id_of(shadow.entity),
+            "personality": {trait.value: self._memory(memory)
+                for trait, memory in sorted(shadow.personality.memories.items())},
+        }
+
+    def _memory(self, memory: Memory | None) -> dict | None:
+        if memory is None:
+            return None
+        return {
+            "name": memory.name,
+            "rewrites": memory.rewrites,
+            "depth": memory.depth,
+            "impressions": sorted((self._impression(i) for i in memory.impressions), key=str),
+        }
+
+    def _impression(self, impression: Impression) -> list:
+        if impression.shadow.function_instances:
+            raise DeltaEncoder.NotEncodable()
+        return [self._id_of(impression.shadow.entity), impression.root.value,
+            self._entanglement(impression.entanglement)]
+
+    def _entanglement(self, entanglement: Entanglement | None) -> list | None:
+        if entanglement is None:
+            return None
+        return [self._number(entanglement.uid),
+            sorted(self._number(uid) for uid in entanglement.sub_entanglements)]
+
+    def _number(self, uid: uuid.UUID) -> int:
+        if uid not in self.entanglements:
+            self.entanglements[uid] = len(self.entanglements)
+        return self.entanglements[uid]
+
+    @staticmethod
+    def get_stable_form(data: dict) -> dict:
+        """
+        Return the encoded delta [data] without the numbers of its entanglements, which depend on
+        the order in which the impressions were found.
+        """
+        def memory(m: dict | None) -> dict | None:
+            if m is None:
+                return None
+            return {**m, "impressions": sorted([id, root, entanglement is not None]
+                for id, root, entanglement in m["impressions"])}
+
+        def shadow(s: dict) -> dict:
+            return {**s, "personality": {trait: memory(m) for trait, m in s["personality"].items()}}
+
+        return {**data,
+            "args": [shadow(s) for s in data["args"]],
+            "rets": [shadow(s) for s in data["rets"]],
+            "angel_shadows": {id: shadow(s) for id, s in data["angel_shadows"].items()},
+            "ret_memories": [memory(m) for m in data["ret_memories"]]}
+
+    @staticmethod
+    def decode(data: dict, instance: FunctionInstance) -> FunctionDelta:
+        """
+        Return the FunctionDelta encoded as [data], for the function [instance] of the dependent
+        which is being compiled.
+        """
+        return DeltaDecoder(data, instance).run()
+
+
+class DeltaDecoder():
+    def __init__(self, data: dict, instance: FunctionInstance):
+        self.data = data
+        self.instance = instance
+        self.entities: dict[str, Entity] = {"origin": origin_entity}
+        self.shadows: dict[str, Shadow] = {}
+        self.entanglements: dict[int, uuid.UUID] = {}
+
+    def run(self) -> FunctionDelta:
+        types = {
+            "arg": self.instance.type.get_argument_type().unpack(),
+            "ret": self.instance.type.get_return_type().unpack() }
+
+        angels: list[Angel] = []
+        for id, entity in self.data["entities"].items():
+            kind, i = id.split(":")
+            if kind == "angel":
+                angel = Angel(trait=Trait(entity["trait"]), entity=self.entities[entity["guardian"]])
+                angels.append(angel)
+                self.entities[id] = angel
+            else:
+                self.entities[id] = Entity(entity["name"], entity["depth"],
+                    DeltaDecoder._get_type(types[kind], int(i)))
+
+        return FunctionDelta(
+            function_name=self.instance.name,
+            arg_shadows=[self._shadow(s) for s in self.data["args"]],
+            ret_shadows=[self._shadow(s) for s in self.data["rets"]],
+            angels=angels,
+            angel_shadows={self.entities[id].uid: self._shadow(s)
+                for id, s in self.data["angel_shadows"].items()},
+            ret_memories=[self._memory(m) for m in self.data["ret_memories"]])
+
+    @staticmethod
+    def _get_type(types: list[Type], i: int) -> Type | None:
+        return types[i] if i < len(types) else None
+
+    def _shadow(self, data: dict) -> Shadow:
+        return Shadow(
+            entity=self.entities[data["entity"]],
+            personality=Personality({Trait(trait): self._memory(memory)
+                for trait, memory in data["personality"].items()}))
+
+    def _memory(self, data: dict | None) -> Memory | None:
+        if data is None:
+            return None
+        return Memory(
+            name=data["name"],
+            rewrites=data["rewrites"],
+            depth=data["depth"],
+            impressions=MemorableSet(set(self._impression(i) for i in data["impressions"])))
+
+    def _impression(self, data: list) -> Impression:
+        id, root, entanglement = data
+        # Impressions only need to know their entity, so each entity shares a single shadow.
+        if id not in self.shadows:
+            self.shadows[id] = (Shadow.get_identity_shadow() if id == "origin"
+                else Shadow(entity=self.entities[id]))
+        return Impression(
+            shadow=self.shadows[id],
+            root=Trait(root),
+            entanglement=self._entanglement(entanglement))
+
+    def _entanglement(self, data: list | None) -> Entanglement | None:
+        if data is None:
+            return None
+        uid, sub_entanglements = data
+        return Entanglement(self._uid_of(uid), set(self._uid_of(i) for i in sub_entanglements))
+
+    def _uid_of(self, number: int) -> uuid.UUID:
+        if number not in self.entanglements:
+            self.entanglements[number] = uuid.uuid4()
+        return self.entanglements[number]
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import json
+import hashlib
+from dataclasses import dataclass, field, asdict
+
+from alpaca.utils import Visitor
+from alpaca.config import Config
+from alpaca.clr import AST, ASTToken, ASTElement, CLRParser
+from alpaca.concepts import Type, TypeManifest
+
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+from eisen.trace.delta import FunctionDB
+from eisen.units.deltaencoder import DeltaEncoder
+import eisen.adapters as adapters
+
+@dataclass
+class TypeSummary:
+    name: str
+    kind: str
+    attributes: list[tuple[str, str]]
+
+@dataclass
+class FunctionSummary:
+    """
+    A function exported by a unit. The [symbol] is the name of the function in generated code,
+    and the [key] identifies its FunctionDelta. The [delta] is the FunctionDelta encoded by the
+    DeltaEncoder, or None if the delta depends on the functions or traits passed to it, or cannot
+    be encoded; dependents must then trace the body of the function themselves.
+    """
+    name: str
+    type: str
+    symbol: str
+    key: str
+    delta: dict | None = None
+
+@dataclass
+class InterfaceSummary:
+    """
+    Everything which a dependent of the [unit] relies on: the types it declares, the signatures
+    and FunctionDeltas of its functions, and its [declarations]. These are the top level
+    declarations of the unit as (mod ...) ASTs, with the body of every function which has a
+    [delta] removed, so that dependents can declare its structs, traits, trait implementations
+    and functions without analyzing its code. Dependents only need to be compiled again if the
+    fingerprint of this summary changes.
+    """
+    unit: str
+    types: list[TypeSummary] = field(default_factory=list)
+    functions: list[FunctionSummary] = field(default_factory=list)
+    declarations: list[str] = field(default_factory=list)
+
+    def to_json(self) -> dict:
+        return asdict(self)
+
+    @staticmethod
+    def from_json(data: dict) -> InterfaceSummary:
+        return InterfaceSummary(
+            unit=data["unit"],
+            types=[TypeSummary(t["name"], t["kind"], [tuple(a) for a in t["attributes"]])
+                for t in data["types"]],
+            functions=[FunctionSummary(**f) for f in data["functions"]],
+            declarations=data["declarations"])
+
+    def get_fingerprint(self) -> str:
+        data = self.to_json()
+        for f in data["functions"]:
+            if f["delta"] is not None:
+                f["delta"] = DeltaEncoder.get_stable_form(f["delta"])
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+    def get_declarations(self, config: Config) -> list[AST]:
+        """
+        Parse the [declarations] into the ASTs which they were printed from.
+        """
+        return [InterfaceSummary._with_unquoted_strings(CLRParser.run(config, declaration))
+            for declaration in self.declarations]
+
+    @staticmethod
+    def _with_unquoted_strings(ast: ASTElement) -> ASTElement:
+        # Strings are printed inside quotes, which the CLRParser keeps.
+        if isinstance(ast, ASTToken):
+            if ast.type == "str":
+                ast.value = ast.value[1:-1]
+            return ast
+        for child in ast:
+            InterfaceSummary._with_unquoted_strings(child)
+        return ast
+
+
+class InterfaceSummarizer(Visitor):
+    """
+    Builds the InterfaceSummary of a unit from its validated AST, using the FunctionDeltas
+    which the MemoryVisitor computed. Only the (mod ...) of the unit, or the top level of the
+    root unit, is summarized; the modules of its dependencies are skipped.
+
+    The declarations are printed from the [parsed] ASTs of the unit, as the Workflow rewrites
+    some of the ASTs it validates.
+    """
+
+    def __init__(self, function_db: FunctionDB, dependencies: list[str], debug: bool = False):
+        super().__init__(debug)
+        self.function_db = function_db
+        self.dependencies = set(dependencies)
+        self.summary: InterfaceSummary = None
+        self.bodiless: set[AST] = set()
+
+    def run(self, state: BaseState, unit: str, parsed: list[AST]) -> InterfaceSummary:
+        self.summary = InterfaceSummary(unit=unit)
+        self.apply(State.create_from_basestate(state))
+
+        validated = [child for child in state.get_ast()
+            if not (child.type == "mod" and child.first().value in self.dependencies)]
+        self.summary.declarations = [str(self._without_bodies(v, p))
+            for v, p in zip(validated, parsed)]
+        return self.summary
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    @Visitor.for_ast_types("start")
+    def start_(fn, state: State):
+        for child in state.get_child_asts():
+            if child.type == "mod" and child.first().value in fn.dependencies:
+                continue
+            fn.apply(state.but_with(ast=child))
+
+    @Visitor.for_ast_types("mod")
+    def mod_(fn, state: State):
+        adapters.Mod(state).enter_module_and_apply(fn)
+
+    @Visitor.for_ast_types("struct")
+    def struct_(fn, state: State):
+        node = adapters.Struct(state)
+        fn._add_type(state, node.get_name(), "struct", node.get_this_type())
+        node.apply_fn_to_create_ast(fn)
+
+    @Visitor.for_ast_types("trait")
+    def trait_(fn, state: State):
+        node = adapters.Trait(state)
+        fn._add_type(state, node.get_name(), "trait", node.get_this_type())
+
+    @Visitor.for_ast_types("interface")
+    def interface_(fn, state: State):
+        name = state.get_ast().first().value
+        fn._add_type(state, name, "interface", state.get_corpus().get_type(
+            name=name, environmental_namespace=None,
+            specified_namespace=state.get_enclosing_module().get_namespace_str()))
+
+    @Visitor.for_ast_types("trait_def")
+    def trait_def_(fn, state: State):
+        adapters.TraitDef(state).apply_fn_to_all_defined_functions(fn)
+
+    @Visitor.for_ast_types(*adapters.CommonFunction.ast_types)
+    def def_(fn, state: State):
+        node = adapters.Def(state)
+        instance = node.get_function_instance()
+        delta = fn.function_db.get_function_delta(instance.get_uuid_name())
+        encoded = DeltaEncoder.encode(delta) if delta is not None else None
+        if encoded is not None:
+            fn.bodiless.add(state.get_ast())
+
+        fn.summary.functions.append(FunctionSummary(
+            name=InterfaceSummarizer._qualify(state, node.get_function_name()),
+            type=str(instance.type),
+            symbol=instance.get_full_name(),
+            key=instance.get_uuid_name(),
+            delta=encoded))
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        return
+
+    @staticmethod
+    def _qualify(state: State, name: str) -> str:
+        # The namespace of the module outer::inner is "::outer::inner".
+        namespace = state.get_enclosing_module().get_namespace_str()
+        return namespace[2:] + "::" + name if namespace else name
+
+    def _add_type(self, state: State, name: str, kind: str, type: Type):
+        if isinstance(type, TypeManifest):
+            type = type.get_type()
+        attributes = ([(attribute, str(t)) for attribute, t in type.get_all_attribute_name_type_pairs()]
+            if type is not None else [])
+        self.summary.types.append(TypeSummary(name=InterfaceSummarizer._qualify(state, name),
+            kind=kind, attributes=attributes))
+
+    def _without_bodies(self, validated: ASTElement, parsed: ASTElement) -> ASTElement:
+        """
+        Return a copy of the [parsed] AST without the bodies of the functions whose [validated]
+        ASTs are bodiless.
+        """
+        if validated in self.bodiless:
+            return AST(type=parsed.type, line_number=parsed.line_number,
+                lst=[AST(type="seq", lst=[]) if child.type == "seq" else child for child in parsed])
+        if isinstance(parsed, ASTToken) or parsed.type not in InterfaceLoader.containers:
+            return parsed
+        return AST(type=parsed.type, line_number=parsed.line_number,
+            lst=[self._without_bodies(v, p) for v, p in zip(validated, parsed)])
+
+
+class InterfaceLoader(Visitor):
+    """
+    Declares the dependencies of a unit from their InterfaceSummaries. This runs once the
+    FunctionVisitor has added the functions of the dependencies to their modules, and removes
+    each function whose FunctionDelta is in the summary from the AST, so that its body is never
+    analyzed. Its FunctionDelta is added to the [function_db] of the MemoryVisitor instead.
+    """
+
+    # The ASTs which may contain functions.
+    containers = ["start", "mod", "struct", "trait_def"]
+
+    summaries: list[InterfaceSummary] = []
+    function_db: FunctionDB = None
+
+    @staticmethod
+    def of(summaries: list[InterfaceSummary], function_db: FunctionDB) -> type[InterfaceLoader]:
+        class loader(InterfaceLoader): pass
+        loader.summaries = summaries
+        loader.function_db = function_db
+        return loader
+
+    def __init__(self, debug: bool = False):
+        super().__init__(debug)
+        self.deltas = {f.key: f.delta for summary in self.summaries for f in summary.functions
+            if f.delta is not None}
+        self.units = {summary.unit for summary in self.summaries}
+
+    def run(self, state: BaseState) -> BaseState:
+        self.apply(State.create_from_basestate(state))
+        return state
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    @Visitor.for_ast_types("start")
+    def start_(fn, state: State):
+        for child in state.get_child_asts():
+            if child.type == "mod" and child.first().value in fn.units:
+                fn.apply(state.but_with(ast=child))
+
+    @Visitor.for_ast_types("mod", "struct", "trait_def")
+    def container_(fn, state: State):
+        ast = state.get_ast()
+        remaining = []
+        for child in ast:
+            if isinstance(child, AST) and child.type in adapters.CommonFunction.ast_types:
+                instance = state.but_with(ast=child).get_instances()[0]
+                delta = fn.deltas.get(instance.get_uuid_name())
+                if delta is not None:
+                    fn.function_db.add_function_delta(instance.get_uuid_name(),
+                        DeltaEncoder.decode(delta, instance))
+                    continue
+            elif isinstance(child, AST) and child.type in InterfaceLoader.containers:
+                fn.apply(state.but_with(ast=child))
+            remaining.append(child)
+        ast.update(type=ast.type, lst=remaining)
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        return
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import hashlib
+import pathlib
+from dataclasses import dataclass, field
+
+import alpaca
+from alpaca.config import Config
+from alpaca.lexer import Token
+from alpaca.clr import AST, ASTToken
+
+from eisen.parsing.callback import EisenCallback
+from eisen.parsing.superparser import SuperParser
+
+@dataclass
+class Unit:
+    """
+    A source file which is compiled on its own. Each unit other than the root of a program is
+    the module [name], which is declared by a dependent with a bodiless module declaration:
+
+        mod geometry            loads the unit 'geometry' from geometry.en next to the
+                                file which declares it
+
+    The [dependencies] are the names of the units which this unit declares.
+    """
+    name: str
+    path: pathlib.Path
+    source: str
+    dependencies: list[str] = field(default_factory=list)
+    is_root: bool = False
+
+    source_extension = ".en"
+
+    def get_source_hash(self) -> str:
+        return hashlib.sha256(self.source.encode()).hexdigest()
+
+    def parse(self, config: Config, parser: SuperParser) -> AST:
+        """
+        Parse this unit into the children of the (start ...) AST of a program. A dependency is
+        parsed into a single (mod ...) AST named after the unit.
+        """
+        tokens = alpaca.lexer.run(text=self.source.strip(), config=config, callback=EisenCallback)
+        _, tokens = split_module_declarations(tokens)
+        children = parser.parse(tokens).get_all_children() if tokens else []
+        if self.is_root:
+            return children
+
+        name = ASTToken(type_chain=["TAG"], value=self.name, line_number=1)
+        return [AST(type="mod", lst=[name] + children, line_number=1)]
+
+    @staticmethod
+    def load(path: pathlib.Path, config: Config, is_root: bool = False) -> Unit:
+        source = path.read_text()
+        tokens = alpaca.lexer.run(text=source.strip(), config=config, callback=EisenCallback)
+        dependencies, _ = split_module_declarations(tokens)
+        return Unit(name=path.stem, path=path, source=source, dependencies=dependencies,
+            is_root=is_root)
+
+
+def split_module_declarations(tokens: list[Token]) -> tuple[list[str], list[Token]]:
+    """
+    Remove the top level module declarations without a body (mod NAME) from the [tokens],
+    returning the names which are declared and the remaining tokens.
+    """
+    names = []
+    remaining_tokens = []
+    depth = 0
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if (depth == 0
+                and token.type == "mod"
+                and i + 1 < len(tokens) and tokens[i+1].type == "TAG"
+                and (i + 2 == len(tokens) or tokens[i+2].type == "endl")):
+            names.append(tokens[i+1].value)
+            i += 3
+            continue
+
+        if token.type == "{":
+            depth += 1
+        elif token.type == "}":
+            depth -= 1
+        remaining_tokens.append(token)
+        i += 1
+    return names, remaining_tokens
+
+
+class UnitGraph():
+    """
+    The units of a program, found by following the module declarations of the root unit.
+    """
+
+    def __init__(self, root_path: str, config: Config):
+        self.config = config
+        self.units: dict[str, Unit] = {}
+        self.root = Unit.load(pathlib.Path(root_path), config, is_root=True)
+        self.units[self.root.name] = self.root
+        self._load_dependencies(self.root, [self.root.name])
+
+    def _load_dependencies(self, unit: Unit, chain: list[str]):
+        for name in unit.dependencies:
+            if name in chain:
+                raise Exception(f"circular module declarations: {' -> '.join(chain + [name])}")
+
+            path = unit.path.parent / (name + Unit.source_extension)
+            if name in self.units:
+                if self.units[name].path.resolve() != path.resolve():
+                    raise Exception(f"module '{name}' is declared from both '{self.units[name].path}' and '{path}'")
+                continue
+            if not path.is_file():
+                raise Exception(f"cannot find module '{name}' declared in '{unit.path}' (expected '{path}')")
+
+            self.units[name] = Unit.load(path, self.config)
+            self._load_dependencies(self.units[name], chain + [name])
+
+    def get_transitive_dependencies(self, unit: Unit) -> list[Unit]:
+        """
+        Return every unit which [unit] depends on, directly or not, with each unit listed after
+        its own dependencies.
+        """
+        ordered: list[Unit] = []
+        def visit(u: Unit):
+            for name in u.dependencies:
+                dependency = self.units[name]
+                if dependency not in ordered:
+                    visit(dependency)
+                    ordered.append(dependency)
+        visit(unit)
+        return ordered
+
+    def get_levels(self) -> list[list[Unit]]:
+        """
+        Return the units grouped into levels, where the units of each level only depend on the
+        units of the levels before it, and so can be compiled in parallel.
+        """
+        levels: dict[str, int] = {}
+        def get_level(unit: Unit) -> int:
+            if unit.name not in levels:
+                levels[unit.name] = 1 + max((get_level(self.units[name]) for name in unit.dependencies),
+                    default=-1)
+            return levels[unit.name]
+
+        for unit in self.units.values():
+            get_level(unit)
+        grouped = [[] for _ in range(max(levels.values()) + 1)]
+        for unit in self.units.values():
+            grouped[levels[unit.name]].append(unit)
+        return grouped
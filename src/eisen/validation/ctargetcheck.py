@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from alpaca.utils import Visitor
+
+from eisen.common.exceptions import Exceptions
+from eisen.state.basestate import BaseState as State
+import eisen.adapters as adapters
+
+class CTargetCheck(Visitor):
+    """
+    Reports an UnsupportedByTarget exception for each use of a feature which the C target cannot
+    generate code for, which are vectors and interfaces. This only runs when compiling to C, and
+    runs before the other validations, so it only relies on the syntax of the program.
+    """
+
+    def run(self, state: State):
+        self.apply(state)
+        return state
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    def _report(fn, state: State, feature: str):
+        state.report_exception(Exceptions.UnsupportedByTarget(
+            msg=f"the C target does not support {feature}",
+            line_number=state.get_line_number()))
+
+    @Visitor.for_ast_types("new_vec", "index")
+    def vec_(fn, state: State):
+        fn._report(state, "vectors")
+
+    @Visitor.for_ast_types("interface")
+    def interface_(fn, state: State):
+        fn._report(state, "interfaces")
+
+    @Visitor.for_ast_types("call", "raw_call")
+    def call_(fn, state: State):
+        if adapters.Call(state).is_append():
+            fn._report(state, "vectors")
+        fn._apply_to_children(state)
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State):
+        return
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        fn._apply_to_children(state)
+
+    def _apply_to_children(fn, state: State):
+        for child in state.get_child_asts():
+            fn.apply(state.but_with(ast=child))
@@ -22,6 +22,10 @@ class FnConverter(Visitor):
     def no_action_(fn, state: State):
         return
 
+    @Visitor.for_ast_types("mod")
+    def mod_(fn, state: State):
+        adapters.Mod(state).enter_module_and_apply(fn)
+
     @Visitor.for_ast_types("def", "create", "is_fn")
     def def_(fn, state: State):
         adapters.CommonFunction(state).enter_context_and_apply(fn)
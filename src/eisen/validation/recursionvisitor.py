@@ -73,7 +73,8 @@ class FindRecursiveClosure(Visitor):
                 return state.is_this_the_original_instance(instance)
 
             state.mark_function_as_checked(instance)
-            fn.apply(state.but_with(ast=instance.ast))
+            if fn.apply(state.but_with(ast=instance.ast)):
+                return True
         return False
 
     # (def ...) (create ...)
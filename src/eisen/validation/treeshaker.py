@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+from alpaca.utils import Visitor
+from alpaca.clr import AST, ASTToken, ASTElement
+
+from eisen.state.basestate import BaseState
+from eisen.state.state_postinstancevisitor import State_PostInstanceVisitor as State
+import eisen.adapters as adapters
+
+class TreeShaker(Visitor):
+    """
+    Removes every (def ...), (struct ...), (trait ...) and (trait_def ...) which cannot be
+    reached from main, so that the following (more expensive) visitors and the backends only
+    process the code which is used.
+
+    A function is reachable if it is referenced by reachable code, whether it is called or used
+    as a value. A struct or trait is reachable if its name is used by reachable code, which then
+    makes its fields and constructor reachable. An implementation of a trait for a struct is
+    reachable if both the trait and the struct are.
+
+    Structs and traits are found by name rather than by type, so one is kept whenever any
+    reachable code uses its name, even if it refers to something else.
+
+    Unreachable code is still type checked, as this runs after the TypeChecker.
+    """
+
+    def __init__(self, debug: bool = False):
+        super().__init__(debug)
+        self.reachable: set[AST] = set()
+
+    def run(self, state: BaseState) -> BaseState:
+        state = State.create_from_basestate(state)
+        declarations = FindDeclarations().run(state)
+        roots = self.get_roots(state, declarations)
+        if roots is None:
+            return state
+
+        self.reachable = TreeShaker.find_reachable(state, declarations, roots)
+        self.apply(state)
+        return state
+
+    def get_roots(self, state: State, declarations: list[AST]) -> list[AST] | None:
+        """
+        Return the [declarations] which are used without being referenced, or None if every
+        declaration should be kept.
+        """
+        roots = [child for child in state.get_child_asts()
+            if child.type == "def" and adapters.Def(state.but_with(ast=child)).get_function_name() == "main"]
+
+        # Without an entry point, everything is considered used.
+        return roots if roots else None
+
+    @staticmethod
+    def find_reachable(state: State, declarations: list[AST], roots: list[AST]) -> set[AST]:
+        """
+        Return the [declarations] which are reachable from the [roots], along with the (def ...)
+        and (create ...) ASTs of every function they reference.
+        """
+        reachable = set(roots)
+        pending = list(roots)
+        names: set[str] = set()
+        while pending:
+            while pending:
+                ast = pending.pop()
+                names |= TreeShaker.get_names(ast)
+                for referenced in FindReferencedDefinitions().apply(state.but_with(ast=ast)):
+                    if referenced not in reachable:
+                        reachable.add(referenced)
+                        pending.append(referenced)
+
+            # Names used by newly reachable code may make further structs and traits reachable.
+            for declaration in declarations:
+                if declaration not in reachable and TreeShaker.is_used(state, declaration, names):
+                    reachable.add(declaration)
+                    pending.append(declaration)
+        return reachable
+
+    @staticmethod
+    def is_used(state: State, declaration: AST, names: set[str]) -> bool:
+        match declaration.type:
+            case "struct" | "trait":
+                return declaration.first().value in names
+            case "trait_def":
+                node = adapters.TraitDef(state.but_with(ast=declaration))
+                return node.get_trait_name() in names and node.get_struct_name() in names
+            case _:
+                return False
+
+    @staticmethod
+    def get_names(ast: ASTElement) -> set[str]:
+        if isinstance(ast, ASTToken):
+            return {ast.value}
+        return {name for child in ast for name in TreeShaker.get_names(child)}
+
+    def apply(self, state: State) -> None:
+        return self._route(state.get_ast(), state)
+
+    @Visitor.for_ast_types("start")
+    def start_(fn, state: State):
+        state.get_ast().update(type="start", lst=fn._shake(state, state.get_all_children()))
+
+    @Visitor.for_ast_types("mod")
+    def mod_(fn, state: State):
+        # (mod name ...)
+        ast = state.get_ast()
+        ast.update(type="mod", lst=[ast.first()] + fn._shake(state, ast[1:]))
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        return
+
+    def _shake(self, state: State, children: list[AST]) -> list[AST]:
+        remaining = []
+        for child in children:
+            if child.type in FindDeclarations.ast_types and child not in self.reachable:
+                continue
+            self.apply(state.but_with(ast=child))
+            remaining.append(child)
+        return remaining
+
+
+class FindDeclarations(Visitor):
+    """
+    Return the declarations which the TreeShaker may remove, at the top level and inside
+    modules.
+    """
+
+    ast_types = ["def", "struct", "trait", "trait_def"]
+
+    def run(self, state: State) -> list[AST]:
+        return self.apply(state)
+
+    def apply(self, state: State) -> list[AST]:
+        return self._route(state.get_ast(), state)
+
+    @Visitor.for_ast_types("start")
+    def start_(fn, state: State):
+        return [declaration for child in state.get_child_asts()
+            for declaration in fn.apply(state.but_with(ast=child))]
+
+    @Visitor.for_ast_types("mod")
+    def mod_(fn, state: State):
+        return [declaration for child in state.get_ast()[1:]
+            for declaration in fn.apply(state.but_with(ast=child))]
+
+    @Visitor.for_ast_types(*ast_types)
+    def declaration_(fn, state: State):
+        return [state.get_ast()]
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        return []
+
+
+class FindReferencedDefinitions(Visitor):
+    """
+    Return the (def ...) and (create ...) ASTs of all functions which are referenced inside an
+    AST.
+    """
+
+    def apply(self, state: State) -> list[AST]:
+        return self._route(state.get_ast(), state)
+
+    @Visitor.for_ast_types("fn", "::")
+    def fn_(fn, state: State):
+        definitions = []
+        for instance in state.get_instances() or []:
+            if instance.ast is not None and instance.ast.type in adapters.CommonFunction.ast_types:
+                definitions.append(instance.ast)
+        return definitions
+
+    @Visitor.for_tokens
+    def tokens_(fn, state: State):
+        return []
+
+    @Visitor.for_default
+    def default_(fn, state: State):
+        return [definition for child in state.get_child_asts()
+            for definition in fn.apply(state.but_with(ast=child))]
@@ -16,6 +16,8 @@ from eisen.validation.nilcheck import NilCheck
 from eisen.validation.instancevisitor import InstanceVisitor
 from eisen.validation.recursionvisitor import RecursionVisitor
 from eisen.validation.vectorvisitor import VectorVisitor
+from eisen.validation.treeshaker import TreeShaker
+from eisen.validation.ctargetcheck import CTargetCheck
 from eisen.trace.memoryvisitor import MemoryVisitor
 from eisen.bindings.bindingchecker import BindingChecker
 from eisen.state.basestate import BaseState as State
@@ -92,6 +94,23 @@ class Workflow():
         # note: def, create, fn, ref, ilet, ::, . need instances!!
     ]
 
+    @staticmethod
+    def get_steps(tree_shaking: bool = False, target: str = None) -> list[Visitor]:
+        """
+        Return the steps of the workflow. With [tree_shaking], functions, structs and traits
+        which are unreachable from main are removed once instances are created, so they are only
+        type checked. If the [target] is "c", the features which it does not support are
+        reported first, before they are validated.
+        """
+        steps = Workflow.steps
+        if tree_shaking:
+            i = steps.index(InstanceVisitor) + 1
+            steps = steps[:i] + [TreeShaker] + steps[i:]
+        if target == "c":
+            i = steps.index(Initializer) + 1
+            steps = steps[:i] + [CTargetCheck] + steps[i:]
+        return steps
+
     @staticmethod
     def _choose_steps(supplied_steps: list[Visitor]=None):
         return supplied_steps if supplied_steps else Workflow.steps
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import sys
 import time
 import subprocess
 import argparse
@@ -12,6 +13,7 @@ import python
 
 frame_width = 74
 delim = "=" * frame_width
+profile_output_filename = "./logs/profile.folded"
 
 class PerfCounter:
     def __init__(self) -> None:
@@ -36,7 +38,7 @@ class PerfCounter:
         print(f"\nelapsed in {(end-self.start)/1_000_000} ms")
 
 
-def run_python(filename: str):
+def run_python(filename: str, parser_algo: str = "cyk"):
     print(f"parsing '{filename}' using python grammar")
     perf_counter = PerfCounter()
 
@@ -57,7 +59,7 @@ def run_python(filename: str):
 
     ast = perf_counter.run("Parser",
         alpaca.parser.run,
-        config=config, tokens=tokens, builder=python.Builder())
+        config=config, tokens=tokens, builder=python.Builder(), algo=parser_algo)
 
     # proto_code is generated with curly braces around blocks, as indentation is not
     # trivially context free.
@@ -81,19 +83,28 @@ def run_python(filename: str):
     perf_counter.finish_and_print_report()
 
 
-def run_c(filename: str):
+def run_c(filename: str, parser_algo: str = "cyk"):
     config = alpaca.config.parser.run("./src/c/c_grammar.gm")
     with open(filename, 'r') as f:
         txt = f.read()
     tokens = alpaca.lexer.run(text=txt, config=config, callback=c.Callback)
-    ast = alpaca.parser.run(config=config, tokens=tokens, builder=c.Builder())
+    ast = alpaca.parser.run(config=config, tokens=tokens, builder=c.Builder(), algo=parser_algo)
     print(ast)
     recovered_txt = c.Writer().run(ast)
     print()
     print(recovered_txt)
 
 
-def run_eisen(source_code_filename: str, verbose: bool = False):
+def print_profile(profiler: alpaca.utils.VisitorProfiler):
+    print_header("PROFILE")
+    print(profiler.format_table(limit=40))
+    profiler.write_collapsed_stacks(profile_output_filename)
+    print(f"collapsed stacks written to '{profile_output_filename}'")
+
+
+def run_eisen(source_code_filename: str, verbose: bool = False, profile: bool = False,
+              target: str = "python", optimization_level: int = 0, tree_shaking: bool = False,
+              parser_algo: str = "cyk"):
     """
     Run an input source code file written in Eisen.
 
@@ -101,9 +112,26 @@ def run_eisen(source_code_filename: str, verbose: bool = False):
     :type source_code_filename: str
     :param verbose: True to print verbose, defaults to False
     :type verbose: bool, optional
+    :param profile: True to profile the visitors by AST node type, defaults to False
+    :type profile: bool, optional
+    :param target: The language to compile to and run, either "python" or "c", or "vm" or
+        "closures" to run on the bytecode VirtualMachine or with the ClosureCompiler, defaults
+        to "python"
+    :type target: str, optional
+    :param optimization_level: The level at which to optimize the program before running it,
+        where 0 disables optimization, defaults to 0
+    :type optimization_level: int, optional
+    :param tree_shaking: True to remove functions, structs and traits which are unreachable
+        from main, so that they are only type checked and are not emitted, defaults to False
+    :type tree_shaking: bool, optional
+    :param parser_algo: The algorithm to parse with, one of alpaca.parser.algos, defaults to
+        "cyk"
+    :type parser_algo: str, optional
     """
     print(f"compiling '{source_code_filename}'")
     perf_counter = PerfCounter()
+    if profile:
+        alpaca.utils.Visitor.enable_profiling()
 
     # Parse the configuration file which defines the Eisen lexing/grammar rules.
     config = perf_counter.run("ConfigParsing",
@@ -125,7 +153,7 @@ def run_eisen(source_code_filename: str, verbose: bool = False):
     # Parser actually takes some time to init, so we add it
     parser = perf_counter.run("InitParser",
         eisen.SuperParser,
-        config=config)
+        config=config, algo=parser_algo)
 
     ast = perf_counter.run("Parser",
         parser.parse,
@@ -136,56 +164,94 @@ def run_eisen(source_code_filename: str, verbose: bool = False):
 
     print_header("PERFORMANCE")
     state = eisen.BaseState.create_initial(config, ast, source_code, print_to_watcher=True)
-    _, state = eisen.Workflow.execute_with_benchmarks(state)
+    _, state = eisen.Workflow.execute_with_benchmarks(state,
+        steps=eisen.Workflow.get_steps(tree_shaking, target))
     perf_counter.finish_and_print_report()
 
     if state.watcher.txt:
+        if profile:
+            print_profile(alpaca.utils.Visitor.disable_profiling())
         print_header("COMPILER EXCEPTIONS")
         print(state.watcher.txt)
         return
 
-    print_header("OUTPUT")
+    state = eisen.Optimizer(optimization_level).run(state)
+    if verbose and optimization_level:
+        print_header("OPTIMIZED ABSTRACT SYNTAX TREE")
+        print(state.get_ast())
+
+    match target:
+        case "python": run_python_target(state, profile)
+        case "c": run_c_target(state, profile)
+        case "vm": run_on_vm(state, profile, verbose)
+        case "closures": run_with_closures(state, profile)
+
+
+def run_python_target(state: eisen.BaseState, profile: bool):
     ast = eisen.ToPython().run(state)
+    if profile:
+        print_profile(alpaca.utils.Visitor.disable_profiling())
+
+    print_header("OUTPUT")
 
     proto_code = python.Writer().run(ast)
-    code = eisen.ToPython.builtins + python.PostProcessor.run(proto_code) + eisen.ToPython.lmda + "\nmain___d_void_I__voidb()"
+    code = eisen.ToPython.builtins + python.PostProcessor.run(proto_code) + "\nmain___d_void_I__voidb()"
     with open("./build/test.py", 'w') as f:
         f.write(code)
 
     subprocess.run(["python", "./build/test.py"])
     print()
 
-    # This code is used to transpile Eisen AST into C source code. It's not
-    # working right now.
-    # ==========================================================================
-    # ast = eisen.Flattener().run(state)
-    # state.ast = ast
-    # # print(state.get_ast())
-    # transmuted = eisen.CTransmutation(debug=False).run(ast, state)
-    # print(transmuted)
-
-    # # generate c code
-    # c_config = alpaca.config.parser.run("./src/c/grammar.gm")
-    # c_ast = alpaca.clr.CLRParser.run(c_config, transmuted)
-    # c_ast = eisen.DotDerefFilter().apply(c_ast)
-    # code = c.Writer().run(c_ast)
-    # code = "#include <stdio.h> \n" + code
-    # # print(code)
-    # with open("./build/test.c", 'w') as f:
-    #     f.write(code)
-
-    # # run c code
-    # subprocess.run(["gcc", "./build/test.c", "-o", "./build/test"])
-    # x = subprocess.run(["./build/test"], capture_output=True)
-    # got = x.stdout.decode("utf-8")
-    # print(got)
-
-
-def run(lang: str, filename: str, verbose: bool = False):
+
+def run_on_vm(state: eisen.BaseState, profile: bool, verbose: bool):
+    program = eisen.BytecodeCompiler().run(state)
+    if profile:
+        print_profile(alpaca.utils.Visitor.disable_profiling())
+    if verbose:
+        print_header("BYTECODE")
+        print(program.disassemble())
+
+    print_header("OUTPUT")
+    eisen.VirtualMachine(program).run()
+    print()
+
+
+def run_with_closures(state: eisen.BaseState, profile: bool):
+    main = eisen.ClosureCompiler(write=sys.stdout.write).run(state)
+    if profile:
+        print_profile(alpaca.utils.Visitor.disable_profiling())
+
+    print_header("OUTPUT")
+    main([])
+    print()
+
+
+def run_c_target(state: eisen.BaseState, profile: bool):
+    code = eisen.ToC().run(state)
+    if profile:
+        print_profile(alpaca.utils.Visitor.disable_profiling())
+
+    with open("./build/test.c", 'w') as f:
+        f.write(code)
+
+    result = subprocess.run(["gcc", "-O2", "-w", "./build/test.c", "-o", "./build/test"])
+    if result.returncode != 0:
+        print_header("C COMPILER ERRORS")
+        return
+
+    print_header("OUTPUT")
+    subprocess.run(["./build/test"])
+    print()
+
+
+def run(lang: str, filename: str, verbose: bool = False, profile: bool = False,
+        target: str = "python", optimization_level: int = 0, tree_shaking: bool = False,
+        parser_algo: str = "cyk"):
     match lang:
-        case "python": run_python(filename)
-        case "eisen": run_eisen(filename, verbose)
-        case "c": run_c(filename)
+        case "python": run_python(filename, parser_algo)
+        case "eisen": run_eisen(filename, verbose, profile, target, optimization_level, tree_shaking,
+            parser_algo)
+        case "c": run_c(filename, parser_algo)
         case "types": run_types(filename)
 
 
@@ -197,17 +263,21 @@ def run_types(filename: str):
     print(ast)
 
 
-def run_single_test(name: str):
-    status, msg = eisen.TestRunner.run_test_by_name(name)
+def run_single_test(name: str, target: str, optimization_level: int, tree_shaking: bool,
+                    parser_algo: str):
+    status, msg = eisen.TestRunner.run_test_by_name(name, target, optimization_level, tree_shaking,
+        parser_algo)
     match status:
         case True: print(f"ran test '{name}' successfully")
         case False: print(msg)
 
 
-def run_eisen_tests(name: str, verbose: bool):
+def run_eisen_tests(name: str, verbose: bool, target: str, optimization_level: int,
+                    tree_shaking: bool, parser_algo: str):
     match name:
-        case "": eisen.TestRunner.run_all_tests(verbose)
-        case _: run_single_test(name)
+        case "": eisen.TestRunner.run_all_tests(verbose, target, optimization_level, tree_shaking,
+            parser_algo)
+        case _: run_single_test(name, target, optimization_level, tree_shaking, parser_algo)
 
 
 def debug():
@@ -253,15 +323,79 @@ def print_header(title: str, with_spacing=True):
     if with_spacing: print()
 
 
-if __name__ == "__main__":
-    print(delim)
-    print_header("EISEN", with_spacing=False)
-    print(delim)
+def run_batch(inputs: list[str], output_dir: str, target: str, optimization_level: int,
+              tree_shaking: bool, jobs: int):
+    """
+    Compile all Eisen files found in the [inputs] (directories, globs or files) across a pool
+    of [jobs] processes, writing their artifacts to a mirrored tree under [output_dir].
+    """
+    from eisen.server.batch import BatchCompiler
+    compiler = BatchCompiler(output_dir, target, optimization_level, tree_shaking, jobs)
+    start = time.perf_counter_ns()
+    files = BatchCompiler.collect(inputs)
+    print(f"compiling {len(files)} files to '{output_dir}' with {min(compiler.jobs, len(files))} processes")
+    results = compiler.run(files)
+    print_header("SUMMARY")
+    print(BatchCompiler.format_summary(results, (time.perf_counter_ns() - start) / 1_000_000))
+    return all(result.success for result in results)
+
+
+def run_units(root: str, output_dir: str, target: str, optimization_level: int, jobs: int):
+    """
+    Compile the program whose main function is in the file [root], and each file which it
+    declares with a bodiless module declaration, as separate units under [output_dir]. Only
+    the units whose source or dependency interfaces changed are compiled again. The program is
+    run if every unit compiled.
+    """
+    from eisen.units import UnitCompiler
+    compiler = UnitCompiler(output_dir, target, optimization_level, jobs)
+    start = time.perf_counter_ns()
+    results = compiler.run(root)
+    print_header("UNITS")
+    print(UnitCompiler.format_summary(results))
+    print(f"elapsed in {round((time.perf_counter_ns() - start) / 1_000_000, 2)} ms")
+    if not all(result.success for result in results):
+        return False
+
+    artifact_path = str(compiler.get_root_artifact_path(root))
+    match target:
+        case "python":
+            print_header("OUTPUT")
+            subprocess.run(["python", artifact_path])
+        case "c":
+            # Each unit is a separate translation unit.
+            executable_path = artifact_path.removesuffix(".c")
+            result = subprocess.run(["gcc", "-O2", "-w"] + [r.artifact_path for r in results]
+                + ["-o", executable_path])
+            if result.returncode != 0:
+                print_header("C COMPILER ERRORS")
+                return False
+            print_header("OUTPUT")
+            subprocess.run([executable_path])
+    print()
+    return True
+
+
+def serve(address: str):
+    """
+    Serve compilation requests as JSON-RPC, over stdin/stdout if [address] is "stdio", or
+    otherwise over the Unix domain socket at the path [address].
+    """
+    from eisen.server import JsonRpcServer
+    server = JsonRpcServer()
+    match address:
+        case "stdio": server.serve_stdio()
+        case _:
+            print(f"serving on '{address}'")
+            server.serve_unix_socket(address)
 
+
+if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--debug", action="store_true")
     parser.add_argument("-t", "--test", action="store", type=str, nargs="?", const="")
     parser.add_argument("-v", "--verbose", action="store_true", default=False)
+    parser.add_argument("-p", "--profile", action="store_true", default=False)
     parser.add_argument("-b", "--build", action="store_true")
     parser.add_argument("-i", "--input", action="store", type=str)
     parser.add_argument("-a", "--add-test", action="store_true")
@@ -270,17 +404,114 @@ if __name__ == "__main__":
         type=str,
         choices=["eisen", "python", "c", "types"],
         default="eisen")
+    parser.add_argument("--target",
+        action="store",
+        type=str,
+        choices=["python", "c"],
+        default="python",
+        help="the language to generate code for; the c target does not support vectors or "
+            + "interfaces, which are reported as compiler exceptions, and never frees curried "
+            + "function values")
+    parser.add_argument("--run",
+        action="store",
+        type=str,
+        choices=["vm", "closures"],
+        help="run the program directly instead of generating code for the target")
+    parser.add_argument("-O", "--optimize",
+        action="store",
+        type=int,
+        nargs="?",
+        const=1,
+        default=0,
+        choices=sorted(eisen.Optimizer.levels),
+        help="optimize the program before running it; -O alone is equivalent to -O1")
+    parser.add_argument("--parser",
+        action="store",
+        type=str,
+        choices=alpaca.parser.algos,
+        default="cyk",
+        help="the algorithm to parse with; 'cyk-pratt' parses binary operations by precedence "
+            + "climbing before 'cyk', 'cyk-parallel' fills the table of long inputs on every "
+            + "core, 'lr1' uses LALR(1) tables and 'lr1-canonical' uses canonical LR(1) tables, "
+            + "and 'earley' parses any grammar without normalizing it")
+    parser.add_argument("--tree-shake",
+        action="store_true",
+        help="omit functions, structs and traits which are unreachable from main; these are only "
+            + "type checked")
+    parser.add_argument("--serve",
+        action="store",
+        type=str,
+        nargs="?",
+        const="stdio",
+        metavar="SOCKET",
+        help="serve JSON-RPC compilation requests over a Unix domain socket, or stdin/stdout")
+    parser.add_argument("--batch",
+        action="store",
+        type=str,
+        nargs="+",
+        metavar="PATH",
+        help="compile every Eisen file in the given directories, globs or files")
+    parser.add_argument("--out-dir",
+        action="store",
+        type=str,
+        default="./build",
+        help="the directory to write batch artifacts to (mirroring the inputs), or units to")
+    parser.add_argument("-j", "--jobs",
+        action="store",
+        type=int,
+        default=None,
+        help="the number of processes to compile batches or units with; defaults to the number of cores")
+    parser.add_argument("--units",
+        action="store",
+        type=str,
+        metavar="FILE",
+        help="compile and run the program in FILE, compiling each file it declares with "
+            + "'mod NAME' as a separate unit under --out-dir")
+    parser.add_argument("--lsp",
+        action="store_true",
+        help="run the language server over stdin/stdout")
 
     args = parser.parse_args()
+    # Responses are written to stdout when serving over stdio, so nothing else may be.
+    if args.serve == "stdio":
+        serve(args.serve)
+        sys.exit(0)
+    if args.lsp:
+        from eisen.server import LanguageServer
+        LanguageServer().serve()
+        sys.exit(0)
+
+    print(delim)
+    print_header("EISEN", with_spacing=False)
+    print(delim)
+    if args.run is not None:
+        args.target = args.run
 
     if args.add_test:
         add_test(args.test)
     elif args.test is not None:
-        run_eisen_tests(args.test, args.verbose)
+        run_eisen_tests(args.test, args.verbose, args.target, args.optimize, args.tree_shake,
+            args.parser)
     elif args.input and args.lang:
-        run(args.lang, args.input, args.verbose)
+        run(args.lang, args.input, args.verbose, args.profile, args.target, args.optimize,
+            args.tree_shake, args.parser)
     elif args.build:
         eisen.TestRunner.rebuild_cache()
+    elif args.batch:
+        if args.run is not None:
+            parser.error("--batch generates code for a --target, and cannot --run")
+        if not run_batch(args.batch, args.out_dir, args.target, args.optimize, args.tree_shake,
+                args.jobs):
+            print(delim)
+            sys.exit(1)
+    elif args.units:
+        if args.run is not None:
+            parser.error("--units generates code for a --target, and cannot --run")
+        if not run_units(args.units, args.out_dir, args.target, args.optimize, args.jobs):
+            print(delim)
+            sys.exit(1)
+    elif args.serve:
+        serve(args.serve)
     elif args.debug:
         debug()
 
@@ -11,6 +11,8 @@ binops = ["+", "-", "/", "*", "<", ">", "<=", ">=",
     "and", "or"
 ]
 
+assignment_ops = ["+=", "-=", "/=", "*=", "=", "//="]
+
 class Writer(Visitor):
     def run(self, ast: AST) -> str:
         p = self.apply(ast)
@@ -29,10 +31,19 @@ class Writer(Visitor):
             p += fn.apply(child)
         return p
 
-    @Visitor.for_ast_types("start", "ref")
-    def start_(fn, ast: AST):
+    @Visitor.for_ast_types("ref")
+    def ref_(fn, ast: AST):
         return Writer.apply_fn_to_all_children(fn, ast)
 
+    @Visitor.for_ast_types("start")
+    def start_(fn, ast: AST):
+        p = []
+        for child in ast:
+            p += fn.apply(child)
+            if child.type == "=":
+                p.append("\n")
+        return p
+
     @Visitor.for_ast_types("def")
     def def_(fn, ast: AST):
         return ["def ",
@@ -77,6 +88,8 @@ class Writer(Visitor):
     @Visitor.for_ast_types("seq")
     def seq_(fn, ast: AST):
         p = ["\n{\n"]
+        if ast.has_no_children():
+            p.append("pass\n")
         for child in ast:
             p += fn.apply(child) + ["\n"]
         p.append("}\n")
@@ -110,13 +123,23 @@ class Writer(Visitor):
     def return_(fn, ast: AST):
         return ["return ", *Writer.apply_fn_to_all_children(fn, ast)]
 
+    @classmethod
+    def write_operand(cls, fn: Visitor, ast: AST) -> list[str]:
+        # The grouping of nested operations is given by the AST, so they are parenthesized
+        # rather than relying on the precedence of python operators.
+        if isinstance(ast, AST) and (ast.type in binops or ast.type == "not"):
+            return ["(", *fn.apply(ast), ")"]
+        return fn.apply(ast)
+
     @Visitor.for_ast_types(*binops)
     def binops_(fn, ast: AST):
-        return [*fn.apply(ast.first()), f" {ast.type} ", *fn.apply(ast.second())]
+        if ast.type in assignment_ops:
+            return [*fn.apply(ast.first()), f" {ast.type} ", *fn.apply(ast.second())]
+        return [*Writer.write_operand(fn, ast.first()), f" {ast.type} ", *Writer.write_operand(fn, ast.second())]
 
     @Visitor.for_ast_types("not")
     def not_(fn ,ast: AST):
-        return ["not ", *fn.apply(ast.first())]
+        return ["not ", *Writer.write_operand(fn, ast.first())]
 
     @Visitor.for_ast_types(".")
     def close_bind_(fn, ast: AST):
@@ -131,6 +154,8 @@ class Writer(Visitor):
         elems = []
         for child in ast[1:]:
             elems += fn.apply(child)
+            if child.type == "=":
+                elems.append("\n")
         return ["class ", *fn.apply(ast.first()), ": \n{\n", *elems, "}\n"]
 
     @Visitor.for_ast_types("vargs", "unpack")